@@ -0,0 +1,100 @@
+"""
+Memory benchmark for the per-agent hot path.
+
+Compares, per agent, the baseline engine against the current zero-copy path
+(load_data output used as a read-only view). The baseline is the real code
+before the zero-copy change: data_loader and logic_analytics are loaded from
+--baseline-rev (required: any git revision from before the change, e.g. a tag
+or the SHA of its parent in the current history) with `git show`, and each
+agent frame gets the pipeline's df_agent.copy() as it did then. Reports peak
+traced allocations and time per agent.
+
+    python benchmarks/bench_agent_memory.py --baseline-rev <rev> --agents 200 --months 18
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from data_loader import load_data
+from logic_analytics import calcular_metricas_agente_con_mensual
+from synthetic_data import write_raw_dataset
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def load_baseline_module(name, rev):
+    """Module src/<name>.py as of git revision `rev`, imported under baseline_<name>."""
+    source = subprocess.run(['git', '-C', REPO, 'show', f'{rev}:src/{name}.py'],
+                            capture_output=True, text=True, check=True).stdout
+    module = types.ModuleType(f'baseline_{name}')
+    module.__file__ = f'{rev}:src/{name}.py'
+    exec(compile(source, module.__file__, 'exec'), module.__dict__)
+    return module
+
+
+def measure(groups, total_jugadores_global, metricas_fn, copy_first):
+    peaks = []
+    start = time.perf_counter()
+    for _, df_agent in groups:
+        tracemalloc.start()
+        if copy_first:
+            df_agent = df_agent.copy()
+        metricas_fn(df_agent, total_jugadores_global)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+    elapsed = time.perf_counter() - start
+    return sum(peaks) / len(peaks), max(peaks), elapsed / len(peaks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--agents', type=int, default=100)
+    parser.add_argument('--months', type=int, default=18)
+    parser.add_argument('--players', type=int, default=60)
+    parser.add_argument('--sample', type=int, default=30, help='agents measured per mode')
+    parser.add_argument('--baseline-rev', required=True,
+                        help='git revision of the baseline engine (last commit before the zero-copy hot path)')
+    args = parser.parse_args()
+
+    baseline_loader = load_baseline_module('data_loader', args.baseline_rev)
+    baseline_logic = load_baseline_module('logic_analytics', args.baseline_rev)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = write_raw_dataset(os.path.join(tmp, 'synthetic.csv'), n_agents=args.agents,
+                                     n_months=args.months, players_per_agent=args.players)
+        df = load_data(csv_path)
+        df_baseline = baseline_loader.load_data(csv_path)
+
+    total_jugadores_global = df['jugador_id'].nunique()
+    baseline_groups = list(df_baseline.groupby('id_agente'))[:args.sample]
+    zero_copy_groups = list(df.groupby('id_agente'))[:args.sample]
+
+    print(f"Rows: {len(df):,} | Agents measured: {len(zero_copy_groups)} | Months: {args.months} | "
+          f"Baseline: {args.baseline_rev}")
+    baseline_name = f'baseline ({args.baseline_rev})'
+    results = {
+        baseline_name: measure(baseline_groups, total_jugadores_global,
+                               baseline_logic.calcular_metricas_agente_con_mensual, copy_first=True),
+        'zero-copy (views)': measure(zero_copy_groups, total_jugadores_global,
+                                     calcular_metricas_agente_con_mensual, copy_first=False),
+    }
+    for name, (mean_peak, max_peak, secs) in results.items():
+        print(f"  {name:<26} mean peak {mean_peak / 1024:10.1f} KiB | max peak {max_peak / 1024:10.1f} KiB | {secs * 1000:8.2f} ms/agent")
+
+    baseline_mean = results[baseline_name][0]
+    zero_mean = results['zero-copy (views)'][0]
+    if baseline_mean > 0:
+        print(f"  Peak allocation reduction per agent: {(1 - zero_mean / baseline_mean) * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
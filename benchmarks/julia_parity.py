@@ -0,0 +1,177 @@
+"""
+Julia/Python parity and performance cross-check.
+
+Runs the reference Julia model (src/Métricas_agentes_Clasificación.jl) and the
+Python engine (logic_analytics) on the same synthetic dataset, diffs scores,
+classes, credit, GGR forecast and the 11 metrics per agent within a tolerance,
+and prints the timings side by side.
+
+The Julia side is optional: it only runs when a local `julia` binary (with
+DataFrames and CSV installed) is found, otherwise only the Python side runs.
+
+The Python side reproduces the Julia driver (procesar_agentes) so that any
+difference comes from the model logic and not from pipeline configuration:
+latest month as evaluation month, distinct players of that month as the global
+total, only agents active in that month, comis_calculada as calculo_ngr and
+the real ticket columns.
+
+    python benchmarks/julia_parity.py --agents 200 --months 18
+    python benchmarks/julia_parity.py --input Data/reporte.csv --julia /opt/julia/bin/julia
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from data_loader import load_data
+from logic_analytics import (
+    PESOS_METRICAS, calcular_metricas_agente, calcular_score_total,
+    categorizar_agente, calcular_credito_sugerido, predecir_ggr_proximo_mes
+)
+from synthetic_data import write_raw_dataset
+
+JULIA_MODEL = os.path.join(os.path.dirname(__file__), '..', 'src', 'Métricas_agentes_Clasificación.jl')
+METRICS = list(PESOS_METRICAS.keys())
+NUMERIC_FIELDS = ['score', 'credito_sugerido', 'ggr_prediccion', *METRICS]
+
+JULIA_DRIVER = r'''
+include(raw"{model}")
+t = @elapsed resultados = procesar_agentes(raw"{csv}")
+metricas = {metrics}
+# CSV.write quotes agent names with commas or quotes
+tabla = DataFrame([c => Any[] for c in vcat(["agente", "score", "categoria", "credito_sugerido", "ggr_prediccion"], metricas)])
+for r in resultados
+    push!(tabla, vcat(Any[r["agente"], r["score"], r["categoria"], r["credito_sugerido"], r["ggr_prediccion"]],
+                      [r["metricas"][m] for m in metricas]))
+end
+CSV.write(raw"{out}", tabla)
+println("ELAPSED=", t)
+'''
+
+
+def run_python(csv_path):
+    """Python engine with the Julia driver's semantics. Returns (results, seconds)."""
+    start = time.perf_counter()
+    df = load_data(csv_path)
+    if 'calculo_comision' in df.columns:
+        df['calculo_ngr'] = df['calculo_comision']
+    df = df.rename(columns={'deportiva_tickets': 'tickets_deportes', 'casino_tickets': 'tickets_casino'})
+
+    mes_evaluacion = df['mes'].max()
+    df_mes = df[df['mes'] == mes_evaluacion]
+    total_jugadores_global = df_mes['jugador_id'].nunique()
+    activos = set(df_mes['nombre_usuario_agente'].unique())
+
+    rows = []
+    for agente, df_agente in df.groupby('nombre_usuario_agente'):
+        if agente not in activos:
+            continue
+        metricas, df_mensual = calcular_metricas_agente(df_agente, total_jugadores_global, mes_evaluacion)
+        score = calcular_score_total(metricas)
+        categoria, _ = categorizar_agente(score)
+        credito, _ = calcular_credito_sugerido(df_mensual, score, metricas)
+        row = {
+            'agente': agente,
+            'score': round(score, 2),
+            'categoria': categoria,
+            'credito_sugerido': round(credito, 2),
+            'ggr_prediccion': predecir_ggr_proximo_mes(df_mensual),
+        }
+        row.update(metricas)
+        rows.append(row)
+    return pd.DataFrame(rows).set_index('agente'), time.perf_counter() - start
+
+
+def run_julia(julia_bin, csv_path, workdir):
+    """Reference Julia model. Returns (results, wall seconds, in-process seconds)."""
+    out_path = os.path.join(workdir, 'julia_results.csv')
+    driver_path = os.path.join(workdir, 'driver.jl')
+    metrics_literal = '[' + ', '.join(f'"{m}"' for m in METRICS) + ']'
+    with open(driver_path, 'w', encoding='utf-8') as f:
+        f.write(JULIA_DRIVER.format(model=os.path.abspath(JULIA_MODEL), csv=os.path.abspath(csv_path),
+                                    metrics=metrics_literal, out=out_path))
+
+    start = time.perf_counter()
+    proc = subprocess.run([julia_bin, driver_path], capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"Julia falló:\n{proc.stderr[-2000:]}")
+
+    elapsed = None
+    for line in proc.stdout.splitlines():
+        if line.startswith('ELAPSED='):
+            elapsed = float(line.split('=', 1)[1])
+    return pd.read_csv(out_path, dtype={'agente': str}).set_index('agente'), wall, elapsed
+
+
+def compare(py, jl, rtol, atol):
+    """Per-agent diff table: one row per (agent, field) outside tolerance."""
+    diffs = []
+    for agente in py.index.union(jl.index):
+        if agente not in py.index or agente not in jl.index:
+            diffs.append({'agente': agente, 'campo': 'presencia',
+                          'python': agente in py.index, 'julia': agente in jl.index})
+            continue
+        p, j = py.loc[agente], jl.loc[agente]
+        if p['categoria'] != j['categoria']:
+            diffs.append({'agente': agente, 'campo': 'categoria', 'python': p['categoria'], 'julia': j['categoria']})
+        for field in NUMERIC_FIELDS:
+            a, b = float(p[field]), float(j[field])
+            if abs(a - b) > atol + rtol * abs(b):
+                diffs.append({'agente': agente, 'campo': field, 'python': a, 'julia': b})
+    return pd.DataFrame(diffs, columns=['agente', 'campo', 'python', 'julia'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--input', help='raw CSV (default: synthetic dataset)')
+    parser.add_argument('--agents', type=int, default=100)
+    parser.add_argument('--months', type=int, default=14)
+    parser.add_argument('--players', type=int, default=40)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--julia', default=shutil.which('julia'), help='julia binary (default: PATH lookup)')
+    parser.add_argument('--rtol', type=float, default=1e-6)
+    parser.add_argument('--atol', type=float, default=0.011, help='covers 2-decimal rounding of score and credit')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = args.input or write_raw_dataset(
+            os.path.join(tmp, 'synthetic.csv'), n_agents=args.agents, n_months=args.months,
+            players_per_agent=args.players, seed=args.seed)
+
+        py, py_secs = run_python(csv_path)
+        print(f"Python: {len(py)} agentes en {py_secs:.2f} s")
+
+        if not args.julia:
+            print("Julia: binario no encontrado, se omite la comparación de paridad.")
+            return 0
+
+        jl, jl_wall, jl_secs = run_julia(args.julia, csv_path, tmp)
+
+    print("\n--- TIEMPOS ---")
+    print(f"  {'Python (proceso completo)':<30} {py_secs:8.2f} s")
+    print(f"  {'Julia (procesar_agentes)':<30} {jl_secs if jl_secs is not None else float('nan'):8.2f} s")
+    print(f"  {'Julia (incl. arranque/JIT)':<30} {jl_wall:8.2f} s")
+
+    diffs = compare(py, jl, args.rtol, args.atol)
+    print("\n--- PARIDAD ---")
+    if diffs.empty:
+        print(f"✅ {len(py)} agentes idénticos dentro de la tolerancia (rtol={args.rtol}, atol={args.atol}).")
+        return 0
+
+    print(f"❌ {diffs['agente'].nunique()} agentes con diferencias ({len(diffs)} campos):")
+    print(diffs.groupby('campo').size().sort_values(ascending=False).to_string())
+    print(diffs.head(30).to_string(index=False))
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
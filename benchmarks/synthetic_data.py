@@ -0,0 +1,55 @@
+"""
+Synthetic player-level dataset in the raw CSV schema (the one load_data and the
+Julia script read). Used by the benchmarks and parity checks so they never need
+the production export.
+"""
+import numpy as np
+import pandas as pd
+
+
+def generate_raw_dataset(n_agents=50, n_months=14, players_per_agent=40, seed=0, start="2024-01"):
+    """
+    Builds a raw movements table with the original CSV column names.
+    Players overlap between neighbouring agents so distinct counts are not trivial.
+    """
+    rng = np.random.default_rng(seed)
+    months = pd.period_range(start, periods=n_months, freq="M")
+
+    n = n_agents * players_per_agent * n_months
+    agents = rng.integers(0, n_agents, n)
+    players = agents * players_per_agent + rng.integers(0, players_per_agent * 2, n)
+    month_idx = rng.integers(0, n_months, n)
+
+    keep = rng.random(n) < 0.7
+    agents, players, month_idx = agents[keep], players[keep], month_idx[keep]
+    n = len(agents)
+
+    dates = months[month_idx].to_timestamp() + pd.to_timedelta(rng.integers(0, 28, n), unit="D")
+    deposits = rng.gamma(2.0, 500.0, n).round(2)
+    ngr = (deposits * rng.normal(0.08, 0.10, n)).round(2)
+
+    return pd.DataFrame({
+        "date_evento": dates.strftime("%Y-%m-%d"),
+        "player_id": players,
+        "player_username": ["p%d" % p for p in players],
+        "agente_id": agents + 100,
+        "agente_username": ["ag%d" % a for a in agents],
+        "ngr_total": ngr,
+        "comis_calculada": ngr,
+        "n_deposito": rng.integers(0, 10, n),
+        "n_retiro": rng.integers(0, 5, n),
+        "deposito": deposits,
+        "retiro": (deposits * rng.random(n)).round(2),
+        "ggr_deportiva": (deposits * rng.normal(0.05, 0.05, n)).round(2),
+        "ggr_casino": (deposits * rng.normal(0.07, 0.05, n)).round(2),
+        "amount_bet_deportiva": (deposits * rng.random(n) * 3).round(2),
+        "amount_bet_casino": (deposits * rng.random(n) * 3).round(2),
+        "deportiva_tickets": rng.integers(0, 50, n),
+        "casino_tickets": rng.integers(0, 50, n),
+    })
+
+
+def write_raw_dataset(path, **kwargs):
+    """Writes the synthetic dataset as CSV and returns the path."""
+    generate_raw_dataset(**kwargs).to_csv(path, index=False)
+    return path
@@ -1,7 +1,9 @@
+import argparse
 import pandas as pd
 import os
 import sys
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
@@ -9,164 +11,248 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 from data_loader import load_data
 from report_html import generate_html_report
 from logic_analytics import (
-    calcular_metricas_agente_con_mensual, calcular_score_total,
-    categorizar_agente, calcular_credito_sugerido,
-    predecir_ggr
+    agregar_mensual, preparar_df_agente, calcular_metricas_agente_desde_tabla, calcular_score_total,
+    categorizar_agente, categorizar_scores, calcular_credito_sugerido,
+    predecir_ggr, MODOS_MENSUALES
 )
-from metrics_dashboard_generator import load_and_validate_data, generate_metrics_dashboard
-
-def main():
-    # New CSV Input
-    input_file = r"c:\Users\Miguel\Documents\Proyecto_Grafico\Data\reporte_detallado_jugadores_final.csv"
-    output_file = r"c:\Users\Miguel\Documents\Proyecto_Grafico\reports\dashboard.html"
-    analysis_output = r"c:\Users\Miguel\Documents\Proyecto_Grafico\reports\agent_analysis.csv"
-    
+from metrics_dashboard_generator import load_and_validate_data, generate_metrics_dashboard, attach_player_migration
+from player_sketches import PlayerSketches
+from result_buffer import AgentResultBuffer
+from result_cache import ResultCache, code_version, table_fingerprint
+from asset_bundler import ASSET_MODES
+from month_keys import MONTH_KEY_DTYPE, month_label
+from class_transitions import calcular_transiciones, tabla_transiciones
+from cohort_retention import ActivityMatrix, retention_summary
+from player_migration import PlayerAgentMap, calcular_migracion, tabla_flujos
+from pipeline_stages import input_fingerprint, save_stage, load_stage
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Conteo de jugadores distintos: None = exacto (auditoría); un valor > 0 = error relativo HyperLogLog
+PLAYER_COUNT_ERROR = None
+# Assets de los reportes: 'cdn' (Plotly y fuentes desde internet), 'inline' (HTML autocontenido)
+# o 'shared' (reports/assets/ compartido entre ambos dashboards). 'inline' y 'shared' funcionan
+# sin red solo con plotly.js 2.27.0 y las fuentes en src/vendor/ (ver asset_bundler); si faltan, fallan
+REPORT_ASSETS = 'cdn'
+# Directorio de caché: resultados por agente (agent_results/, se invalidan solos al cambiar
+# datos o pesos) e intermedios de cada etapa (pipeline/) para poder saltar etapas
+CACHE_DIR = os.path.join(BASE_DIR, '.cache')
+RESULT_CACHE_MAX_MB = 512
+# Series del dashboard histórico: 'snapshot' o ventana móvil ('rolling_3m', 'rolling_6m').
+# Antes el dashboard pedía 'rolling_3m' pero el motor lo ignoraba y mostraba cada mes
+# solo; con este default cada punto de la serie es la ventana de los últimos 3 meses.
+# 'snapshot' reproduce las series anteriores
+HISTORIC_MODE = 'rolling_3m'
+
+DEFAULT_INPUT = os.path.join(BASE_DIR, 'Data', 'reporte_detallado_jugadores_final.csv')
+DEFAULT_OUTPUT_DIR = os.path.join(BASE_DIR, 'reports')
+
+# Etapas en orden; cada una guarda su salida en <cache-dir>/pipeline/<etapa>.pkl
+STAGES = ('load', 'score', 'forecast', 'transitions', 'retention', 'migration', 'report', 'historic')
+BACKENDS = ('serial', 'process')
+
+def finish_scoring(metricas, df_mensual_orig, df_mensual_mets):
+    """Une la tabla mensual con la serie de métricas y agrega el crédito sugerido."""
+    df_mensual = pd.merge(df_mensual_orig, df_mensual_mets, on='mes', how='left')
+
+    # Fallback for logic_analytics changes
+    if 'calculo_comision' not in df_mensual.columns:
+        df_mensual['calculo_comision'] = df_mensual['calculo_ngr']
+
+    score = calcular_score_total(metricas)
+    credito, detalles = calcular_credito_sugerido(df_mensual, score, metricas)
+    return metricas, df_mensual, credito
+
+
+def score_table(tabla, total_jugadores_global):
+    """Métricas, serie mensual y crédito desde la tabla mensual de un agente (se puede correr en otro proceso)."""
+    return finish_scoring(*calcular_metricas_agente_desde_tabla(tabla, total_jugadores_global))
+
+
+def store_agent(buffer, i, id_agente, agent_name, active_players, result):
+    """Escribe en la fila i del buffer el perfil y la serie mensual de un resultado de finish_scoring."""
+    metricas, df_mensual, credito = result
+    score = calcular_score_total(metricas)
+    categoria, descripcion = categorizar_agente(score)
+
+    # --- Build Agent Profile Record (df_agents) ---
+    record = {
+        'id_agente': id_agente,
+        'nombre_usuario_agente': agent_name,
+        'score_global': score,
+        'Clase': categoria,
+        'Risk_Safe': 1 if 'A' in categoria or 'B' in categoria else 0,
+        'credito_sugerido': credito,
+        'descripcion_categoria': descripcion,
+        'active_players': active_players,
+        'total_depositos': df_mensual['total_depositos'].sum(),
+        'total_retiros': df_mensual['total_retiros'].sum(),
+        'calculo_ngr': df_mensual['calculo_ngr'].sum(),
+        'calculo_ggr': df_mensual['apuestas_deportivas_ggr'].sum() + df_mensual['casino_ggr'].sum(),
+        'calculo_comision': df_mensual['calculo_comision'].sum(),
+    }
+    # Add the 11 individual metric scores
+    record.update(metricas)
+
+    buffer.set_monthly(i, df_mensual)
+    buffer.set_agent(i, record)
+
+
+def process_global(buffer, jugadores_por_mes, total_jugadores_global):
+    """
+    Vista global (fila 0) combinando las tablas mensuales de los agentes ya
+    procesados: las sumas salen del buffer y los jugadores distintos por mes de
+    los sketches, así que no se re-escanea el DataFrame completo.
+    """
+    tabla = buffer.monthly_totals(np.arange(1, len(buffer.filled)))
+    tabla['jugador_id_unique'] = tabla['mes'].map(jugadores_por_mes).fillna(0).astype(int)
+    store_agent(buffer, 0, 'GLOBAL', '🌟 VISTA GLOBAL (Toda la Empresa)', total_jugadores_global,
+                score_table(tabla, total_jugadores_global))
+
+
+def rank_monthly(df_monthly):
+    """
+    Posición de cada agente entre los agentes del mismo mes, con un solo rank
+    agrupado sobre la tabla (agente, mes): rank_mes (1 = mejor score, empates al
+    mínimo), n_agentes_mes, percentil_mes (% de agentes del mes con score <= al
+    suyo) y rank_clase_mes (puesto dentro de su Clase ese mes). La vista global
+    no compite: rank 0 y percentil NaN, como en rank_global.
+    """
+    scores = df_monthly['score_global'].where(df_monthly['id_agente'].astype(str) != 'GLOBAL')
+    por_mes = scores.groupby(df_monthly['mes'])
+    df_monthly['rank_mes'] = por_mes.rank(ascending=False, method='min').fillna(0).astype(int)
+    df_monthly['n_agentes_mes'] = por_mes.transform('count').astype(int)
+    df_monthly['percentil_mes'] = (por_mes.rank(method='max', pct=True) * 100).round(1)
+    por_clase = scores.groupby([df_monthly['mes'], df_monthly['Clase']])
+    df_monthly['rank_clase_mes'] = por_clase.rank(ascending=False, method='min').fillna(0).astype(int)
+    return df_monthly
+
+
+def finalize_monthly(df_monthly):
+    """Columnas derivadas de la serie mensual, calculadas una sola vez para todos los agentes."""
+    if df_monthly.empty:
+        return df_monthly
+    # Clase and Risk_Safe per month (since it was removed from logic_analytics inner loop)
+    df_monthly['Clase'] = categorizar_scores(df_monthly['score_global'])
+    df_monthly['Risk_Safe'] = df_monthly['Clase'].str.contains('A|B').astype(int)
+    rank_monthly(df_monthly)
+    df_monthly['month'] = month_label(df_monthly['mes'])
+    df_monthly['calculo_ggr'] = df_monthly['apuestas_deportivas_ggr'] + df_monthly['casino_ggr']
+    # Rename columns to match report expectations
+    df_monthly = df_monthly.rename(columns={
+        'apuestas_deportivas_ggr': 'ggr_deportiva',
+        'casino_ggr': 'ggr_casino',
+    })
+    # Add estimated bet columns
+    margen = 0.05
+    df_monthly['total_apuesta_deportiva'] = df_monthly['ggr_deportiva'] / margen
+    df_monthly['total_apuesta_casino'] = df_monthly['ggr_casino'] / margen
+    return df_monthly
+
+
+# ============================================================================
+# ETAPAS
+# ============================================================================
+
+def run_load(input_file):
+    """Lee el CSV y arma los sketches de jugadores por (agente, mes)."""
     print(f"Loading data from {input_file}...")
-    try:
-        df = load_data(input_file)
-        print(f"Data loaded. Shape: {df.shape}")
-        
-    except Exception as e:
-        print(f"Error loading data: {e}")
-        return
+    df = load_data(input_file)
+    print(f"Data loaded. Shape: {df.shape}")
 
+    # Sketches por (agente, mes): los conteos globales salen de combinarlos, sin re-escanear jugador_id
+    sketches = PlayerSketches.from_frame(df, error_relativo=PLAYER_COUNT_ERROR or 0.01, exact=PLAYER_COUNT_ERROR is None)
+    # Actividad dispersa (agente, jugador) x mes para la retención por cohortes
+    activity = ActivityMatrix.from_frame(df)
+    return {'input': os.path.abspath(input_file), 'df': df, 'sketches': sketches, 'activity': activity}
+
+
+def run_score(loaded, cache=None, backend='serial', workers=None):
+    """
+    Métricas, score y crédito de todos los agentes más la vista global, en un
+    AgentResultBuffer. Los agentes en caché se leen de disco; el resto se calcula
+    en serie o repartido en procesos (backend='process').
+    """
+    df, sketches = loaded['df'], loaded['sketches']
     print("\nProcessing Agents with Unified Logic (Metrics + Deep Analysis)...")
-    
-    total_jugadores_global = df['jugador_id'].nunique()
-    
-    agent_records = []
-    monthly_records = []
+    total_jugadores_global = int(round(sketches.count()))
+
+    groups = list(df.groupby('nombre_usuario_agente'))
+    months = df['mes'].dropna().astype(MONTH_KEY_DTYPE).unique()
+    # Fila 0 = VISTA GLOBAL, luego un agente por fila
+    buffer = AgentResultBuffer(len(groups) + 1, months)
 
-    # === 1. CALCULAR VISTA GLOBAL (TODA LA EMPRESA) ===
+    # OPTIMIZACIÓN: Usar groupby para evitar escanear el DF completo por cada agente.
+    # Una sola agregación mensual por agente: alimenta las métricas y es la huella para la caché
+    pending = []
+    for i, (agent_name, df_agent) in enumerate(groups, start=1):
+        try:
+            id_agente = df_agent['id_agente'].iloc[0] if 'id_agente' in df_agent.columns else 0
+            info = (id_agente, agent_name, df_agent['jugador_id'].nunique())
+            tabla = agregar_mensual(preparar_df_agente(df_agent))
+            # El resultado cacheado es el de score_table, que también pasa por finish_scoring
+            key = table_fingerprint(tabla, 'agent_score', code_version(score_table, finish_scoring),
+                                    total_jugadores_global)
+            result = cache.get(key) if cache is not None else None
+            if result is None:
+                pending.append((i, info, tabla, key))
+            else:
+                store_agent(buffer, i, *info, result)
+        except Exception as e:
+            print(f"Error processing agent {agent_name}: {e}")
+
+    if backend == 'process' and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(score_table, tabla, total_jugadores_global) for _, _, tabla, _ in pending]
+            outcomes = [f.exception() or f.result() for f in futures]
+    else:
+        outcomes = []
+        for _, _, tabla, _ in pending:
+            try:
+                outcomes.append(score_table(tabla, total_jugadores_global))
+            except Exception as e:
+                outcomes.append(e)
+
+    for (i, info, _, key), result in zip(pending, outcomes):
+        if isinstance(result, Exception):
+            print(f"Error processing agent {info[1]}: {result}")
+            continue
+        if cache is not None:
+            cache.put(key, result)
+        store_agent(buffer, i, *info, result)
+
+    # === CALCULAR VISTA GLOBAL (TODA LA EMPRESA) ===
+    # Se arma con las tablas mensuales de los agentes ya procesados (fila 0 del buffer)
     print("\nCalculando Vista Global de la Empresa...")
     try:
-        metricas_g, df_mensual_orig_g, df_mensual_mets_g = calcular_metricas_agente_con_mensual(df, total_jugadores_global)
-        df_mensual_g = pd.merge(df_mensual_orig_g, df_mensual_mets_g, on='mes', how='left')
-        
-        if 'calculo_comision' not in df_mensual_g.columns:
-            df_mensual_g['calculo_comision'] = df_mensual_g['calculo_ngr']
-            
-        def compute_clase(s):
-            if pd.notna(s): return categorizar_agente(s)[0]
-            return 'C'
-            
-        df_mensual_g['Clase'] = df_mensual_g['score_global'].apply(compute_clase)
-        df_mensual_g['Risk_Safe'] = df_mensual_g['Clase'].apply(lambda c: 1 if ('A' in c or 'B' in c) else 0)
-
-        score_g = calcular_score_total(metricas_g)
-        categoria_g, descripcion_g = categorizar_agente(score_g)
-        credito_g, detalles_g = calcular_credito_sugerido(df_mensual_g, score_g, metricas_g)
-        ggr_prediccion_g = predecir_ggr(df_mensual_g)
-        
-        record_g = {
-            'id_agente': 'GLOBAL',
-            'nombre_usuario_agente': '🌟 VISTA GLOBAL (Toda la Empresa)',
-            'score_global': score_g,
-            'Clase': categoria_g,
-            'Risk_Safe': 1 if 'A' in categoria_g or 'B' in categoria_g else 0,
-            'credito_sugerido': credito_g,
-            'descripcion_categoria': descripcion_g,
-            'ggr_prediccion': ggr_prediccion_g,
-            'active_players': df['jugador_id'].nunique(),
-            'total_depositos': df_mensual_g['total_depositos'].sum(),
-            'total_retiros': df_mensual_g['total_retiros'].sum(),
-            'calculo_ngr': df_mensual_g['calculo_ngr'].sum(),
-            'calculo_ggr': df_mensual_g['apuestas_deportivas_ggr'].sum() + df_mensual_g['casino_ggr'].sum(),
-            'calculo_comision': df_mensual_g['calculo_comision'].sum(),
-        }
-        record_g.update(metricas_g)
-        agent_records.append(record_g)
-        
-        if not df_mensual_g.empty:
-            monthly_df_g = df_mensual_g.copy()
-            monthly_df_g['id_agente'] = 'GLOBAL'
-            monthly_df_g['month'] = monthly_df_g['mes'].astype(str)
-            monthly_df_g['calculo_ggr'] = monthly_df_g['apuestas_deportivas_ggr'] + monthly_df_g['casino_ggr']
-            monthly_df_g = monthly_df_g.rename(columns={'apuestas_deportivas_ggr': 'ggr_deportiva', 'casino_ggr': 'ggr_casino'})
-            margen = 0.05
-            monthly_df_g['total_apuesta_deportiva'] = monthly_df_g['ggr_deportiva'] / margen
-            monthly_df_g['total_apuesta_casino'] = monthly_df_g['ggr_casino'] / margen
-            monthly_records.append(monthly_df_g)
+        jugadores_por_mes = sketches.count_by_month().round().astype(int).to_dict()
+        process_global(buffer, jugadores_por_mes, total_jugadores_global)
     except Exception as e:
         print(f"Error procesando la Vista Global: {e}")
     # ===================================================
 
-    # OPTIMIZACIÓN: Usar groupby para evitar escanear el DF completo por cada agente
-    for agent_name, df_agent in df.groupby('nombre_usuario_agente'):
-        try:
-            df_agent = df_agent.copy()
-            
-            # --- 1. CORE METRICS & SCORING ---
-            metricas, df_mensual_orig, df_mensual_mets = calcular_metricas_agente_con_mensual(df_agent, total_jugadores_global)
-            df_mensual = pd.merge(df_mensual_orig, df_mensual_mets, on='mes', how='left')
-            
-            # Fallback for logic_analytics changes
-            if 'calculo_comision' not in df_mensual.columns:
-                df_mensual['calculo_comision'] = df_mensual['calculo_ngr']
-            
-            # Add Clase and Risk_Safe per month (since it was removed from logic_analytics inner loop)
-            def compute_clase(s):
-                if pd.notna(s):
-                    return categorizar_agente(s)[0]
-                return 'C'
-            df_mensual['Clase'] = df_mensual['score_global'].apply(compute_clase)
-            df_mensual['Risk_Safe'] = df_mensual['Clase'].apply(lambda c: 1 if ('A' in c or 'B' in c) else 0)
-
-            score = calcular_score_total(metricas)
-            categoria, descripcion = categorizar_agente(score)
-            credito, detalles = calcular_credito_sugerido(df_mensual, score, metricas)
-            ggr_prediccion = predecir_ggr(df_mensual)
-            
-            # --- 2. DEEP ANALYSIS (RETENTION & GROWTH) ---
-            # Removed as per user request
-            
-            # Calculamos métricas resumen
-            # Removed as per user request
-            
-            # --- Build Agent Profile Record (df_agents) ---
-            record = {
-                'id_agente': df_agent['id_agente'].iloc[0] if 'id_agente' in df_agent.columns else 0,
-                'nombre_usuario_agente': agent_name,
-                'score_global': score,
-                'Clase': categoria,
-                'Risk_Safe': 1 if 'A' in categoria or 'B' in categoria else 0,
-                'credito_sugerido': credito,
-                'descripcion_categoria': descripcion,
-                'ggr_prediccion': ggr_prediccion,
-                'active_players': df_agent['jugador_id'].nunique(),
-                'total_depositos': df_mensual['total_depositos'].sum(),
-                'total_retiros': df_mensual['total_retiros'].sum(),
-                'calculo_ngr': df_mensual['calculo_ngr'].sum(),
-                'calculo_ggr': df_mensual['apuestas_deportivas_ggr'].sum() + df_mensual['casino_ggr'].sum(),
-                'calculo_comision': df_mensual['calculo_comision'].sum(),            }
-            # Add the 11 individual metric scores
-            record.update(metricas)
-            agent_records.append(record)
-            
-            # --- Collect Monthly Data for Trend/Table ---
-            if not df_mensual.empty:
-                monthly_df = df_mensual.copy()
-                monthly_df['id_agente'] = record['id_agente']
-                monthly_df['month'] = monthly_df['mes'].astype(str)
-                monthly_df['calculo_ggr'] = monthly_df['apuestas_deportivas_ggr'] + monthly_df['casino_ggr']
-                # Rename columns to match report expectations
-                monthly_df = monthly_df.rename(columns={
-                    'apuestas_deportivas_ggr': 'ggr_deportiva',
-                    'casino_ggr': 'ggr_casino',
-                })
-                # Add estimated bet columns
-                margen = 0.05
-                monthly_df['total_apuesta_deportiva'] = monthly_df['ggr_deportiva'] / margen
-                monthly_df['total_apuesta_casino'] = monthly_df['ggr_casino'] / margen
-                monthly_records.append(monthly_df)
+    if cache is not None:
+        print(f"Caché de resultados: {cache.stats()}")
+    return buffer
 
-        except Exception as e:
-            print(f"Error processing agent {agent_name}: {e}")
-            continue
 
-    # Create DataFrames
-    df_agents = pd.DataFrame(agent_records)
-    df_monthly = pd.concat(monthly_records, ignore_index=True) if monthly_records else pd.DataFrame()
+def run_forecast(buffer, cache=None):
+    """
+    Predicción de GGR del próximo mes para cada fila del buffer, a partir de su
+    serie mensual de GGR. Devuelve df_agents y df_monthly listos para los reportes.
+    """
+    print("\nCalculando predicción de GGR...")
+    for i in np.flatnonzero(buffer.filled):
+        serie = buffer.monthly_series(i, ['apuestas_deportivas_ggr', 'casino_ggr'])
+        if cache is None:
+            ggr_prediccion = predecir_ggr(serie)
+        else:
+            ggr_prediccion = cache.get_or_compute(table_fingerprint(serie, 'forecast'), lambda: predecir_ggr(serie))
+        buffer.agent['ggr_prediccion'][i] = ggr_prediccion
+
+    # Create DataFrames (un solo paso desde el buffer columnar)
+    df_agents, df_monthly = buffer.to_frames()
+    df_monthly = finalize_monthly(df_monthly)
 
     # Recalculate rank_global based on score
     if not df_agents.empty:
@@ -174,33 +260,200 @@ def main():
         # Force GLOBAL to be the #0 so it stays on top
         df_agents.loc[df_agents['id_agente'] == 'GLOBAL', 'rank_global'] = 0
         df_agents = df_agents.sort_values('rank_global').reset_index(drop=True)
-        
-        # Save backend analysis for verification/export
-        df_agents.to_csv(analysis_output, index=False)
-        print(f"Detailed analysis saved to {analysis_output}")
-    
+
     print(f"Global Aggregation done.")
     print(f"  Agents: {df_agents.shape}")
     print(f"  Monthly Rows: {df_monthly.shape}")
+    return {'df_agents': df_agents, 'df_monthly': df_monthly}
+
+
+def run_transitions(results, output_dir):
+    """
+    Matrices de transición de Clase mes a mes (por mes y total, en
+    class_transitions.csv) y rachas / meses por clase de cada agente.
+    """
+    print("\nCalculando transiciones de clase...")
+    transitions = calcular_transiciones(results['df_monthly'])
+    os.makedirs(output_dir, exist_ok=True)
+    transitions_output = os.path.join(output_dir, 'class_transitions.csv')
+    tabla_transiciones(transitions, month_label).to_csv(transitions_output, index=False)
+    total = transitions['total']
+    print(f"  Transiciones: {int(total.sum())} ({int(total.sum() - np.trace(total))} con cambio de clase)")
+    print(f"Transition matrices saved to {transitions_output}")
+    return transitions
+
+
+def run_retention(loaded, output_dir):
+    """
+    Curvas de retención por cohortes de cada agente y la global (en
+    retention_curves.csv) y retención a 1, 3 y 6 meses por agente.
+    """
+    print("\nCalculando retención por cohortes...")
+    activity = loaded.get('activity')
+    if activity is None:
+        activity = ActivityMatrix.from_frame(loaded['df'])
+    curves = activity.retention_curves()
+    os.makedirs(output_dir, exist_ok=True)
+    retention_output = os.path.join(output_dir, 'retention_curves.csv')
+    curves[curves['base'] > 0].to_csv(retention_output, index=False)
+    print(f"  Matriz de actividad: {activity.matrix.shape[0]} pares agente-jugador x {len(activity.months)} meses "
+          f"({activity.matrix.nnz} celdas activas)")
+    print(f"Retention curves saved to {retention_output}")
+    return {'curves': curves, 'agentes': retention_summary(curves)}
+
 
+def run_migration(loaded, output_dir):
+    """
+    Jugadores que cambian de agente principal entre meses consecutivos: flujos
+    agente -> agente (player_migration.csv) y ganados / perdidos por agente.
+    """
+    print("\nCalculando migración de jugadores entre agentes...")
+    migration = calcular_migracion(PlayerAgentMap.from_frame(loaded['df']))
+    os.makedirs(output_dir, exist_ok=True)
+    migration_output = os.path.join(output_dir, 'player_migration.csv')
+    tabla_flujos(migration, month_label).to_csv(migration_output, index=False)
+    print(f"  Jugadores que cambiaron de agente: {int(migration['total'].sum())}")
+    print(f"Player migration flows saved to {migration_output}")
+    return migration
+
+
+def merge_agent_columns(df_agents, agentes):
+    """Une columnas por agente a df_agents; los enteros quedan como Int64 (sin pasar a float por los vacíos)."""
+    df_agents = df_agents.merge(agentes, on='id_agente', how='left')
+    enteros = agentes.select_dtypes('integer').columns.drop('id_agente', errors='ignore')
+    df_agents[enteros] = df_agents[enteros].astype('Int64')
+    return df_agents
+
+
+def run_report(results, output_dir, assets, transitions=None, retention=None, migration=None):
+    """Análisis por agente (CSV) y dashboard principal."""
+    df_agents, df_monthly = results['df_agents'], results['df_monthly']
+    # Columnas por agente de las etapas opcionales: rachas de clase, retención y migración
+    # (la vista global queda vacía donde la etapa no la calcula)
+    for stage, key in ((transitions, 'agentes'), (retention, 'agentes'), (migration, 'resumen')):
+        if stage is not None:
+            df_agents = merge_agent_columns(df_agents, stage[key])
+    os.makedirs(output_dir, exist_ok=True)
+    if not df_agents.empty:
+        # Save backend analysis for verification/export
+        analysis_output = os.path.join(output_dir, 'agent_analysis.csv')
+        df_agents.to_csv(analysis_output, index=False)
+        print(f"Detailed analysis saved to {analysis_output}")
 
     print("\nGenerating Report...")
+    output_file = os.path.join(output_dir, 'dashboard.html')
+    # Pass new DFs to report generator
+    generate_html_report(df_agents, df_monthly, output_file, assets=assets)
+    print(f"Report generated at {output_file}")
+
+
+def run_historic(input_file, output_dir, assets, sketches=None, cache=None, monthly_mode=HISTORIC_MODE,
+                 migration=None):
+    """Dashboard de métricas históricas (series mensuales según monthly_mode)."""
+    print("\nGenerating Historical Metrics Dashboard...")
+    historic_out_file = os.path.join(output_dir, "metrics_historic_dashboard.html")
+    dict_data, _ = load_and_validate_data(input_file, sketches=sketches, cache=cache, monthly_mode=monthly_mode)
+    if migration is not None:
+        attach_player_migration(dict_data, migration['agentes_mes'])
+    generate_metrics_dashboard(dict_data, out_path=historic_out_file, assets=assets)
+
+
+def parse_stages(value):
+    stages = [s.strip() for s in value.split(',') if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"etapas desconocidas: {', '.join(unknown)} (opciones: {','.join(STAGES)})")
+    return stages
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Pipeline de scoring de agentes: carga, métricas, predicción y dashboards.")
+    parser.add_argument('-i', '--input', default=DEFAULT_INPUT, help='CSV detallado de jugadores')
+    parser.add_argument('-o', '--output-dir', default=DEFAULT_OUTPUT_DIR,
+                        help='directorio de dashboard.html, metrics_historic_dashboard.html y agent_analysis.csv')
+    parser.add_argument('--stages', type=parse_stages, default=list(STAGES),
+                        help=f"etapas a correr, separadas por coma (default: {','.join(STAGES)}); "
+                             "las demás se leen de los intermedios guardados")
+    parser.add_argument('--backend', choices=BACKENDS, default='serial',
+                        help="'process' reparte el scoring de los agentes en varios procesos")
+    parser.add_argument('--workers', type=int, default=None, help='procesos para --backend process (default: CPUs)')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='caché de resultados por agente e intermedios por etapa')
+    parser.add_argument('--cache-max-mb', type=int, default=RESULT_CACHE_MAX_MB,
+                        help='tamaño máximo de la caché de resultados por agente')
+    parser.add_argument('--no-cache', action='store_true', help='recalcular todos los agentes sin leer ni escribir la caché')
+    parser.add_argument('--historic-mode', choices=list(MODOS_MENSUALES), default=HISTORIC_MODE,
+                        help='evaluación mensual del dashboard histórico: cada mes o ventana móvil de 3 / 6 meses')
+    parser.add_argument('--assets', choices=ASSET_MODES, default=REPORT_ASSETS, help='modo de assets de los reportes')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    stages = set(args.stages)
+    cache = None if args.no_cache else ResultCache(os.path.join(args.cache_dir, 'agent_results'),
+                                                   args.cache_max_mb * 1024 * 1024)
+
+    # Todas las etapas se guardan con la huella de la entrada; al leerlas se valida contra la actual
+    fingerprint = input_fingerprint(args.input)
+    loaded = None
     try:
-        # Pass new DFs to report generator
-        generate_html_report(df_agents, df_monthly, output_file)
-        print(f"Report generated at {output_file}")
-        
-        # Add generation of the Historic Metrics Dashboard
-        print("\nGenerating Historical Metrics Dashboard...")
-        historic_out_file = os.path.join(os.path.dirname(output_file), "metrics_historic_dashboard.html")
-        dict_data, _ = load_and_validate_data(input_file)
-        generate_metrics_dashboard(dict_data, out_path=historic_out_file)
-        
+        if 'load' in stages:
+            loaded = run_load(args.input)
+            save_stage(args.cache_dir, 'load', loaded, fingerprint)
+        elif stages & {'score', 'retention', 'migration', 'historic'}:
+            loaded = load_stage(args.cache_dir, 'load', fingerprint)
+    except Exception as e:
+        print(f"Error loading data: {e}")
+        return 1
+
+    try:
+        if 'score' in stages:
+            buffer = run_score(loaded, cache, args.backend, args.workers)
+            save_stage(args.cache_dir, 'score', buffer, fingerprint)
+        elif 'forecast' in stages:
+            buffer = load_stage(args.cache_dir, 'score', fingerprint)
+
+        if 'forecast' in stages:
+            results = run_forecast(buffer, cache)
+            save_stage(args.cache_dir, 'forecast', results, fingerprint)
+        elif 'report' in stages or 'transitions' in stages:
+            results = load_stage(args.cache_dir, 'forecast', fingerprint)
+
+        transitions = None
+        if 'transitions' in stages:
+            transitions = run_transitions(results, args.output_dir)
+            save_stage(args.cache_dir, 'transitions', transitions, fingerprint)
+        elif 'report' in stages:
+            transitions = load_stage(args.cache_dir, 'transitions', fingerprint, optional=True)
+
+        retention = None
+        if 'retention' in stages:
+            retention = run_retention(loaded, args.output_dir)
+            save_stage(args.cache_dir, 'retention', retention, fingerprint)
+        elif 'report' in stages:
+            retention = load_stage(args.cache_dir, 'retention', fingerprint, optional=True)
+
+        migration = None
+        if 'migration' in stages:
+            migration = run_migration(loaded, args.output_dir)
+            save_stage(args.cache_dir, 'migration', migration, fingerprint)
+        elif stages & {'report', 'historic'}:
+            migration = load_stage(args.cache_dir, 'migration', fingerprint, optional=True)
+
+        if 'report' in stages:
+            run_report(results, args.output_dir, args.assets, transitions, retention, migration)
+
+        if 'historic' in stages:
+            run_historic(loaded['input'], args.output_dir, args.assets, loaded['sketches'], cache, args.historic_mode,
+                         migration)
+
     except Exception as e:
         print(f"Error generating report: {e}")
         import traceback
         traceback.print_exc()
-        return
+        return 1
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
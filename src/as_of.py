@@ -0,0 +1,148 @@
+"""
+Scoring "as-of": todos los agentes evaluados en un mes histórico.
+
+La serie mensual que guarda la etapa forecast (df_monthly) ya tiene, para cada
+(agente, mes), las 11 métricas y el score evaluados con mes_evaluacion = mes,
+es decir, lo mismo que calcular_metricas_agente(..., mes_evaluacion=mes). Con
+esa tabla pivotada una sola vez a cubos agentes x meses, evaluar todos los
+agentes en un mes M es leer la columna M, recortar el cubo de NGR a los meses
+<= M para el crédito (calcular_credito_sugerido_batch) y predecir el GGR con la
+serie hasta M. Un back-test de 24 meses no vuelve a correr el pipeline.
+
+Un agente con historia antes de M pero sin actividad en M tiene métricas y
+score 0 (como en calcular_metricas_agente); los agentes sin datos hasta M no
+aparecen. total_jugadores_global es el de la corrida del pipeline.
+
+    python src/as_of.py --mes 2024-06
+    python src/as_of.py --ultimos 24 --salida backtest.csv
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from logic_analytics import (
+    PESOS_METRICAS, categorizar_scores, categorizar_agente, calcular_credito_sugerido_batch,
+    construir_cubo_mensual, predecir_ggr_serie
+)
+from month_keys import to_month_key, month_label
+from what_if import DEFAULT_RESULTS, cargar_resultados
+
+METRICAS = list(PESOS_METRICAS.keys())
+COLUMNAS_CUBO = [*METRICAS, 'score_global', 'calculo_ngr', 'calculo_ggr']
+
+
+def construir_cubos(df_monthly, columnas=COLUMNAS_CUBO):
+    """
+    Pivota df_monthly una sola vez (construir_cubo_mensual): {columna: matriz
+    agentes x meses} (NaN donde el agente no tiene mes), más la máscara de meses
+    presentes, ids y meses.
+    """
+    cubos, ids, meses = construir_cubo_mensual(df_monthly, columnas)
+    presente = ~np.isnan(cubos['score_global'])
+    return cubos, presente, ids, meses
+
+
+def puntuar_al_mes(cubos, presente, ids, meses, mes, nombres=None):
+    """
+    Score, Clase, crédito sugerido, predicción de GGR y ranking de todos los
+    agentes evaluados en `mes` (clave entera), usando solo los meses <= mes.
+    """
+    hasta = int(np.searchsorted(meses.to_numpy(), mes, side='right'))
+    con_historia = presente[:, :hasta].any(axis=1)
+    filas = np.flatnonzero(con_historia)
+    col = hasta - 1 if hasta and meses[hasta - 1] == mes else None
+
+    def al_mes(c):
+        if col is None:
+            return np.zeros(len(filas))
+        return np.nan_to_num(cubos[c][filas, col], nan=0.0)
+
+    score = al_mes('score_global')
+    resultado = pd.DataFrame({'mes': np.full(len(filas), mes, dtype=meses.dtype), 'id_agente': ids[filas]})
+    if nombres is not None:
+        resultado.insert(2, 'nombre_usuario_agente', resultado['id_agente'].map(nombres))
+    resultado['activo'] = presente[filas, col] if col is not None else False
+    resultado['score_global'] = score
+    resultado['Clase'] = categorizar_scores(score)
+    resultado['descripcion_categoria'] = [categorizar_agente(s)[1] for s in score]
+    resultado['Risk_Safe'] = resultado['Clase'].str.contains('A|B').astype(int)
+
+    credito, _ = calcular_credito_sugerido_batch(cubos['calculo_ngr'][filas, :hasta], score, al_mes('estabilidad'))
+    resultado['credito_sugerido'] = credito
+
+    ggr = cubos['calculo_ggr'][filas, :hasta]
+    mascara = presente[filas, :hasta]
+    resultado['ggr_prediccion'] = [predecir_ggr_serie(ggr[k][mascara[k]]) for k in range(len(filas))]
+
+    for m in METRICAS:
+        resultado[m] = al_mes(m)
+
+    # Ranking entre agentes; la vista global no compite y queda en 0
+    es_global = resultado['id_agente'].astype(str) == 'GLOBAL'
+    rank = resultado['score_global'].where(~es_global).rank(ascending=False, method='min')
+    resultado['rank_global'] = rank.fillna(0).astype(int)
+    return resultado.sort_values('rank_global', kind='stable').reset_index(drop=True)
+
+
+def puntuar_historico(df_monthly, meses=None, nombres=None):
+    """
+    puntuar_al_mes para cada mes de `meses` (claves enteras; por defecto todos
+    los meses de df_monthly), sobre los mismos cubos. Devuelve una tabla larga
+    con una fila por (mes, agente).
+    """
+    cubos, presente, ids, todos = construir_cubos(df_monthly)
+    if meses is None:
+        meses = todos
+    partes = [puntuar_al_mes(cubos, presente, ids, todos, mes, nombres) for mes in meses]
+    if not partes:
+        return pd.DataFrame()
+    return pd.concat(partes, ignore_index=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score, crédito y predicción de todos los agentes en meses históricos.")
+    parser.add_argument('--resultados', default=DEFAULT_RESULTS,
+                        help='forecast.pkl de run_pipeline (default: .cache/pipeline/forecast.pkl)')
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument('--mes', action='append', default=[], help='mes a evaluar, YYYY-MM (repetible)')
+    grupo.add_argument('--ultimos', type=int, help='evaluar los últimos N meses')
+    parser.add_argument('--salida', help='CSV con una fila por (mes, agente)')
+    args = parser.parse_args(argv)
+
+    if args.resultados.endswith('.csv'):
+        parser.error("el scoring as-of necesita el forecast.pkl (agent_analysis.csv no tiene la serie mensual)")
+    df_agents, df_monthly = cargar_resultados(args.resultados)
+    nombres = df_agents.set_index('id_agente')['nombre_usuario_agente'].to_dict()
+
+    todos = np.sort(df_monthly['mes'].unique())
+    if args.mes:
+        meses = [to_month_key(m) for m in args.mes]
+    elif args.ultimos:
+        meses = todos[-args.ultimos:]
+    else:
+        meses = todos[-1:]
+
+    resultado = puntuar_historico(df_monthly, meses, nombres)
+    resultado.insert(1, 'month', month_label(resultado['mes']))
+
+    print(f"--- SCORING AS-OF: {len(meses)} meses ---")
+    resumen = resultado[resultado['id_agente'].astype(str) != 'GLOBAL'].groupby('month').agg(
+        agentes=('id_agente', 'size'),
+        activos=('activo', 'sum'),
+        score_medio=('score_global', 'mean'),
+        risk_safe=('Risk_Safe', 'sum'),
+        credito_total=('credito_sugerido', 'sum'),
+    )
+    print(resumen.to_string())
+
+    if args.salida:
+        resultado.to_csv(args.salida, index=False)
+        print(f"\n{len(resultado)} filas guardadas en {args.salida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
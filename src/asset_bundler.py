@@ -0,0 +1,342 @@
+"""
+Empaquetado de assets de los reportes HTML.
+
+Los dashboards cargan Plotly y la fuente Inter desde CDN. En redes sin salida
+(o lentas) la página queda esperando esas peticiones, así que bundle_html()
+reescribe el HTML generado según el modo:
+
+- 'cdn'    : sin cambios (comportamiento original).
+- 'inline' : archivo autocontenido; Plotly y las fuentes van embebidos.
+- 'shared' : Plotly, las fuentes y el CSS/JS estático de cada dashboard (los
+             bloques marcados con data-asset="<nombre>") se escriben una sola vez
+             en <reportes>/assets/ con nombre por hash de contenido
+             (ej. dashboard.<hash>.js); el HTML solo lleva los datos y las
+             referencias. start_server sirve assets/ como inmutable, así que al
+             regenerar los reportes el navegador solo vuelve a bajar los datos.
+
+En los modos offline también se minifican los bloques <style> y <script>.
+
+Los modos offline necesitan los archivos vendorizados; si falta alguno,
+bundle_html lanza FileNotFoundError antes de escribir nada (no hay vuelta
+silenciosa al CDN):
+
+- Plotly: los templates están escritos para la versión de su tag de CDN
+  (plotly-2.27.0), así que solo se embebe un build de esa misma versión:
+  src/vendor/plotly.min.js (la 2.27.0 completa o un bundle parcial con solo
+  scatter, bar y scatterpolar, generado con el custom-bundle de plotly.js) o,
+  si coincide la versión, el build del paquete plotly de Python.
+- Fuentes: un .woff2 por cada familia y peso del link de Google Fonts, en
+  src/vendor/fonts/<Familia>-<peso>.woff2 (ej. Inter-600.woff2).
+"""
+
+import base64
+import glob
+import hashlib
+import os
+import re
+from functools import lru_cache
+
+ASSET_MODES = ('cdn', 'inline', 'shared')
+ASSETS_DIR = 'assets'
+VENDOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vendor')
+
+_PLOTLY_TAG = re.compile(r'<script src="https://cdn\.plot\.ly/plotly-([\d.]+)\.min\.js"></script>')
+_PLOTLY_BUILD_VERSION = re.compile(r'plotly\.js v(\d+\.\d+\.\d+)')
+_FONTS_TAG = re.compile(r'<link href="https://fonts\.googleapis\.com/[^"]+" rel="stylesheet">\n?')
+_STYLE_BLOCK = re.compile(r'<style(?: data-asset="([\w-]+)")?>(.*?)</style>', re.S)
+_SCRIPT_BLOCK = re.compile(r'<script(?: data-asset="([\w-]+)")?>(.*?)</script>', re.S)
+
+# CSS: strings (se copian tal cual) y comentarios (se descartan)
+_CSS_TOKENS = re.compile(r'("(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'|/\*[\s\S]*?\*/)')
+
+# JS. Un tramo de código puede incluir strings con comillas: no tienen saltos de
+# línea crudos, así que compactar alrededor de los saltos no los toca. Fuera de un
+# ${...} las llaves también son parte del tramo (los datos JSON salen en pocos tramos).
+_JS_QUOTED = r'"[^"\\\n]*(?:\\.[^"\\\n]*)*"|\'[^\'\\\n]*(?:\\.[^\'\\\n]*)*\''
+
+
+def _js_run(excluded):
+    return re.compile(rf'[^{excluded}]*(?:(?:{_JS_QUOTED})[^{excluded}]*)*')
+
+
+_JS_CODE = _js_run('\'"`/{}')
+_JS_CODE_BRACES = _js_run('\'"`/')
+_JS_STRING = {q: re.compile(q + r'(?:[^' + q + r'\\\n]|\\[\s\S])*' + q + '?') for q in '"\''}
+_JS_TEMPLATE = re.compile(r'[^`\\$]*(?:(?:\\[\s\S]|\$(?!\{))[^`\\$]*)*')
+_JS_REGEX = re.compile(r'/(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[a-z]*')
+_JS_LINE_COMMENT = re.compile(r'//[^\n]*')
+_JS_BLOCK_COMMENT = re.compile(r'/\*[\s\S]*?(?:\*/|$)')
+_JS_WORD_TAIL = re.compile(r'[\w$]+$')
+# Después de estos caracteres o palabras una '/' abre un regex literal
+_REGEX_PREFIX_CHARS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_PREFIX_WORDS = {'return', 'typeof', 'case', 'in', 'of', 'new', 'delete', 'void', 'throw', 'else', 'do'}
+
+
+@lru_cache(maxsize=None)
+def plotly_source(version):
+    """
+    Código de plotly.js `version` para embeber: el build vendorizado o el del
+    paquete de Python, solo si son esa versión. FileNotFoundError si no hay ninguno.
+    """
+    vendored = os.path.join(VENDOR_DIR, 'plotly.min.js')
+    found = []
+    if os.path.exists(vendored):
+        with open(vendored, encoding='utf-8') as f:
+            source = f.read()
+        header = _PLOTLY_BUILD_VERSION.search(source[:500])
+        if header and header.group(1) == version:
+            return source
+        found.append(f"{vendored} es {header.group(1) if header else 'de versión desconocida'}")
+    from plotly.offline import get_plotlyjs, get_plotlyjs_version
+    if get_plotlyjs_version() == version:
+        return get_plotlyjs()
+    found.append(f"el paquete plotly trae {get_plotlyjs_version()}")
+    raise FileNotFoundError(
+        f"Los modos de assets offline necesitan plotly.js {version} en {vendored} ({'; '.join(found)}); "
+        f"vendorizarlo o usar --assets cdn")
+
+
+def vendored_fonts():
+    """[(familia, peso, ruta)] de los .woff2 en src/vendor/fonts/."""
+    fonts = []
+    for path in sorted(glob.glob(os.path.join(VENDOR_DIR, 'fonts', '*.woff2'))):
+        m = re.match(r'(.+)-(\d+)\.woff2$', os.path.basename(path))
+        if m:
+            fonts.append((m.group(1), int(m.group(2)), path))
+    return fonts
+
+
+def content_hash(data):
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def write_asset(out_dir, name, ext, content):
+    """
+    Escribe <out_dir>/assets/<name>.<hash>.<ext> si no existe y devuelve la ruta
+    relativa para el HTML. El hash en el nombre permite servirlo como inmutable.
+    Las versiones anteriores del mismo asset (<name>.<otro hash>.<ext>) se borran.
+    """
+    data = content.encode('utf-8') if isinstance(content, str) else content
+    filename = f"{name}.{content_hash(data)}.{ext}"
+    assets_dir = os.path.join(out_dir, ASSETS_DIR)
+    path = os.path.join(assets_dir, filename)
+    if not os.path.exists(path):
+        os.makedirs(assets_dir, exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+    superseded = re.compile(re.escape(name) + r'\.[0-9a-f]{10}\.' + re.escape(ext))
+    for old in os.listdir(assets_dir):
+        if old != filename and superseded.fullmatch(old):
+            os.remove(os.path.join(assets_dir, old))
+    return f"{ASSETS_DIR}/{filename}"
+
+
+def required_fonts(html):
+    """[(familia, peso)] que pide el link de Google Fonts del reporte (ej. family=Inter:wght@300;400)."""
+    tag = _FONTS_TAG.search(html)
+    if not tag:
+        return []
+    fonts = []
+    for family, weights in re.findall(r'family=([^:&"]+):wght@([\d;]+)', tag.group(0)):
+        fonts.extend((family.replace('+', ' '), int(w)) for w in weights.split(';'))
+    return fonts
+
+
+def font_face_css(mode, out_dir=None, required=()):
+    """
+    @font-face para las fuentes vendorizadas (data URI en 'inline', archivo
+    compartido en 'shared'). FileNotFoundError si falta alguna de `required`.
+    """
+    fonts = vendored_fonts()
+    missing = sorted(set(required) - {(family, weight) for family, weight, _ in fonts})
+    if missing:
+        names = ', '.join(f"{family}-{weight}.woff2" for family, weight in missing)
+        raise FileNotFoundError(
+            f"Los modos de assets offline necesitan las fuentes {names} en {os.path.join(VENDOR_DIR, 'fonts')}; "
+            f"vendorizarlas o usar --assets cdn")
+    rules = []
+    for family, weight, path in fonts:
+        with open(path, 'rb') as f:
+            data = f.read()
+        if mode == 'shared':
+            url = write_asset(out_dir, f"{family}-{weight}", 'woff2', data)
+        else:
+            url = 'data:font/woff2;base64,' + base64.b64encode(data).decode('ascii')
+        rules.append(
+            f"@font-face {{ font-family: '{family}'; font-weight: {weight}; font-display: swap; "
+            f"src: local('{family}'), url('{url}') format('woff2'); }}"
+        )
+    return '\n'.join(rules)
+
+
+def minify_css(css):
+    """Quita comentarios y espacios sobrantes sin tocar el contenido de los strings."""
+    def squeeze(code):
+        code = re.sub(r'\s+', ' ', ''.join(code))
+        return re.sub(r'\s*([{};,])\s*', r'\1', code).replace(';}', '}')
+
+    out = []
+    code = []
+    for i, part in enumerate(_CSS_TOKENS.split(css)):
+        if not i % 2:
+            code.append(part)
+        elif part.startswith('/*'):
+            code.append(' ')
+        else:
+            out.extend((squeeze(code), part))
+            code = []
+    out.append(squeeze(code))
+    return ''.join(out).strip()
+
+
+def _regex_allowed(code_tail):
+    """Si una '/' después de `code_tail` abre un regex literal (y no es una división)."""
+    code_tail = code_tail.rstrip()
+    if not code_tail:
+        return True
+    word = _JS_WORD_TAIL.search(code_tail)
+    if word:
+        return word.group() in _REGEX_PREFIX_WORDS
+    return code_tail[-1] in _REGEX_PREFIX_CHARS
+
+
+def _js_tokens(js):
+    """
+    Parte el JS en [(texto, es_código)]. Strings, regex y el texto de los
+    template literals salen como no-código; las expresiones ${...} vuelven a ser
+    código. Los comentarios se descartan (un bloque con saltos de línea deja uno).
+    """
+    parts = []
+    template_depth = []  # por cada ${ abierto: llaves abiertas dentro de la expresión
+    tail = ''            # código reciente, para distinguir regex de división
+    in_template = False
+    pos, n = 0, len(js)
+
+    while pos < n:
+        if in_template:
+            end = _JS_TEMPLATE.match(js, pos).end()
+            if js.startswith('${', end):
+                parts.append((js[pos:end + 2], False))
+                template_depth.append(0)
+                tail = '{'
+                pos = end + 2
+            else:
+                parts.append((js[pos:end + 1], False))
+                tail = 'x'
+                pos = end + 1
+            in_template = False
+            continue
+
+        m = (_JS_CODE if template_depth else _JS_CODE_BRACES).match(js, pos)
+        if m.end() > pos:
+            parts.append((m.group(), True))
+            tail = (tail + m.group())[-64:]
+            pos = m.end()
+            continue
+
+        c = js[pos]
+        if c in '"\'':
+            m = _JS_STRING[c].match(js, pos)
+            parts.append((m.group(), False))
+            tail = 'x'
+            pos = m.end()
+        elif c == '`':
+            parts.append((c, False))
+            in_template = True
+            pos += 1
+        elif c == '}' and template_depth and template_depth[-1] == 0:
+            template_depth.pop()
+            parts.append((c, False))
+            in_template = True
+            pos += 1
+        elif c in '{}':
+            if template_depth:
+                template_depth[-1] += 1 if c == '{' else -1
+            parts.append((c, True))
+            tail = c
+            pos += 1
+        elif js.startswith('//', pos):
+            pos = _JS_LINE_COMMENT.match(js, pos).end()
+        elif js.startswith('/*', pos):
+            m = _JS_BLOCK_COMMENT.match(js, pos)
+            parts.append(('\n' if '\n' in m.group() else ' ', True))
+            pos = m.end()
+        else:
+            m = _JS_REGEX.match(js, pos) if _regex_allowed(tail) else None
+            if m:
+                parts.append((m.group(), False))
+                tail = 'x'
+                pos = m.end()
+            else:
+                parts.append((c, True))
+                tail = (tail + c)[-64:]
+                pos += 1
+    return parts
+
+
+def minify_js(js):
+    """
+    Minificación conservadora: quita comentarios, indentación y líneas vacías
+    del código. Strings, regex y template literals (con sus saltos de línea) se
+    copian tal cual. Mantiene los saltos de línea del código, así que no depende
+    de la inserción automática de ';'.
+    """
+    def squeeze(code):
+        # Sin indentación ni líneas vacías; los extremos siguen pegados a los literales vecinos
+        lines = ''.join(code).split('\n')
+        if len(lines) == 1:
+            return lines[0]
+        middle = [line.strip() for line in lines[1:-1]]
+        return '\n'.join([lines[0].rstrip(), *filter(None, middle), lines[-1].lstrip()])
+
+    out = []
+    code = []
+    for text, is_code in _js_tokens(js):
+        if is_code:
+            code.append(text)
+        else:
+            out.extend((squeeze(code), text))
+            code = []
+    out.append(squeeze(code))
+    return ''.join(out).strip()
+
+
+def bundle_html(html, mode='inline', out_dir=None):
+    """Reescribe un reporte generado según el modo de assets (ver docstring del módulo)."""
+    if mode not in ASSET_MODES:
+        raise ValueError(f"Modo de assets desconocido: {mode!r} (opciones: {', '.join(ASSET_MODES)})")
+    if mode == 'cdn':
+        return html
+    if mode == 'shared' and out_dir is None:
+        raise ValueError("El modo 'shared' necesita out_dir para escribir los assets")
+    # Validar los archivos vendorizados antes de escribir ningún asset
+    plotly = _PLOTLY_TAG.search(html)
+    plotly_js = plotly_source(plotly.group(1)) if plotly else None
+    fonts = font_face_css(mode, out_dir, required_fonts(html))
+
+    def style_block(m):
+        css = minify_css(m.group(2))
+        if mode == 'shared' and m.group(1):
+            return f'<link rel="stylesheet" href="{write_asset(out_dir, m.group(1), "css", css)}">'
+        return f"<style>{css}</style>"
+
+    def script_block(m):
+        js = minify_js(m.group(2))
+        if mode == 'shared' and m.group(1):
+            return f'<script src="{write_asset(out_dir, m.group(1), "js", js)}"></script>'
+        return f"<script>{js}</script>"
+
+    # Minificar antes de insertar Plotly para no recorrer sus ~4 MB
+    html = _STYLE_BLOCK.sub(style_block, html)
+    html = _SCRIPT_BLOCK.sub(script_block, html)
+
+    html = _FONTS_TAG.sub(f"<style>{minify_css(fonts)}</style>" if fonts else '', html, count=1)
+
+    def plotly_tag(m):
+        if mode == 'shared':
+            return f'<script src="{write_asset(out_dir, "plotly", "min.js", plotly_js)}"></script>'
+        return '<script>' + plotly_js.replace('</script', '<\\/script') + '</script>'
+
+    return _PLOTLY_TAG.sub(plotly_tag, html, count=1)
@@ -0,0 +1,129 @@
+"""
+Transiciones de clase mes a mes.
+
+A partir de la Clase de cada (agente, mes) de la serie mensual (df_monthly de
+la etapa forecast) arma, sin recorrer agentes en Python:
+
+- matrices de transición Clase del mes anterior (filas) -> Clase del mes
+  (columnas), una por mes y la total, contando solo agentes con datos en dos
+  meses calendario consecutivos (np.bincount sobre el índice aplanado);
+- por agente: clase y racha actual, racha más larga, cambios de clase
+  (subidas / bajadas) y meses en cada clase.
+
+Las clases se codifican por su posición en CATEGORIAS (0 = C ... 9 = A+++), así
+que destino > origen es una subida.
+"""
+
+import numpy as np
+import pandas as pd
+
+from logic_analytics import CATEGORIAS
+
+
+def codigos_clase(clases):
+    """Código de cada Clase según CATEGORIAS (-1 si no es una clase conocida)."""
+    return pd.Categorical(clases, categories=CATEGORIAS).codes.astype(np.int64)
+
+
+def calcular_transiciones(df_monthly, id_col='id_agente', mes_col='mes'):
+    """
+    Matrices de transición y rachas de todos los agentes (la vista global se
+    excluye). Devuelve un dict con:
+
+    - 'clases': CATEGORIAS; 'meses': claves de mes (mes de destino de por_mes)
+    - 'por_mes': arreglo (meses x clases x clases) de conteos
+    - 'total': matriz (clases x clases) sumando todos los meses
+    - 'agentes': DataFrame con una fila por agente
+    """
+    df = df_monthly[df_monthly[id_col].astype(str) != 'GLOBAL']
+    clase = codigos_clase(df['Clase'])
+    df = df.loc[clase >= 0]
+    clase = clase[clase >= 0]
+
+    agente, ids = pd.factorize(df[id_col])
+    mes = df[mes_col].to_numpy(dtype=np.int64)
+    meses = np.unique(mes)
+    K, A, M = len(CATEGORIAS), len(ids), len(meses)
+
+    orden = np.lexsort((mes, agente))
+    a, m, c = agente[orden], mes[orden], clase[orden]
+
+    # Pares (mes anterior, mes) del mismo agente en meses calendario consecutivos
+    consecutivo = (a[1:] == a[:-1]) & (m[1:] - m[:-1] == 1)
+    origen, destino = c[:-1][consecutivo], c[1:][consecutivo]
+    a_trans = a[1:][consecutivo]
+    mi = np.searchsorted(meses, m[1:][consecutivo])
+    por_mes = np.bincount((mi * K + origen) * K + destino, minlength=M * K * K).reshape(M, K, K)
+
+    # Rachas: tramos de meses consecutivos del mismo agente en la misma clase
+    inicio = np.ones(len(a), dtype=bool)
+    inicio[1:] = ~(consecutivo & (c[1:] == c[:-1]))
+    tramo = np.cumsum(inicio) - 1
+    largo = np.bincount(tramo)
+    tramo_agente, tramo_clase = a[inicio], c[inicio]
+    ultimo = np.ones(len(largo), dtype=bool)
+    ultimo[:-1] = tramo_agente[1:] != tramo_agente[:-1]
+
+    racha_max = np.zeros(A, dtype=np.int64)
+    np.maximum.at(racha_max, tramo_agente, largo)
+    # Clase de la racha más larga (la más reciente si hay empate)
+    es_max = largo == racha_max[tramo_agente]
+    clase_racha_max = np.full(A, -1, dtype=np.int64)
+    clase_racha_max[tramo_agente[es_max]] = tramo_clase[es_max]
+
+    meses_en_clase = np.bincount(a * K + c, minlength=A * K).reshape(A, K)
+    categorias = np.asarray(CATEGORIAS, dtype=object)
+    agentes = pd.DataFrame({
+        id_col: ids,
+        'clase_actual': categorias[tramo_clase[ultimo]],
+        'racha_actual': largo[ultimo],
+        'racha_max': racha_max,
+        'clase_racha_max': categorias[clase_racha_max],
+        'cambios_clase': np.bincount(a_trans[origen != destino], minlength=A),
+        'subidas': np.bincount(a_trans[destino > origen], minlength=A),
+        'bajadas': np.bincount(a_trans[destino < origen], minlength=A),
+        'meses_con_datos': meses_en_clase.sum(axis=1),
+    })
+    for k, nombre in enumerate(CATEGORIAS):
+        agentes[f'meses_{nombre}'] = meses_en_clase[:, k]
+
+    return {
+        'clases': list(CATEGORIAS),
+        'meses': meses,
+        'por_mes': por_mes,
+        'total': por_mes.sum(axis=0),
+        'agentes': agentes,
+    }
+
+
+def matriz_df(matriz):
+    """Matriz de transición como DataFrame (filas = clase de origen, columnas = destino)."""
+    return pd.DataFrame(matriz, index=pd.Index(CATEGORIAS, name='desde'),
+                        columns=pd.Index(CATEGORIAS, name='hacia'))
+
+
+def tabla_transiciones(transiciones, etiquetas_mes=None):
+    """
+    Formato largo (mes, desde, hacia, agentes) de las celdas no vacías, con el
+    total bajo mes = 'total'. etiquetas_mes convierte las claves de mes a texto.
+    """
+    M, K, _ = transiciones['por_mes'].shape
+    mi, desde, hacia = np.nonzero(transiciones['por_mes'])
+    meses = transiciones['meses'][mi]
+    if etiquetas_mes is not None:
+        meses = etiquetas_mes(meses)
+    categorias = np.asarray(CATEGORIAS, dtype=object)
+    por_mes = pd.DataFrame({
+        'mes': meses,
+        'desde': categorias[desde],
+        'hacia': categorias[hacia],
+        'agentes': transiciones['por_mes'][mi, desde, hacia],
+    })
+    desde, hacia = np.nonzero(transiciones['total'])
+    total = pd.DataFrame({
+        'mes': 'total',
+        'desde': categorias[desde],
+        'hacia': categorias[hacia],
+        'agentes': transiciones['total'][desde, hacia],
+    })
+    return pd.concat([por_mes, total], ignore_index=True)
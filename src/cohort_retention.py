@@ -0,0 +1,172 @@
+"""
+Retención por cohortes con una matriz dispersa de actividad jugador x mes.
+
+ActivityMatrix se arma una sola vez desde el DataFrame de load_data: una fila
+por par (agente, jugador) y una columna por mes del calendario (meses sin datos
+incluidos), con 1 donde el jugador tuvo actividad con ese agente. La cohorte de
+un par es su primer mes activo.
+
+Las curvas salen de productos de matrices dispersas, sin recorrer jugadores:
+
+- Y: la misma actividad alineada por cohorte (columna = meses desde el primer
+  mes), reindexando los índices de la CSR;
+- G: una fila por par con un 1 en la columna (grupo, cohorte);
+- G.T @ Y: jugadores de cada (grupo, cohorte) activos k meses después.
+
+El grupo es el agente, o un solo grupo global con la actividad por jugador
+(todos sus agentes combinados) = P @ X, con P jugador x pares.
+
+La retención en k meses es el total de jugadores activos k meses después de su
+cohorte sobre el tamaño de las cohortes que llegan a tener k meses de historia.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Meses desde la cohorte que se resumen por agente (retencion_m1, ...)
+SUMMARY_OFFSETS = (1, 3, 6)
+GLOBAL_ID = 'GLOBAL'
+
+
+def _first_active(X):
+    """Primera columna activa de cada fila de una CSR con índices ordenados y sin filas vacías."""
+    return X.indices[X.indptr[:-1]]
+
+
+def cohort_counts(X, groups, n_groups):
+    """
+    Matriz dispersa ((n_groups * meses) x meses): fila grupo * meses + cohorte,
+    columna k = filas de X de esa cohorte activas k meses después (k = 0 es el
+    tamaño de la cohorte). groups asigna un grupo a cada fila de X.
+    """
+    n_rows, n_months = X.shape
+    first = _first_active(X)
+    offsets = X.indices - np.repeat(first, np.diff(X.indptr))
+    ones = np.ones(X.nnz, dtype=np.int64)
+    Y = sparse.csr_matrix((ones, offsets, X.indptr), shape=(n_rows, n_months))
+    G = sparse.csr_matrix((np.ones(n_rows, dtype=np.int64), (np.arange(n_rows), groups * n_months + first)),
+                          shape=(n_rows, n_groups * n_months))
+    return (G.T @ Y).tocsr()
+
+
+def _curves(counts, n_groups, n_months):
+    """
+    (retenidos, base) por grupo y meses desde la cohorte (n_groups x meses):
+    base[g, k] = tamaño de las cohortes de g con al menos k meses de historia.
+    """
+    C = counts.tocoo()
+    retenidos = np.bincount((C.row // n_months) * n_months + C.col, weights=C.data,
+                            minlength=n_groups * n_months).reshape(n_groups, n_months)
+    tamanos = np.asarray(counts[:, 0].todense()).reshape(n_groups, n_months)
+    # Cohorte c observable k meses después si c + k <= último mes: base = cumsum hasta mes - k
+    acumulado = np.cumsum(tamanos, axis=1)
+    base = acumulado[:, ::-1]
+    return retenidos, base
+
+
+class ActivityMatrix:
+    """Actividad (agente, jugador) x mes en CSR, con sus agentes, jugadores y meses."""
+
+    def __init__(self, matrix, pair_agent, pair_player, agents, n_players, months):
+        self.matrix = matrix
+        self.pair_agent = pair_agent
+        self.pair_player = pair_player
+        self.agents = agents
+        self.n_players = n_players
+        self.months = months
+
+    @classmethod
+    def from_frame(cls, df, agent_col='id_agente', month_col='mes', player_col='jugador_id'):
+        """
+        Construye la matriz desde el DataFrame de load_data. Las filas sin mes
+        (fecha inválida) se ignoran; varias filas del mismo (agente, jugador, mes)
+        cuentan una vez.
+        """
+        valid = df[month_col].notna().to_numpy()
+        agent_codes, agents = pd.factorize(df[agent_col].to_numpy()[valid], sort=True)
+        player_codes, players = pd.factorize(df[player_col].to_numpy()[valid])
+        mes = df[month_col].to_numpy()[valid].astype(np.int64)
+        inicio = mes.min() if len(mes) else 0
+        n_months = int(mes.max() - inicio + 1) if len(mes) else 0
+
+        pares, pair_rows = np.unique(agent_codes.astype(np.int64) * len(players) + player_codes,
+                                     return_inverse=True)
+        X = sparse.csr_matrix((np.ones(len(mes), dtype=np.int8), (pair_rows, mes - inicio)),
+                              shape=(len(pares), n_months))
+        X.sum_duplicates()
+        X.data[:] = 1
+        X.sort_indices()
+        months = pd.Index(np.arange(inicio, inicio + n_months, dtype=np.int64), name=month_col)
+        n_players = max(len(players), 1)
+        return cls(X, pares // n_players, pares % n_players, agents, len(players), months)
+
+    def player_matrix(self):
+        """Actividad jugador x mes con todos sus agentes combinados (P @ X)."""
+        n_pairs = self.matrix.shape[0]
+        P = sparse.csr_matrix((np.ones(n_pairs, dtype=np.int32), (self.pair_player, np.arange(n_pairs))),
+                              shape=(self.n_players, n_pairs))
+        X = (P @ self.matrix).tocsr()
+        X.data[:] = 1
+        X.sort_indices()
+        return X
+
+    def counts(self, by_agent=True):
+        """cohort_counts por agente (grupos = agentes) o global (un grupo, por jugador)."""
+        if by_agent:
+            return cohort_counts(self.matrix, self.pair_agent, len(self.agents))
+        X = self.player_matrix()
+        return cohort_counts(X, np.zeros(X.shape[0], dtype=np.int64), 1)
+
+    def retention_curves(self):
+        """
+        Curva de retención de cada agente y la global: una fila por (id_agente,
+        meses desde la cohorte) con base (jugadores de cohortes observables),
+        retenidos y retencion (% de la base).
+        """
+        n_months = len(self.months)
+        ids = np.concatenate([np.asarray([GLOBAL_ID], dtype=object), np.asarray(self.agents, dtype=object)])
+        partes = [_curves(self.counts(by_agent=False), 1, n_months),
+                  _curves(self.counts(by_agent=True), len(self.agents), n_months)]
+        retenidos = np.vstack([p[0] for p in partes])
+        base = np.vstack([p[1] for p in partes])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            retencion = np.where(base > 0, retenidos / np.where(base > 0, base, 1) * 100, np.nan)
+        return pd.DataFrame({
+            'id_agente': np.repeat(ids, n_months),
+            'meses': np.tile(np.arange(n_months), len(ids)),
+            'base': base.ravel().astype(np.int64),
+            'retenidos': retenidos.ravel().astype(np.int64),
+            'retencion': retencion.ravel(),
+        })
+
+    def cohort_table(self, by_agent=True):
+        """
+        Formato largo de las cohortes: (id_agente, cohorte, meses, jugadores,
+        tamano_cohorte, retencion) para las celdas no vacías.
+        """
+        n_months = len(self.months)
+        counts = self.counts(by_agent)
+        C = counts.tocoo()
+        tamanos = np.asarray(counts[:, 0].todense()).ravel()
+        grupo, cohorte = C.row // n_months, C.row % n_months
+        ids = np.asarray(self.agents, dtype=object)[grupo] if by_agent else np.full(C.nnz, GLOBAL_ID, dtype=object)
+        tabla = pd.DataFrame({
+            'id_agente': ids,
+            'cohorte': self.months.to_numpy()[cohorte],
+            'meses': C.col,
+            'jugadores': C.data.astype(np.int64),
+            'tamano_cohorte': tamanos[C.row].astype(np.int64),
+        })
+        tabla['retencion'] = tabla['jugadores'] / tabla['tamano_cohorte'] * 100
+        orden = np.lexsort((C.col, cohorte, grupo))
+        return tabla.iloc[orden].reset_index(drop=True)
+
+
+def retention_summary(curves, offsets=SUMMARY_OFFSETS):
+    """Retención (%) a los meses indicados por agente: columnas retencion_m1, retencion_m3, ..."""
+    sub = curves[curves['meses'].isin(offsets)]
+    tabla = sub.pivot(index='id_agente', columns='meses', values='retencion')
+    tabla = tabla.reindex(columns=list(offsets))
+    tabla.columns = [f'retencion_m{k}' for k in offsets]
+    return tabla.reset_index()
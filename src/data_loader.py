@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 
+from month_keys import to_month_key
+
 def load_data(file_path):
     """
     Loads raw player data from CSV and performs initial preprocessing.
@@ -40,8 +42,18 @@ def load_data(file_path):
         # Convert 'creado' to datetime
         if 'creado' in df.columns:
             df['creado'] = pd.to_datetime(df['creado'], errors='coerce')
+            # Rows without a valid date are kept: they have no month (NA key, so the
+            # monthly groupbys skip them) but still count toward the player totals
+            invalid = df['creado'].isna()
+            if invalid.any():
+                print(f"Warning: {int(invalid.sum())} rows with invalid dates have no month; "
+                      f"they only count toward player totals")
+            # 'mes' is computed once here (int32 key year*12+month, see month_keys) so the
+            # per-agent metric functions can work on read-only views instead of copying
+            # and re-parsing dates
+            df['mes'] = to_month_key(df['creado'])
             # Create a 'month' column for compatibility if needed elsewhere
-            df['month'] = df['creado'].dt.to_period('M')
+            df['month'] = df['mes']
             df['date'] = df['creado'] # Alias for compatibility
         
         # Ensure numerical columns are floats/ints and fill NaNs
@@ -14,6 +14,8 @@ import numpy as np
 import pandas as pd
 from datetime import datetime
 
+from month_keys import MONTH_KEY_DTYPE, to_month_key
+
 # ============================================================================
 # CONSTANTES - PESOS DE LAS MÉTRICAS
 # ============================================================================
@@ -91,22 +93,29 @@ def calcular_factor_tendencia(tendencia):
 # CÁLCULO DE LAS 11 MÉTRICAS
 # ============================================================================
 
-def calcular_metricas_agente(df_agente: pd.DataFrame, total_jugadores_global: int = 1, mes_evaluacion=None):
-    metricas = {k: 0.0 for k in PESOS_METRICAS.keys()}
-    
-    if df_agente is None or len(df_agente) == 0 or 'creado' not in df_agente.columns:
-        return metricas, pd.DataFrame()
-        
-    df_agente = df_agente.copy()
-    df_agente['creado'] = pd.to_datetime(df_agente['creado'], errors='coerce')
-    df_agente = df_agente.dropna(subset=['creado'])
-    
-    if len(df_agente) == 0:
-        return metricas, pd.DataFrame()
-        
-    df_agente['mes'] = df_agente['creado'].dt.to_period('M')
-    
-    # Agrupar por mes
+def preparar_df_agente(df_agente: pd.DataFrame) -> pd.DataFrame:
+    """
+    Asegura las columnas 'creado' (datetime) y 'mes' (clave entera año*12+mes, ver month_keys).
+    Si ya vienen precalculadas (load_data) el DataFrame se usa tal cual, como
+    vista de solo lectura y sin copia (las filas con fecha inválida traen mes NA
+    y agregar_mensual las omite); si no, se copia, se calculan una vez y las filas
+    con fecha inválida se descartan.
+    """
+    if 'mes' in df_agente.columns and pd.api.types.is_datetime64_any_dtype(df_agente['creado']):
+        return df_agente
+
+    df = df_agente.copy()
+    df['creado'] = pd.to_datetime(df['creado'], errors='coerce')
+    df = df.dropna(subset=['creado'])
+    df['mes'] = to_month_key(df['creado'])
+    return df
+
+def agregar_mensual(df_agente: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tabla mensual agregada del agente (sumas por mes y jugadores distintos).
+    Es todo lo que las métricas leen de los datos crudos, así que también sirve
+    como huella del agente para la caché de resultados.
+    """
     agg_dict = {
         'calculo_ngr': 'sum',
         'num_depositos': 'sum',
@@ -128,8 +137,38 @@ def calcular_metricas_agente(df_agente: pd.DataFrame, total_jugadores_global: in
         agg_dict['total_apuesta_casino'] = 'sum'
         
     df_mensual = df_agente.groupby('mes').agg(agg_dict).reset_index()
+    # Las filas sin mes (NA) quedan fuera del groupby; la clave vuelve a ser int32
+    df_mensual['mes'] = df_mensual['mes'].astype(MONTH_KEY_DTYPE)
     df_mensual = df_mensual.rename(columns={'jugador_id': 'jugador_id_unique'})
+    return df_mensual
+
+def calcular_metricas_agente(df_agente: pd.DataFrame, total_jugadores_global: int = 1, mes_evaluacion=None):
+    metricas = {k: 0.0 for k in PESOS_METRICAS.keys()}
     
+    if df_agente is None or len(df_agente) == 0 or 'creado' not in df_agente.columns:
+        return metricas, pd.DataFrame()
+        
+    df_agente = preparar_df_agente(df_agente)
+    
+    if len(df_agente) == 0:
+        return metricas, pd.DataFrame()
+    
+    # Agrupar por mes
+    df_mensual = agregar_mensual(df_agente)
+    return calcular_metricas_desde_tabla(df_mensual, total_jugadores_global, mes_evaluacion)
+
+def calcular_metricas_desde_tabla(df_mensual: pd.DataFrame, total_jugadores_global: int = 1, mes_evaluacion=None):
+    """
+    Las 11 métricas a partir de la tabla mensual agregada (agregar_mensual) en
+    lugar de los datos crudos. Permite evaluar varios meses con una sola
+    agregación y calcular la vista global sumando las tablas de los agentes.
+    """
+    metricas = {k: 0.0 for k in PESOS_METRICAS.keys()}
+
+    if df_mensual is None or len(df_mensual) == 0:
+        return metricas, pd.DataFrame()
+
+    df_mensual = df_mensual.copy()
     for c in ['total_apuesta_deportiva', 'total_apuesta_casino']:
         if c in df_mensual.columns:
             df_mensual[c] = pd.to_numeric(df_mensual[c], errors='coerce').fillna(0.0).replace([np.inf, -np.inf], 0.0)
@@ -198,8 +237,7 @@ def calcular_metricas_agente(df_agente: pd.DataFrame, total_jugadores_global: in
         metricas['volumen'] = 0.0
         
     # 3. FIDELIDAD DE JUGADORES (15%)
-    df_agente_mes = df_agente[df_agente['mes'] == mes_evaluacion]
-    jugadores_agente = df_agente_mes['jugador_id'].nunique()
+    jugadores_agente = row['jugador_id_unique']
     if total_jugadores_global > 0:
         proporcion = (jugadores_agente / total_jugadores_global) * 100
         metricas['fidelidad'] = min(10.0, proporcion * 2.5)
@@ -357,27 +395,39 @@ def calcular_score_total(metricas: dict) -> float:
             score += valor * PESOS_METRICAS[metrica]
     return score
 
+UMBRALES_CATEGORIA = [3.5, 4.5, 5.5, 6.5, 7.0, 7.5, 8.0, 8.5, 9.0]
+CATEGORIAS = ["C", "C+", "C++", "C+++", "B+", "B++", "B+++", "A+", "A++", "A+++"]
+DESCRIPCIONES_CATEGORIA = [
+    "Base - Punto de partida",
+    "Principiante - Necesita atención",
+    "En desarrollo medio - Requiere mejoras",
+    "En desarrollo avanzado - Progreso visible",
+    "Consolidado - Estable y confiable",
+    "Consolidado alto - Desempeño sólido",
+    "Consolidado superior - Buen track record",
+    "Excelencia - Muy alto desempeño",
+    "Excelencia alta - Top tier sobresaliente",
+    "Excelencia excepcional - Líderes absolutos",
+]
+
+def indices_categoria(scores) -> np.ndarray:
+    """
+    Posición en CATEGORIAS de cada score (0 = C ... 9 = A+++).
+    Los scores ausentes (NaN) se consideran clase 'C'.
+    """
+    scores = np.asarray(scores, dtype=float)
+    return np.searchsorted(UMBRALES_CATEGORIA, np.nan_to_num(scores, nan=-np.inf), side='right')
+
 def categorizar_agente(score: float) -> tuple:
-    if score >= 9.0:
-        return "A+++", "Excelencia excepcional - Líderes absolutos"
-    elif score >= 8.5:
-        return "A++", "Excelencia alta - Top tier sobresaliente"
-    elif score >= 8.0:
-        return "A+", "Excelencia - Muy alto desempeño"
-    elif score >= 7.5:
-        return "B+++", "Consolidado superior - Buen track record"
-    elif score >= 7.0:
-        return "B++", "Consolidado alto - Desempeño sólido"
-    elif score >= 6.5:
-        return "B+", "Consolidado - Estable y confiable"
-    elif score >= 5.5:
-        return "C+++", "En desarrollo avanzado - Progreso visible"
-    elif score >= 4.5:
-        return "C++", "En desarrollo medio - Requiere mejoras"
-    elif score >= 3.5:
-        return "C+", "Principiante - Necesita atención"
-    else:
-        return "C", "Base - Punto de partida"
+    idx = int(indices_categoria(score))
+    return CATEGORIAS[idx], DESCRIPCIONES_CATEGORIA[idx]
+
+def categorizar_scores(scores) -> np.ndarray:
+    """
+    Versión vectorizada de categorizar_agente: devuelve solo la clase de cada score.
+    Los scores ausentes (NaN) se consideran clase 'C'.
+    """
+    return np.asarray(CATEGORIAS, dtype=object)[indices_categoria(scores)]
 
 # ============================================================================
 # PREDICCIÓN DE GGR - MÉTODOS AVANZADOS
@@ -472,7 +522,10 @@ def predecir_ggr_proximo_mes(df_mensual: pd.DataFrame, metodo: str = "auto") ->
     for _, row in df_mensual.iterrows():
         ggr = row.get('apuestas_deportivas_ggr', 0.0) + row.get('casino_ggr', 0.0)
         ggr_mensuales.append(ggr)
-        
+    return predecir_ggr_serie(ggr_mensuales, metodo)
+
+def predecir_ggr_serie(ggr_mensuales, metodo: str = "auto") -> float:
+    """predecir_ggr_proximo_mes sobre la serie de GGR mensual ya armada (lista o arreglo, en orden)."""
     # Filtrar válidos
     ggr_mensuales = [x for x in ggr_mensuales if 0 <= x < 1e9]
     if len(ggr_mensuales) == 0: return 0.0
@@ -620,34 +673,241 @@ def calcular_credito_sugerido(df_mensual: pd.DataFrame, score: float, metricas:
     
     return round(float(credito), 2), detalles
 
+# ============================================================================
+# PREDICCIÓN CREDITICIA VECTORIZADA (TODOS LOS AGENTES)
+# ============================================================================
+
+def construir_cubo_mensual(df_mensual: pd.DataFrame, columna, id_col: str = 'id_agente', mes_col: str = 'mes'):
+    """
+    Pivota una tabla (agente, mes) a matrices agentes x meses.
+    Los meses sin registro quedan como NaN. Con una columna retorna
+    (cubo, ids_agentes, meses); con una lista de columnas pivota una sola vez y
+    retorna ({columna: cubo}, ids_agentes, meses).
+    """
+    columnas = [columna] if isinstance(columna, str) else list(columna)
+    tabla = df_mensual.pivot(index=id_col, columns=mes_col, values=columnas).sort_index(axis=1)
+    meses = tabla.columns.get_level_values(mes_col).unique().sort_values()
+    cubos = {c: tabla[c].reindex(columns=meses).to_numpy(dtype=float) for c in columnas}
+    if isinstance(columna, str):
+        return cubos[columna], tabla.index, meses
+    return cubos, tabla.index, meses
+
+
+def calcular_credito_sugerido_batch(ngr_cubo, scores, estabilidad, mascara_positivos=None, indice=None) -> tuple:
+    """
+    Versión vectorizada de calcular_credito_sugerido para todos los agentes a la vez.
+
+    ngr_cubo: matriz (agentes x meses) con el NGR mensual, NaN donde no hay mes.
+    mascara_positivos: meses que cuentan como historial válido (por defecto NGR > 0).
+    scores / estabilidad: score global y métrica de estabilidad de cada agente.
+
+    Retorna (creditos, df_detalles): un vector de créditos y una tabla con las
+    mismas claves de detalle que la versión escalar (una fila por agente).
+    """
+    ngr = np.atleast_2d(np.asarray(ngr_cubo, dtype=float))
+    n_agentes = ngr.shape[0]
+
+    if mascara_positivos is None:
+        mascara = np.nan_to_num(ngr, nan=0.0) > 0
+    else:
+        mascara = np.atleast_2d(np.asarray(mascara_positivos, dtype=bool)) & np.isfinite(ngr)
+
+    S = np.broadcast_to(np.asarray(scores, dtype=float), (n_agentes,))
+    E = np.broadcast_to(np.asarray(estabilidad, dtype=float), (n_agentes,))
+
+    n_validos = mascara.sum(axis=1)
+    hay_datos = n_validos > 0
+
+    # Filas sin meses válidos se rellenan con 0 para evitar reducciones sobre vectores vacíos
+    validos = np.where(mascara, ngr, np.nan)
+    validos[~hay_datos] = 0.0
+
+    p25 = np.nanpercentile(validos, 25, axis=1)
+    mediana = np.nanmedian(validos, axis=1)
+    base_credito = p25 * 0.6 + mediana * 0.4
+
+    # Coeficiente de variación logarítmico
+    min_ngr = np.nanmin(validos, axis=1)
+    ngr_log = np.log(validos + np.abs(min_ngr)[:, None] + 1)
+    media_log = np.nanmean(ngr_log, axis=1)
+    suma_cuad = np.nansum((ngr_log - media_log[:, None]) ** 2, axis=1)
+    desv_log = np.sqrt(suma_cuad / np.maximum(n_validos - 1, 1))
+    calc_cv = (n_validos >= 2) & (media_log != 0)
+    cv_log = np.where(calc_cv, desv_log / np.where(calc_cv, np.abs(media_log), 1.0), 0.0)
+
+    f_v = np.select([cv_log < 0.2, cv_log < 0.4, cv_log < 0.6, cv_log < 0.8],
+                    [1.00, 0.85, 0.70, 0.55], default=0.40)
+    desc_volatilidad = np.select([cv_log < 0.2, cv_log < 0.4, cv_log < 0.6, cv_log < 0.8],
+                                 ["Baja volatilidad", "Moderada", "Alta", "Muy alta"], default="Extrema")
+
+    # Tendencia lineal sobre los meses válidos (t = 1..n en orden cronológico)
+    x = np.where(mascara, ngr, 0.0)
+    t = np.where(mascara, np.cumsum(mascara, axis=1), 0)
+    n = n_validos.astype(float)
+    suma_t = n * (n + 1) / 2
+    suma_t2 = n * (n + 1) * (2 * n + 1) / 6
+    numerador = n * np.sum(t * x, axis=1) - suma_t * np.sum(x, axis=1)
+    denominador = n * suma_t2 - suma_t ** 2
+    calc_t = (n_validos >= 2) & (denominador != 0)
+    tendencia = np.where(calc_t, numerador / np.where(calc_t, denominador, 1.0), 0.0)
+
+    f_t = np.select([tendencia > 5000, tendencia > 0, tendencia >= -5000],
+                    [1.15, 1.05, 0.95], default=0.80)
+    desc_tendencia = np.select([tendencia > 5000, tendencia > 0, tendencia >= -5000],
+                               ["Crecimiento fuerte", "Crecimiento moderado", "Estancamiento"], default="Decrecimiento")
+
+    f_s_final = 0.5 + 0.06 * ((S + E) / 2)
+
+    comision_total = np.sum(x, axis=1)
+    f_volumen = np.select([comision_total >= 80000, comision_total >= 50000, comision_total >= 30000,
+                           comision_total >= 15000, comision_total >= 5000],
+                          [2.0, 1.7, 1.4, 1.2, 1.0], default=0.85)
+
+    credito = base_credito * f_s_final * f_v * f_t * f_volumen
+    credito = np.where(p25 < 50, 0.0, np.minimum(credito, 4 * mediana * f_volumen))
+    credito = np.where(n_validos < 3, credito * 0.5, credito)
+    credito = np.where(hay_datos, np.round(credito, 2), 0.0)
+
+    df_detalles = pd.DataFrame({
+        "p25": np.where(hay_datos, p25, 0.0),
+        "cv": np.where(hay_datos, cv_log, 0.0),
+        "f_volatilidad": np.where(hay_datos, f_v, 0.0),
+        "desc_volatilidad": np.where(hay_datos, desc_volatilidad, "Sin datos"),
+        "tendencia": np.where(hay_datos, tendencia, 0.0),
+        "f_tendencia": np.where(hay_datos, f_t, 0.0),
+        "desc_tendencia": np.where(hay_datos, desc_tendencia, "Sin datos"),
+        "f_score": np.where(hay_datos, f_s_final, 0.0),
+        "meses_historial": n_validos,
+        "mediana": np.where(hay_datos, mediana, 0.0),
+    }, index=indice)
+
+    return credito, df_detalles
+
 # ============================================================================
 # COMPATIBILIDAD CON CÓDIGO EXISTENTE
 # ============================================================================
 
+# Meses de la ventana móvil de cada modo mensual (None = cada mes con su propia historia)
+MODOS_MENSUALES = {"snapshot": None, "rolling_3m": 3, "rolling_6m": 6}
+# Métricas que leen la serie de meses (no solo el mes evaluado); en los modos
+# móviles se evalúan sobre los meses reales de la ventana
+METRICAS_HISTORIAL = ("estabilidad", "crecimiento", "tendencia")
+
+def meses_ventana(mode: str):
+    """Largo de la ventana móvil del modo mensual, o None para 'snapshot'."""
+    if mode not in MODOS_MENSUALES:
+        raise ValueError(f"Modo mensual desconocido: {mode!r} (opciones: {', '.join(MODOS_MENSUALES)})")
+    return MODOS_MENSUALES[mode]
+
+
+def jugadores_ventana_movil(df_agente: pd.DataFrame, meses: int) -> pd.Series:
+    """
+    Jugadores distintos en la ventana de los últimos `meses` meses calendario,
+    indexado por el mes en que termina la ventana. Cada par (jugador, mes) se
+    replica en las `meses` ventanas que lo contienen y se cuentan pares únicos,
+    sin recorrer los meses ni los jugadores en Python.
+    """
+    pares = df_agente[['jugador_id', 'mes']].dropna().drop_duplicates()
+    codigos, _ = pd.factorize(pares['jugador_id'])
+    fin = (pares['mes'].to_numpy(dtype=np.int64)[:, None] + np.arange(meses)).ravel()
+    ventanas = pd.DataFrame({'jugador': np.repeat(codigos, meses), 'mes': fin}).drop_duplicates()
+    return ventanas.groupby('mes').size()
+
+
+def tabla_ventana_movil(df_mensual: pd.DataFrame, meses: int, jugadores_ventana=None) -> pd.DataFrame:
+    """
+    Tabla mensual donde cada mes acumula los últimos `meses` meses calendario
+    (mes actual incluido; los meses sin actividad suman cero).
+
+    Las columnas aditivas se suman con `meses` desplazamientos sobre el
+    calendario denso, así que el costo es el de una pasada por mes y no se
+    vuelve a filtrar la tabla; sumar desplazamientos (en lugar de restar sumas
+    acumuladas) deja exactos los ceros que las métricas comparan por signo.
+    Los jugadores distintos no son aditivos: salen de jugadores_ventana
+    ({mes: conteo}, ver jugadores_ventana_movil o PlayerSketches.rolling_counts);
+    sin ese dato se usa el máximo mensual de la ventana, que es una cota inferior.
+    """
+    tabla = df_mensual.sort_values('mes').reset_index(drop=True)
+    if len(tabla) == 0:
+        return tabla
+
+    claves = tabla['mes'].to_numpy(dtype=np.int64)
+    posicion = claves - claves[0]
+    n_calendario = int(posicion[-1]) + 1 + meses
+    columnas = [c for c in tabla.columns if c not in ('mes', 'jugador_id_unique')]
+
+    denso = np.zeros((n_calendario, len(columnas)))
+    denso[meses + posicion] = tabla[columnas].to_numpy(dtype=float)
+    ventana = denso[meses + posicion].copy()
+    for lag in range(1, meses):
+        ventana += denso[meses + posicion - lag]
+
+    resultado = tabla[['mes']].copy()
+    for j, c in enumerate(columnas):
+        columna = ventana[:, j]
+        if pd.api.types.is_integer_dtype(tabla[c]):
+            columna = np.rint(columna).astype(tabla[c].dtype)
+        resultado[c] = columna
+
+    if jugadores_ventana is not None:
+        resultado['jugador_id_unique'] = tabla['mes'].map(jugadores_ventana).fillna(0).astype(int)
+    else:
+        unicos = np.zeros(n_calendario)
+        unicos[meses + posicion] = tabla['jugador_id_unique'].to_numpy(dtype=float)
+        maximo = unicos[meses + posicion].copy()
+        for lag in range(1, meses):
+            np.maximum(maximo, unicos[meses + posicion - lag], out=maximo)
+        resultado['jugador_id_unique'] = maximo.astype(int)
+    return resultado[list(tabla.columns)]
+
+
 def calcular_metricas_mensuales(df_agente: pd.DataFrame, total_jugadores_global: int = 1, mode: str = "snapshot") -> pd.DataFrame:
     """
     Construye un DataFrame mensual con las 11 métricas (0-10) y score_global.
-    Esta función itera sobre cada mes disponible y llama a la lógica matriz 
-    (calcular_metricas_agente), la cual internamente usa mes_evaluacion para 
-    separar cálculos del mes y cálculos históricos.
-    (El parámetro 'mode' se ignora intencionalmente porque el filtrado correcto 
-    ya lo hace de forma nativa e intrínseca calcular_metricas_agente).
+    Agrupa una sola vez por mes y evalúa cada mes disponible sobre esa tabla
+    (calcular_metricas_desde_tabla), que usa mes_evaluacion para separar
+    cálculos del mes y cálculos históricos.
+    mode: 'snapshot' evalúa cada mes tal cual; 'rolling_3m' / 'rolling_6m'
+    evalúan cada mes sobre la ventana de los últimos 3 / 6 meses (ver
+    tabla_ventana_movil).
     """
+    meses = meses_ventana(mode)
     if df_agente is None or len(df_agente) == 0 or 'creado' not in df_agente.columns:
         return pd.DataFrame(columns=["mes", *PESOS_METRICAS.keys(), "score_global"])
 
-    df = df_agente.copy()
-    df['creado'] = pd.to_datetime(df['creado'], errors='coerce')
-    df = df.dropna(subset=['creado'])
+    df = preparar_df_agente(df_agente)
     if len(df) == 0:
         return pd.DataFrame(columns=["mes", *PESOS_METRICAS.keys(), "score_global"])
 
-    df['mes'] = df['creado'].dt.to_period('M')
-    meses_disponibles = sorted(df['mes'].unique())
+    jugadores = jugadores_ventana_movil(df, meses) if meses else None
+    return calcular_metricas_mensuales_desde_tabla(agregar_mensual(df), total_jugadores_global, mode, jugadores)
+
+
+def calcular_metricas_mensuales_desde_tabla(df_mensual: pd.DataFrame, total_jugadores_global: int = 1,
+                                            mode: str = "snapshot", jugadores_ventana=None) -> pd.DataFrame:
+    """
+    Serie mensual de métricas y score_global a partir de la tabla mensual agregada.
+    En los modos móviles las métricas del mes salen de la tabla de ventanas
+    (tabla_ventana_movil: cada mes suma los últimos N meses), salvo las de
+    METRICAS_HISTORIAL (estabilidad, crecimiento, tendencia), que se evalúan
+    sobre los meses reales de la ventana del mes y no sobre toda la serie de
+    sumas móviles del agente.
+    """
+    meses = meses_ventana(mode)
+    historial = df_mensual
+    if meses:
+        df_mensual = tabla_ventana_movil(df_mensual, meses, jugadores_ventana)
+        claves = historial['mes'].to_numpy(dtype=np.int64)
+    meses_disponibles = sorted(df_mensual['mes'].dropna().unique())
 
     filas = []
     for mes in meses_disponibles:
-        metricas_mes, _ = calcular_metricas_agente(df, total_jugadores_global, mes_evaluacion=mes)
+        metricas_mes, _ = calcular_metricas_desde_tabla(df_mensual, total_jugadores_global, mes_evaluacion=mes)
+        if meses:
+            ventana = historial[(claves > mes - meses) & (claves <= mes)]
+            metricas_ventana, _ = calcular_metricas_desde_tabla(ventana, total_jugadores_global, mes_evaluacion=mes)
+            for k in METRICAS_HISTORIAL:
+                metricas_mes[k] = metricas_ventana[k]
         score_mes = calcular_score_total(metricas_mes)
 
         fila = {"mes": mes}
@@ -667,17 +927,49 @@ def calcular_metricas_agente_refactor(
 ):
     """
     Wrapper para compatibilidad. Retorna métricas globales (último mes presente en df),
-    el df agrupado original, y el df_mensual tabulado.
+    el df agrupado original, y el df_mensual tabulado según monthly_mode.
     """
-    metricas_globales, df_mensual_original = calcular_metricas_agente(df_agente, total_jugadores_global)
+    meses = meses_ventana(monthly_mode)
+    if df_agente is None or len(df_agente) == 0 or 'creado' not in df_agente.columns:
+        return calcular_metricas_agente_desde_tabla(None, total_jugadores_global, monthly_mode)
+
+    df = preparar_df_agente(df_agente)
+    tabla = agregar_mensual(df) if len(df) else None
+    jugadores = jugadores_ventana_movil(df, meses) if meses and len(df) else None
+    return calcular_metricas_agente_desde_tabla(tabla, total_jugadores_global, monthly_mode, jugadores)
+
 
-    df_metricas_mensuales = calcular_metricas_mensuales(
-        df_agente=df_agente,
-        total_jugadores_global=total_jugadores_global,
-        mode=monthly_mode
-    )
+def calcular_metricas_agente_desde_tabla(df_mensual, total_jugadores_global=1, monthly_mode="snapshot", jugadores_ventana=None):
+    """
+    Igual que calcular_metricas_agente_con_mensual pero desde la tabla mensual
+    agregada: métricas del último mes, tabla filtrada y serie mensual.
+    En los modos móviles jugadores_ventana da los jugadores distintos por ventana
+    (ver tabla_ventana_movil).
+    """
+    metricas_globales, df_mensual_original = calcular_metricas_desde_tabla(df_mensual, total_jugadores_global)
+    if df_mensual is None or len(df_mensual) == 0:
+        return metricas_globales, df_mensual_original, pd.DataFrame(columns=["mes", *PESOS_METRICAS.keys(), "score_global"])
 
+    df_metricas_mensuales = calcular_metricas_mensuales_desde_tabla(
+        df_mensual, total_jugadores_global, monthly_mode, jugadores_ventana)
     return metricas_globales, df_mensual_original, df_metricas_mensuales
 
+
+def combinar_tablas_mensuales(tablas, jugadores_por_mes) -> pd.DataFrame:
+    """
+    Tabla mensual de un grupo de agentes (p. ej. la vista global) sumando sus
+    tablas mensuales. Los jugadores distintos no se pueden sumar (un jugador puede
+    pasar por varios agentes), así que jugador_id_unique sale de jugadores_por_mes
+    ({mes: conteo}, p. ej. PlayerSketches.count_by_month()).
+    """
+    tablas = [t for t in tablas if t is not None and len(t)]
+    if not tablas:
+        return None
+    df = pd.concat(tablas, ignore_index=True)
+    columnas = [c for c in df.columns if c not in ('mes', 'jugador_id_unique')]
+    combinada = df.groupby('mes')[columnas].sum().reset_index()
+    combinada['jugador_id_unique'] = combinada['mes'].map(jugadores_por_mes).fillna(0).astype(int)
+    return combinada
+
 def calcular_metricas_agente_con_mensual(df_agente, total_jugadores_global=1, monthly_mode="snapshot", debug_validate=False):
     return calcular_metricas_agente_refactor(df_agente, total_jugadores_global, monthly_mode, debug_validate)
@@ -0,0 +1,127 @@
+"""
+Meses críticos y anomalías de las series mensuales de métricas.
+
+El dashboard histórico recorría cada serie en el navegador (una vez por gráfico
+y por cada cambio de agente) para marcar meses críticos. Acá se calcula todo de
+una vez sobre la tabla (agente, mes) x métricas: variación contra el mes
+anterior, banderas de caída / pico, mes crítico y un z-score robusto (MAD) por
+agente y métrica. Cada tipo de bandera se empaqueta en un entero con un bit por
+métrica (bit i = metrics[i]), así el navegador solo dibuja.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Orden de los enteros de banderas de cada registro
+FLAG_KINDS = ('critico', 'caida', 'pico', 'atipico')
+
+CRITICAL_SCORE = 4.0   # score del mes por debajo de este valor = mes crítico
+DROP_PCT = -30.0       # variación contra el mes anterior (%) que cuenta como caída
+SPIKE_PCT = 50.0       # variación contra el mes anterior (%) que cuenta como pico
+MAD_Z = 3.5            # |z robusto| a partir del cual el mes es atípico
+MIN_DEVIATION = 1.0    # y a la vez a 1 punto o más de la mediana (series casi constantes)
+LOW_MARGIN_PCT = 2.0   # margen real bajo con depósitos altos (rentabilidad)
+
+
+def _change_pct(values, prev, same_agent):
+    """Variación % contra el mes anterior del mismo agente (NaN sin mes previo o base <= 0)."""
+    valid = same_agent.reshape((-1,) + (1,) * (values.ndim - 1)) & (prev > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(valid, (values - prev) / np.where(valid, prev, 1.0) * 100, np.nan)
+
+
+def _robust_z(df, metrics, agent_col):
+    """
+    z = 0.6745 (x - mediana) / MAD por agente y métrica (0 donde MAD = 0), y la
+    distancia |x - mediana|.
+    """
+    grupos = df.groupby(agent_col, sort=False)
+    mediana = grupos[metrics].transform('median')
+    desvio = (df[metrics] - mediana).abs()
+    mad = desvio.groupby(df[agent_col], sort=False).transform('median').to_numpy(dtype=float)
+    distancia = desvio.to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = 0.6745 * (df[metrics] - mediana).to_numpy(dtype=float) / mad
+    return np.where(mad > 0, z, 0.0), distancia
+
+
+def _p75_by_agent(values, agent_codes):
+    """Percentil 75 por agente como lo toma el dashboard: el elemento floor(0.75 n) de la serie ordenada."""
+    orden = np.lexsort((values, agent_codes))
+    codigos = agent_codes[orden]
+    n = np.bincount(codigos)
+    inicio = np.concatenate(([0], np.cumsum(n)[:-1]))
+    return values[orden][inicio + np.floor(n * 0.75).astype(int)]
+
+
+def _rentabilidad_critical(df, agent_codes):
+    """Margen real negativo, depósitos altos con margen bajo, o mes sin depósitos."""
+    depositos = df['total_depositos'].fillna(0).to_numpy(dtype=float)
+    ngr = df['calculo_ngr'].fillna(0).to_numpy(dtype=float) if 'calculo_ngr' in df.columns else np.zeros(len(df))
+    if 'calculo_comision' in df.columns:
+        ngr = np.where(ngr != 0, ngr, df['calculo_comision'].fillna(0).to_numpy(dtype=float))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        margen = np.where(depositos > 0, ngr / np.where(depositos > 0, depositos, 1.0) * 100,
+                          np.where(ngr < 0, -100.0, np.nan))
+    p75 = _p75_by_agent(depositos, agent_codes)[agent_codes]
+    con_margen = ~np.isnan(margen)
+    return np.where(con_margen, (margen < 0) | ((depositos > p75) & (margen < LOW_MARGIN_PCT)), depositos == 0)
+
+
+def _volumen_change(df, same_agent):
+    """Variación % de transacciones (depósitos + retiros) contra el mes anterior del agente."""
+    txs = np.zeros(len(df))
+    for c in ('num_depositos', 'num_retiros'):
+        if c in df.columns:
+            txs += df[c].fillna(0).to_numpy(dtype=float)
+    return _change_pct(txs, np.roll(txs, 1), same_agent)
+
+
+def flag_metric_anomalies(df, metrics, agent_col='agente_id', month_col='month_str'):
+    """
+    Banderas de todas las filas (agente, mes) de df para las métricas dadas, en
+    una pasada vectorizada. Devuelve un DataFrame alineado con df y una columna
+    entera por tipo de FLAG_KINDS (bit i = metrics[i]):
+
+    - critico: score < CRITICAL_SCORE; rentabilidad y volumen usan la regla de su
+      gráfico (margen real y caída de transacciones);
+    - caida / pico: variación del score contra el mes anterior del agente
+      <= DROP_PCT / >= SPIKE_PCT; en volumen, la variación de transacciones
+      (son las alertas del gráfico);
+    - atipico: |z robusto (MAD)| del score dentro de la serie del agente >= MAD_Z
+      y a MIN_DEVIATION puntos o más de su mediana.
+    """
+    flags = pd.DataFrame(0, index=df.index, columns=list(FLAG_KINDS), dtype=np.int64)
+    if df.empty:
+        return flags
+
+    # Los ids mezclan enteros y 'GLOBAL': se ordena por su texto
+    claves = pd.DataFrame({'agente': df[agent_col].astype(str), 'mes': df[month_col]}, index=df.index)
+    orden = claves.sort_values(['agente', 'mes'], kind='stable').index
+    sorted_df = df.loc[orden].reset_index(drop=True)
+    agent_codes, _ = pd.factorize(claves.loc[orden, 'agente'])
+    same_agent = np.zeros(len(sorted_df), dtype=bool)
+    same_agent[1:] = agent_codes[1:] == agent_codes[:-1]
+
+    values = sorted_df[metrics].fillna(0).to_numpy(dtype=float)
+    mom = _change_pct(values, np.roll(values, 1, axis=0), same_agent)
+
+    critico = values < CRITICAL_SCORE
+    if 'rentabilidad' in metrics and 'total_depositos' in sorted_df.columns:
+        critico[:, metrics.index('rentabilidad')] = _rentabilidad_critical(sorted_df, agent_codes)
+    if 'volumen' in metrics:
+        i = metrics.index('volumen')
+        mom[:, i] = _volumen_change(sorted_df, same_agent)
+        critico[:, i] = mom[:, i] <= DROP_PCT
+
+    z, distancia = _robust_z(sorted_df.assign(**{agent_col: agent_codes}), metrics, agent_col)
+    bits = np.left_shift(1, np.arange(len(metrics)), dtype=np.int64)
+    packed = {
+        'critico': critico,
+        'caida': mom <= DROP_PCT,
+        'pico': mom >= SPIKE_PCT,
+        'atipico': (np.abs(z) >= MAD_Z) & (distancia >= MIN_DEVIATION),
+    }
+    for kind in FLAG_KINDS:
+        flags.loc[orden, kind] = (packed[kind] * bits).sum(axis=1)
+    return flags
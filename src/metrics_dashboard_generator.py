@@ -7,28 +7,53 @@ import json
 from jinja2 import Template
 
 # Import the core logic directly to avoid code duplication
-from logic_analytics import calcular_metricas_agente_con_mensual, PESOS_METRICAS
+from logic_analytics import (
+    agregar_mensual, preparar_df_agente, calcular_metricas_agente_desde_tabla,
+    combinar_tablas_mensuales, jugadores_ventana_movil, meses_ventana, PESOS_METRICAS
+)
 from data_loader import load_data
+from asset_bundler import bundle_html
+from result_cache import table_fingerprint
+from month_keys import month_label
+from metric_anomalies import flag_metric_anomalies, FLAG_KINDS
 
-def load_and_validate_data(csv_path="Data/reporte_detallado_jugadores_final.csv"):
+def load_and_validate_data(csv_path="Data/reporte_detallado_jugadores_final.csv", sketches=None, cache=None,
+                           monthly_mode="rolling_3m"):
     """
     Step 1 & Step 2: Mandatory Audit and Data Validation
     Reads the original CSV, uses logic_analytics to get the monthly aggregations (df_mensual),
     and validates that all 11 required metrics are present for visualization.
+    If `sketches` (PlayerSketches) is given, global player counts come from sketch merges
+    instead of a full groupby over player IDs.
+    If `cache` (ResultCache) is given, agents whose monthly table did not change
+    reuse their stored historical series.
+    `monthly_mode` ('snapshot', 'rolling_3m', 'rolling_6m') selects how each month's
+    metric series is evaluated (see logic_analytics.tabla_ventana_movil).
     """
     print("--- INICIANDO AUDITORÍA Y VALIDACIÓN ---")
     df = load_data(csv_path)
-    
+
     # Simulate the pipeline: Get global players to calculate fidelidad correctly
-    total_jugadores_global = df['jugador_id'].nunique() if 'jugador_id' in df.columns else 1
-    
+    if sketches is not None:
+        total_jugadores_global = int(round(sketches.count()))
+    else:
+        total_jugadores_global = df['jugador_id'].nunique() if 'jugador_id' in df.columns else 1
+
     # Calculate monthly global active players for the true Fidelidad share percentage
-    if 'creado' in df.columns and 'jugador_id' in df.columns:
-        df_temp = df.copy()
-        df_temp['mes'] = pd.to_datetime(df_temp['creado'], errors='coerce').dt.to_period('M')
-        global_monthly_players = df_temp.groupby('mes')['jugador_id'].nunique().to_dict()
+    if sketches is not None:
+        global_monthly_players = sketches.count_by_month().round().astype(int).to_dict()
+    elif 'mes' in df.columns and 'jugador_id' in df.columns:
+        global_monthly_players = df.groupby('mes')['jugador_id'].nunique().to_dict()
     else:
         global_monthly_players = {}
+
+    # Distinct players per rolling window (for the rolling monthly modes)
+    meses = meses_ventana(monthly_mode)
+    global_window_players = None
+    if meses and sketches is not None:
+        global_window_players = sketches.rolling_counts(meses).round().astype(int)
+    elif meses and 'mes' in df.columns and 'jugador_id' in df.columns:
+        global_window_players = jugadores_ventana_movil(df, meses)
     
     # We will compute the monthly data for each agent
     # To visualize trends effectively, we can pick the top 5 agents by global score,
@@ -54,52 +79,25 @@ def load_and_validate_data(csv_path="Data/reporte_detallado_jugadores_final.csv"
     elif 'agente_username' in df.columns:
         agent_names = df.groupby('id_agente')['agente_username'].first().to_dict()
         
-    # === 1. CALCULAR VISTA GLOBAL (TODAS LAS AGENCIAS) ===
-    print("Calculando métricas históricas GLOBALES...")
-    try:
-        _, df_mensual_orig_g, df_mensual_mets_g = calcular_metricas_agente_con_mensual(df, total_jugadores_global, monthly_mode="rolling_3m")
-        df_mensual_g = pd.merge(df_mensual_orig_g, df_mensual_mets_g, on='mes', how='left')
-        
-        if 'calculo_comision' not in df_mensual_g.columns: df_mensual_g['calculo_comision'] = 0.0
-        if 'calculo_ngr' not in df_mensual_g.columns: df_mensual_g['calculo_ngr'] = 0.0
-        
-        if 'active_players' not in df_mensual_g.columns:
-            if 'jugador_id_unique' in df_mensual_g.columns: df_mensual_g['active_players'] = df_mensual_g['jugador_id_unique']
-            elif 'jugador_id' in df_mensual_g.columns: df_mensual_g['active_players'] = df_mensual_g['jugador_id']
-            
-        df_mensual_g['agente_id'] = "GLOBAL"
-        df_mensual_g['agente_name'] = "🌟 VISTA GLOBAL (Todas las Agencias)"
-        
-        if 'mes' in df_mensual_g.columns:
-            df_mensual_g['month_str'] = df_mensual_g['mes'].astype(str)
-            df_mensual_g['global_players'] = df_mensual_g['mes'].map(global_monthly_players).fillna(total_jugadores_global)
-        else:
-            df_mensual_g['global_players'] = total_jugadores_global
-            
-        if 'total_apuesta_deportiva' in df_mensual_g.columns and 'total_apuesta_casino' in df_mensual_g.columns and 'total_depositos' in df_mensual_g.columns:
-            df_mensual_g['total_apuesta_total'] = df_mensual_g['total_apuesta_deportiva'].fillna(0) + df_mensual_g['total_apuesta_casino'].fillna(0)
-            df_mensual_g['eficiencia_juego'] = np.where(df_mensual_g['total_depositos'] > 0, 
-                ((df_mensual_g['total_apuesta_total'] / df_mensual_g['total_depositos']) - 1) * 100, 
-                0.0)
-            df_mensual_g['eficiencia_juego'] = df_mensual_g['eficiencia_juego'].fillna(0.0).replace([np.inf, -np.inf], 0.0)
-
-        cols_to_keep_g = ['agente_id', 'agente_name', 'month_str'] + core_metrics
-        context_cols_g = ['total_depositos', 'calculo_ngr', 'calculo_comision', 'score_global', 'active_players', 'num_depositos', 'num_retiros', 'global_players', 'casino_ggr', 'apuestas_deportivas_ggr', 'eficiencia_juego', 'total_apuesta_total']
-        for c in context_cols_g:
-            if c in df_mensual_g.columns:
-                cols_to_keep_g.append(c)
-                
-        clean_df_g = df_mensual_g[cols_to_keep_g].fillna(0).replace([np.inf, -np.inf], 0)
-        all_records.extend(clean_df_g.to_dict(orient='records'))
-    except Exception as e:
-        print(f"Advertencia: No se pudo generar la vista global. Error: {e}")
-    # =====================================================
+    tablas_agentes = []
 
     # OPTIMIZACIÓN: Iterar usando groupby es exponencialmente más rápido 
     for ag_id, df_ag in df.groupby('id_agente'): 
         if len(df_ag) == 0: continue
             
-        metricas_snapshot, df_mensual_orig, df_mensual_mets = calcular_metricas_agente_con_mensual(df_ag, total_jugadores_global, monthly_mode="rolling_3m")
+        # La tabla mensual del agente alimenta sus métricas, la huella de caché y la vista global
+        df_ag = preparar_df_agente(df_ag)
+        tabla = agregar_mensual(df_ag)
+        tablas_agentes.append(tabla)
+        jugadores = jugadores_ventana_movil(df_ag, meses) if meses else None
+        if cache is None:
+            metricas_snapshot, df_mensual_orig, df_mensual_mets = calcular_metricas_agente_desde_tabla(
+                tabla, total_jugadores_global, monthly_mode, jugadores)
+        else:
+            tabla_clave = tabla if jugadores is None else tabla.assign(jugadores_ventana=tabla['mes'].map(jugadores))
+            key = table_fingerprint(tabla_clave, 'historic', total_jugadores_global, monthly_mode)
+            metricas_snapshot, df_mensual_orig, df_mensual_mets = cache.get_or_compute(
+                key, lambda: calcular_metricas_agente_desde_tabla(tabla, total_jugadores_global, monthly_mode, jugadores))
         df_mensual = pd.merge(df_mensual_orig, df_mensual_mets, on='mes', how='left')
         
         # Aseguramos que existan, pero SIN fallback entre ellas
@@ -125,9 +123,9 @@ def load_and_validate_data(csv_path="Data/reporte_detallado_jugadores_final.csv"
         df_mensual['agente_id'] = int(ag_id)
         df_mensual['agente_name'] = agent_names.get(ag_id, str(ag_id))
         
-        # Convert Period object to string for JSON serialization
+        # Convert the integer month key to 'YYYY-MM' for JSON serialization
         if 'mes' in df_mensual.columns:
-             df_mensual['month_str'] = df_mensual['mes'].astype(str)
+             df_mensual['month_str'] = month_label(df_mensual['mes'])
              df_mensual['global_players'] = df_mensual['mes'].map(global_monthly_players).fillna(total_jugadores_global)
         else:
              df_mensual['global_players'] = total_jugadores_global
@@ -154,6 +152,51 @@ def load_and_validate_data(csv_path="Data/reporte_detallado_jugadores_final.csv"
         clean_df = df_mensual[cols_to_keep].fillna(0).replace([np.inf, -np.inf], 0)
         all_records.extend(clean_df.to_dict(orient='records'))
         
+    # === CALCULAR VISTA GLOBAL (TODAS LAS AGENCIAS) ===
+    # Suma de las tablas mensuales de los agentes; jugadores distintos por mes desde global_monthly_players
+    print("Calculando métricas históricas GLOBALES...")
+    try:
+        tabla_global = combinar_tablas_mensuales(tablas_agentes, global_monthly_players)
+        _, df_mensual_orig_g, df_mensual_mets_g = calcular_metricas_agente_desde_tabla(
+            tabla_global, total_jugadores_global, monthly_mode, global_window_players)
+        df_mensual_g = pd.merge(df_mensual_orig_g, df_mensual_mets_g, on='mes', how='left')
+        
+        if 'calculo_comision' not in df_mensual_g.columns: df_mensual_g['calculo_comision'] = 0.0
+        if 'calculo_ngr' not in df_mensual_g.columns: df_mensual_g['calculo_ngr'] = 0.0
+        
+        if 'active_players' not in df_mensual_g.columns:
+            if 'jugador_id_unique' in df_mensual_g.columns: df_mensual_g['active_players'] = df_mensual_g['jugador_id_unique']
+            elif 'jugador_id' in df_mensual_g.columns: df_mensual_g['active_players'] = df_mensual_g['jugador_id']
+            
+        df_mensual_g['agente_id'] = "GLOBAL"
+        df_mensual_g['agente_name'] = "🌟 VISTA GLOBAL (Todas las Agencias)"
+        
+        if 'mes' in df_mensual_g.columns:
+            df_mensual_g['month_str'] = month_label(df_mensual_g['mes'])
+            df_mensual_g['global_players'] = df_mensual_g['mes'].map(global_monthly_players).fillna(total_jugadores_global)
+        else:
+            df_mensual_g['global_players'] = total_jugadores_global
+            
+        if 'total_apuesta_deportiva' in df_mensual_g.columns and 'total_apuesta_casino' in df_mensual_g.columns and 'total_depositos' in df_mensual_g.columns:
+            df_mensual_g['total_apuesta_total'] = df_mensual_g['total_apuesta_deportiva'].fillna(0) + df_mensual_g['total_apuesta_casino'].fillna(0)
+            df_mensual_g['eficiencia_juego'] = np.where(df_mensual_g['total_depositos'] > 0, 
+                ((df_mensual_g['total_apuesta_total'] / df_mensual_g['total_depositos']) - 1) * 100, 
+                0.0)
+            df_mensual_g['eficiencia_juego'] = df_mensual_g['eficiencia_juego'].fillna(0.0).replace([np.inf, -np.inf], 0.0)
+
+        cols_to_keep_g = ['agente_id', 'agente_name', 'month_str'] + core_metrics
+        context_cols_g = ['total_depositos', 'calculo_ngr', 'calculo_comision', 'score_global', 'active_players', 'num_depositos', 'num_retiros', 'global_players', 'casino_ggr', 'apuestas_deportivas_ggr', 'eficiencia_juego', 'total_apuesta_total']
+        for c in context_cols_g:
+            if c in df_mensual_g.columns:
+                cols_to_keep_g.append(c)
+                
+        clean_df_g = df_mensual_g[cols_to_keep_g].fillna(0).replace([np.inf, -np.inf], 0)
+        # La vista global va primero en el selector
+        all_records[:0] = clean_df_g.to_dict(orient='records')
+    except Exception as e:
+        print(f"Advertencia: No se pudo generar la vista global. Error: {e}")
+    # =====================================================
+
     print("\n--- RESULTADO DE LA AUDITORÍA ---")
     missing_metrics = [m for m in core_metrics if m not in metrics_present]
     
@@ -167,6 +210,13 @@ def load_and_validate_data(csv_path="Data/reporte_detallado_jugadores_final.csv"
     else:
         print(f"\n❌ ERROR: Faltan las siguientes métricas en la serie temporal: {missing_metrics}")
         
+    # Critical months and anomalies for every agent and metric in one vectorized pass;
+    # each record carries one bitmask per FLAG_KINDS entry (bit i = core_metrics[i])
+    if all_records:
+        flags = flag_metric_anomalies(pd.DataFrame(all_records), core_metrics)
+        for r, f in zip(all_records, flags.to_numpy().tolist()):
+            r['flags'] = f
+
     # Restructure into a dictionary mapped by agent_id for easy JS consumption
     monthly_dict = {}
     for r in all_records:
@@ -177,10 +227,32 @@ def load_and_validate_data(csv_path="Data/reporte_detallado_jugadores_final.csv"
         
     return monthly_dict, core_metrics
 
-def generate_metrics_dashboard(monthly_dict, out_path="reports/metrics_historic_dashboard.html"):
+def attach_player_migration(monthly_dict, agentes_mes):
+    """
+    Adds jugadores_ganados / jugadores_perdidos (players whose main agent changed
+    from / to another agent that month, see player_migration) to every record.
+    GLOBAL gets the total number of players that moved between agents.
+    """
+    if agentes_mes is None or agentes_mes.empty:
+        return monthly_dict
+    labels = month_label(agentes_mes['mes'])
+    moves = {(str(a), m): (int(g), int(l)) for a, m, g, l in zip(
+        agentes_mes['id_agente'], labels, agentes_mes['jugadores_ganados'], agentes_mes['jugadores_perdidos'])}
+    total = agentes_mes.groupby(labels)['jugadores_ganados'].sum()
+    for ag_id, info in monthly_dict.items():
+        for r in info['data']:
+            if ag_id == 'GLOBAL':
+                moved = int(total.get(r.get('month_str'), 0))
+                r['jugadores_ganados'], r['jugadores_perdidos'] = moved, moved
+            else:
+                r['jugadores_ganados'], r['jugadores_perdidos'] = moves.get((ag_id, r.get('month_str')), (0, 0))
+    return monthly_dict
+
+def generate_metrics_dashboard(monthly_dict, out_path="reports/metrics_historic_dashboard.html", assets="cdn"):
     """
     Step 3: Implementation
     Generates the standalone HTML file with Plotly/JS handling the individual 11 trend charts.
+    assets: 'cdn', 'inline' or 'shared' (see asset_bundler).
     """
     print(f"\n--- GENERANDO DASHBOARD SEPARADO ({out_path}) ---")
     
@@ -234,7 +306,7 @@ def generate_metrics_dashboard(monthly_dict, out_path="reports/metrics_historic_
     <!-- Plotly Library -->
     <script src="https://cdn.plot.ly/plotly-2.27.0.min.js"></script>
     <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap" rel="stylesheet">
-    <style>
+    <style data-asset="metrics_historic">
         :root {
             --bg-color: #fcfdfe; /* Ultra soft blue-white */
             --card-bg: #ffffff;
@@ -249,7 +321,7 @@ def generate_metrics_dashboard(monthly_dict, out_path="reports/metrics_historic_
         }
         
         body { 
-            font-family: 'Inter', sans-serif; 
+            font-family: 'Inter', system-ui, -apple-system, 'Segoe UI', Roboto, sans-serif; 
             background-color: var(--bg-color); 
             color: var(--text-color); 
             margin: 0; padding: 0; 
@@ -309,7 +381,7 @@ def generate_metrics_dashboard(monthly_dict, out_path="reports/metrics_historic_
             padding: 10px 14px; 
             font-size: 13px; /* Slightly smaller to fit long names */ 
             font-weight: 600; 
-            font-family: 'Inter', sans-serif; 
+            font-family: 'Inter', system-ui, -apple-system, 'Segoe UI', Roboto, sans-serif; 
             color: #0f172a; 
             background-color: #f8fafc; 
             border: 1px solid #cbd5e1; 
@@ -586,10 +658,17 @@ def generate_metrics_dashboard(monthly_dict, out_path="reports/metrics_historic_
     </div>
 </div>
 
+<!-- Report data (changes on every generation) -->
 <script>
     const monthlyData = {{ monthly_json | safe }};
     const agentsList = {{ agents_list_json | safe }};
     const chartConfig = {{ config_json | safe }};
+    // Bit order of each record's flags (see metric_anomalies.flag_metric_anomalies)
+    const flagMetrics = {{ flag_metrics_json | safe }};
+    const flagKinds = {{ flag_kinds_json | safe }};
+</script>
+<!-- Static dashboard code (no data; cacheable as an asset) -->
+<script data-asset="metrics_historic">
     const HIDDEN_METRICS = new Set(['crecimiento', 'calidad_jugadores']);
     const metricKeys = Object.keys(chartConfig || {}).filter(k => !HIDDEN_METRICS.has(k));
 
@@ -963,6 +1042,39 @@ ${popoverContent}
         selectEl.appendChild(opt);
     });
     
+    // Lazy rendering: traces and layout are built for every metric on agent change,
+    // but Plotly only draws the charts that are in (or near) the viewport.
+    const pendingCharts = {};
+    const visibleCharts = new Set();
+    const chartObserver = ('IntersectionObserver' in window) ? new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+            const m = entry.target.dataset.metric;
+            if (entry.isIntersecting) {
+                visibleCharts.add(m);
+                mountChart(m);
+            } else {
+                visibleCharts.delete(m);
+            }
+        });
+    }, { rootMargin: '200px 0px' }) : null;
+
+    function mountChart(m) {
+        const spec = pendingCharts[m];
+        if (!spec) return;
+        delete pendingCharts[m];
+        const chartDiv = document.getElementById(`chart_${m}`);
+        if (!chartDiv._mounted) chartDiv.innerHTML = '';
+        chartDiv._initialRanges = spec.initialRanges;
+        // Plotly.react diffs against the mounted plot instead of purge + newPlot
+        Plotly.react(chartDiv, spec.traces, spec.layout, spec.config);
+        chartDiv._mounted = true;
+    }
+
+    function scheduleChart(m, spec) {
+        pendingCharts[m] = spec;
+        if (!chartObserver || visibleCharts.has(m)) mountChart(m);
+    }
+
     // Build the Grid Containers
     const gridEl = document.getElementById('chartsGrid');
     metricKeys.forEach(m => {
@@ -976,9 +1088,10 @@ ${popoverContent}
                 </div>
                 ${buildInfoIcon(m)}
             </div>
-            <div id="chart_${m}" class="chart-container"></div>
+            <div id="chart_${m}" class="chart-container" data-metric="${m}"></div>
         `;
         gridEl.appendChild(div);
+        if (chartObserver) chartObserver.observe(div.querySelector('.chart-container'));
     });
     
     // Tooltip Standardization Helpers
@@ -1047,7 +1160,13 @@ ${popoverContent}
         if (!agentDataInfo || agentDataInfo.data.length === 0) {
             // Handle Empty
             metricKeys.forEach(m => {
-                document.getElementById(`chart_${m}`).innerHTML = '<div class="empty-state">No hay suficientes datos temporales</div>';
+                const chartDiv = document.getElementById(`chart_${m}`);
+                delete pendingCharts[m];
+                if (chartDiv._mounted) {
+                    Plotly.purge(chartDiv);
+                    chartDiv._mounted = false;
+                }
+                chartDiv.innerHTML = '<div class="empty-state">No hay suficientes datos temporales</div>';
             });
             return;
         }
@@ -1098,6 +1217,31 @@ ${popoverContent}
             adp_ticktext = final_indices.map(i => formatted_x[i]);
         }
         
+        // Flags computed in Python (metric_anomalies): one bitmask per kind, one bit per metric
+        function monthFlags(kind, m) {
+            const k = flagKinds.indexOf(kind);
+            const bit = flagMetrics.indexOf(m);
+            return series.map(d => k >= 0 && bit >= 0 && d.flags ? ((d.flags[k] >> bit) & 1) === 1 : false);
+        }
+
+        // Robust (MAD) outliers: dashed marker over the month, with a hover label
+        function addAnomalyMarks(layout, x_vals, outlierFlags) {
+            layout.shapes = layout.shapes || [];
+            layout.annotations = layout.annotations || [];
+            outlierFlags.forEach((flag, i) => {
+                if (!flag) return;
+                layout.shapes.push({
+                    type: 'line', xref: 'x', yref: 'paper', x0: x_vals[i], x1: x_vals[i], y0: 0, y1: 1,
+                    layer: 'below', line: { color: 'rgba(217,119,6,0.45)', width: 1, dash: 'dot' }
+                });
+                layout.annotations.push({
+                    x: x_vals[i], xref: 'x', y: 1, yref: 'paper', yanchor: 'bottom',
+                    text: '◆', showarrow: false, font: { size: 9, color: '#d97706' },
+                    hovertext: 'Valor atípico para el agente (MAD)'
+                });
+            });
+        }
+
         // Helper specifically for Critical Month Icons (placed above the chart)
         function addCriticalEnclosure(layout, x_vals, criticalFlags) {
             if (!x_vals || typeof x_vals.length === 'undefined' || !criticalFlags || criticalFlags.length !== x_vals.length) return;
@@ -1120,11 +1264,6 @@ ${popoverContent}
         
         // Loop through 11 metrics and plot
         metricKeys.forEach(m => {
-            const chartDiv = document.getElementById(`chart_${m}`);
-            // Clean up old plot just in case
-            try { Plotly.purge(chartDiv); } catch(e){}
-            chartDiv.innerHTML = '';
-            
             const config = chartConfig[m];
             const y_vals = series.map(d => d[m] !== undefined && d[m] !== null ? d[m] : 0);
             
@@ -1179,7 +1318,7 @@ ${popoverContent}
                 const anomalies_text = [];
                 const anomalies_symbols = [];
                 const hover_texts = [];
-                const criticalFlags = [];
+                const criticalFlags = monthFlags('critico', m);
                 
                 const sorted_deps = [...deps].sort((a,b) => a - b);
                 const dep_p75 = sorted_deps[Math.floor(sorted_deps.length * 0.75)] || 0;
@@ -1213,26 +1352,22 @@ ${popoverContent}
                     margin_line_widths.push(isLast ? 3 : 2);
                     margin_line_colors.push(isLast ? '#ffffff' : '#ffffff');
                     
-                    let is_critical = false;
+                    const is_critical = criticalFlags[i];
                     let evento = "⚠ Mes crítico";
                     
                     // Anomalies detection
                     if (m_pct !== null) {
                         if (m_pct < 0) {
                             anomalies_x.push(x_vals[i]); anomalies_y.push(m_pct); anomalies_text.push('Margen Negativo'); anomalies_symbols.push('triangle-down');
-                            is_critical = true;
                             evento = "⚠ Caída crítica";
                         } else if (d > dep_p75 && m_pct < 2) { 
                             anomalies_x.push(x_vals[i]); anomalies_y.push(m_pct); anomalies_text.push('Alto Vol / Bajo Margen'); anomalies_symbols.push('circle-open');
-                            is_critical = true;
                             evento = "⚠ Pico inusual (alto vol / bajo margen)";
                         }
                     } else if (d === 0 || d === undefined) {
                          anomalies_x.push(x_vals[i]); anomalies_y.push(0); anomalies_text.push('Sin Depósitos'); anomalies_symbols.push('x');
-                         is_critical = true;
                          evento = "⚠ Sin depósitos";
                     }
-                    criticalFlags.push(is_critical);
                     
                     // Executive Tooltip Content
                     const real_data = {
@@ -1424,35 +1559,24 @@ ${popoverContent}
                 const anomalies_x = [];
                 const anomalies_y = [];
                 const anomalies_text = [];
-                const criticalFlags = [];
+                // Drops and spikes in transactions are flagged in Python (metric_anomalies)
+                const dropFlags = monthFlags('caida', m);
+                const spikeFlags = monthFlags('pico', m);
 
                 for (let i = 0; i < series.length; i++) {
                     const t = txs[i];
                     const s = scores[i];
                     const prev_t = i > 0 ? txs[i-1] : null;
-
-                    let t_var_pct = null; 
-                    let is_critical = false;           // sigue siendo SOLO caídas (<=30)
-                    let has_event = false;             // NUEVO: evento para tooltip (caídas y picos)
-                    let evento = null;                 // NUEVO: texto del evento (si solo aplica)
-                    
-                    if (prev_t !== null && prev_t > 0) {
-                        t_var_pct = ((t - prev_t) / prev_t) * 100;
-
-                        if (t_var_pct <= -30) {
-                            anomalies_x.push(x_vals[i]); anomalies_y.push(t); anomalies_text.push('Caída Crítica');
-                            is_critical = true;
-                            has_event = true;
-                            evento = "⚠ Caída crítica";
-                        } else if (t_var_pct >= 50) {
-                            anomalies_x.push(x_vals[i]); anomalies_y.push(t); anomalies_text.push('Pico Inusual');
-                            has_event = true;
-                            evento = "⚠ Pico inusual";
-                            // user objective rule says if we want to flag negative anomalies in volumen, we keep event logic. But we still flag pico if is_critical = false in earlier fix.
-                            // wait, earlier fix made is_critical ONLY true for drop <= -30%. So if is_critical = false, Evento is NOT appended.
-                        }
+                    const t_var_pct = prev_t !== null && prev_t > 0 ? ((t - prev_t) / prev_t) * 100 : null;
+
+                    let evento = null;
+                    if (dropFlags[i]) {
+                        anomalies_x.push(x_vals[i]); anomalies_y.push(t); anomalies_text.push('Caída Crítica');
+                        evento = "⚠ Caída crítica";
+                    } else if (spikeFlags[i]) {
+                        anomalies_x.push(x_vals[i]); anomalies_y.push(t); anomalies_text.push('Pico Inusual');
+                        evento = "⚠ Pico inusual";
                     }
-                    criticalFlags.push(is_critical);
 
                     // Hover tooltip
                     const real_data = {
@@ -1464,7 +1588,7 @@ ${popoverContent}
                     if (t_var_pct !== null) {
                         change_data["Δ Vol"] = (t_var_pct > 0 ? '+' : '') + formatPct(t_var_pct);
                     }
-                    if (has_event && evento) change_data["Evento"] = evento;
+                    if (evento) change_data["Evento"] = evento;
                     
                     const h_text = buildTooltipHTML(formatted_x[i], real_data, change_data, s);
                     hover_texts.push(h_text);
@@ -1507,7 +1631,6 @@ ${popoverContent}
                         hoverinfo: 'skip'
                     });
                 }
-                // addCriticalEnclosure(layout, x_vals, criticalFlags);
 
                 // Layout Overrides
                 layout.xaxis.tickvals = x_vals;
@@ -1612,7 +1735,7 @@ ${popoverContent}
                 const anomalies_x  = [];
                 const anomalies_y  = [];
                 const anomalies_text = [];
-                const criticalFlags = [];
+                const criticalFlags = monthFlags('critico', m);
                 let   last_sh_var_pp = 0;
 
                 for (let i = 0; i < series.length; i++) {
@@ -1622,7 +1745,6 @@ ${popoverContent}
 
                     let sh_var_pp  = null;
                     let sh_var_pct = null;
-                    let is_critical = false;
                     let evento = "⚠ Mes crítico";
 
                     if (prev_sh !== null) {
@@ -1640,8 +1762,7 @@ ${popoverContent}
                         }
                     }
                     
-                    is_critical = (s < 4.0);
-                    criticalFlags.push(is_critical);
+                    const is_critical = criticalFlags[i];
 
                     // ── Compact hovertemplate body ──
                     const real_data   = {
@@ -1649,6 +1770,11 @@ ${popoverContent}
                         "Jugadores Propios":  formatInt(act_vals[i]),
                         "Jugadores Globales": formatInt(glob_vals[i])
                     };
+                    // Players whose main agent changed this month (player_migration)
+                    if (series[i].jugadores_ganados !== undefined) {
+                        real_data["Ganados de otros agentes"] = formatInt(series[i].jugadores_ganados);
+                        real_data["Perdidos a otros agentes"] = formatInt(series[i].jugadores_perdidos);
+                    }
                     const change_data = {};
                     if (sh_var_pp !== null) {
                         change_data["Δ Share"] = (sh_var_pp > 0 ? '+' : '') + 
@@ -2759,12 +2885,11 @@ ${popoverContent}
                 // ═══════════════════════════════════════════════════════════ 
                 const hover_texts = []; 
                 const scores = y_vals; 
-                const criticalFlags = []; 
+                const criticalFlags = monthFlags('critico', m); 
                 let last_var_pts = 0; 
                 
                 for (let i = 0; i < series.length; i++) { 
                     const s = y_vals[i]; 
-                    criticalFlags.push(s < 4.0); 
                     const prev_s = i > 0 ? y_vals[i-1] : null; 
                     
                     const ggr_cas = series[i].ggr_casino || 0; 
@@ -3097,6 +3222,8 @@ ${popoverContent}
                 };
             }
             
+            addAnomalyMarks(layout, x_vals, monthFlags('atipico', m));
+
             const pConfig = {
                 displayModeBar: false, 
                 displaylogo: false,
@@ -3105,14 +3232,14 @@ ${popoverContent}
             
             // Capture a strict structural snapshot of the explicitly configured axes before Plotly rendering.
             // This prevents visual zooming distortion during reset caused by Plotly auto-fitting hidden structural shapes (-100% to 100%).
-            chartDiv._initialRanges = {
+            const initialRanges = {
                 'xaxis.range': (layout.xaxis && layout.xaxis.range) ? [...layout.xaxis.range] : null,
                 'yaxis.range': (layout.yaxis && layout.yaxis.range) ? [...layout.yaxis.range] : null,
                 'yaxis2.range': (layout.yaxis2 && layout.yaxis2.range) ? [...layout.yaxis2.range] : null,
                 'yaxis3.range': (layout.yaxis3 && layout.yaxis3.range) ? [...layout.yaxis3.range] : null
             };
             
-            Plotly.newPlot(chartDiv, traces, layout, pConfig);
+            scheduleChart(m, { traces, layout, config: pConfig, initialRanges });
             
         });
     }
@@ -3143,7 +3270,7 @@ ${popoverContent}
         resizeTimer = setTimeout(() => {
             metricKeys.forEach(m => {
                 const chartDiv = document.getElementById(`chart_${m}`);
-                if (chartDiv && chartDiv.children.length > 0 && !chartDiv.querySelector('.empty-state')) {
+                if (chartDiv && chartDiv._mounted) {
                     Plotly.Plots.resize(chartDiv);
                 }
             });
@@ -3159,10 +3286,13 @@ ${popoverContent}
     html_content = template.render(
         monthly_json=monthly_json,
         agents_list_json=agents_list_json,
-        config_json=config_json
+        config_json=config_json,
+        flag_metrics_json=json.dumps(list(PESOS_METRICAS.keys())),
+        flag_kinds_json=json.dumps(list(FLAG_KINDS))
     )
     
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    html_content = bundle_html(html_content, assets, out_dir=os.path.dirname(out_path))
     with open(out_path, "w", encoding="utf-8") as f:
         f.write(html_content)
         
@@ -0,0 +1,40 @@
+"""
+Claves enteras de mes.
+
+Internamente el mes se representa como un int32 año*12 + mes (ene-2024 = 24289),
+en lugar de pd.Period: agrupar, ordenar, filtrar (<= mes_evaluacion) y cruzar por
+mes corre sobre arreglos enteros nativos, y meses consecutivos difieren en 1.
+Solo en el borde de los reportes se convierte a la etiqueta 'YYYY-MM'.
+"""
+
+import numpy as np
+import pandas as pd
+
+MONTH_KEY_DTYPE = np.int32
+
+
+def to_month_key(fechas):
+    """
+    Clave año*12+mes de una Serie datetime o de un escalar de fecha/período. Si
+    la Serie tiene NaT el resultado es Int32 nullable, con NA en esas filas.
+    """
+    if isinstance(fechas, pd.Series):
+        claves = fechas.dt.year * 12 + fechas.dt.month
+        if claves.isna().any():
+            return claves.astype('Int32')
+        return claves.astype(MONTH_KEY_DTYPE)
+    fecha = pd.Period(fechas, freq='M')
+    return MONTH_KEY_DTYPE(fecha.year * 12 + fecha.month)
+
+
+def month_label(claves):
+    """Etiquetas 'YYYY-MM' de una clave o de un arreglo/Serie de claves."""
+    if np.isscalar(claves):
+        anio, mes = divmod(int(claves) - 1, 12)
+        return f"{anio:04d}-{mes + 1:02d}"
+    valores = np.asarray(claves)
+    unicas, inversa = np.unique(valores, return_inverse=True)
+    etiquetas = np.array([month_label(c) for c in unicas], dtype=object)[inversa.reshape(-1)]
+    if isinstance(claves, pd.Series):
+        return pd.Series(etiquetas, index=claves.index)
+    return etiquetas
@@ -0,0 +1,66 @@
+"""
+Intermedios por etapa del pipeline.
+
+Cada etapa de run_pipeline guarda su salida en <cache-dir>/pipeline/<etapa>.pkl
+como {'fingerprint': huella de la entrada, 'data': salida}. read_stage lee ese
+formato y el anterior (la salida sola, sin huella), así que run_pipeline y las
+herramientas que reusan la etapa forecast (what_if, weight_sensitivity, as_of)
+comparten el mismo lector.
+"""
+
+import os
+import pickle
+
+
+def stage_path(cache_dir, stage):
+    return os.path.join(cache_dir, 'pipeline', f"{stage}.pkl")
+
+
+def input_fingerprint(input_file):
+    """Huella del CSV de entrada (ruta, tamaño y fecha de modificación) que acompaña a cada etapa guardada."""
+    path = os.path.abspath(input_file)
+    if not os.path.exists(path):
+        return (path, None, None)
+    st = os.stat(path)
+    return (path, st.st_size, st.st_mtime_ns)
+
+
+def save_stage(cache_dir, stage, data, fingerprint):
+    path = stage_path(cache_dir, stage)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        pickle.dump({'fingerprint': fingerprint, 'data': data}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def read_stage(path):
+    """
+    (salida, huella) de un intermedio guardado. Los de versiones anteriores no
+    traen huella: se devuelven tal cual con huella None.
+    """
+    with open(path, 'rb') as f:
+        saved = pickle.load(f)
+    if isinstance(saved, dict) and 'fingerprint' in saved and 'data' in saved:
+        return saved['data'], saved['fingerprint']
+    return saved, None
+
+
+def load_stage(cache_dir, stage, fingerprint, optional=False):
+    """
+    Salida guardada de una etapa que no se corre en esta ejecución. Si se guardó
+    con otra entrada (huella distinta): las etapas obligatorias se usan con un
+    aviso y las opcionales (optional=True) se omiten, igual que si no existieran.
+    """
+    path = stage_path(cache_dir, stage)
+    if not os.path.exists(path):
+        if optional:
+            return None
+        raise FileNotFoundError(f"No hay resultados guardados de la etapa '{stage}' ({path}); incluirla en --stages")
+    data, saved_fingerprint = read_stage(path)
+    if saved_fingerprint != fingerprint:
+        origen = saved_fingerprint[0] if saved_fingerprint else 'una versión anterior del pipeline'
+        if optional:
+            print(f"Advertencia: la etapa '{stage}' guardada viene de otra entrada ({origen}); se omite")
+            return None
+        print(f"Advertencia: los resultados guardados de la etapa '{stage}' vienen de otra entrada ({origen})")
+    print(f"Usando resultados guardados de la etapa '{stage}' ({path})")
+    return data
@@ -0,0 +1,157 @@
+"""
+Migración de jugadores entre agentes.
+
+Un jugador puede aparecer con distintos id_agente según el mes, y eso mueve la
+fidelidad de ambos agentes sin que cambie la base real de jugadores.
+PlayerAgentMap guarda, por mes, el agente principal de cada jugador (el de más
+registros ese mes; a igualdad, el de menor código) en arreglos enteros
+compactos ordenados por (mes, jugador), con un puntero de inicio por mes como
+en una CSR.
+
+Los flujos salen de unir cada mes con el mes calendario anterior sobre esos
+arreglos ordenados (np.searchsorted): un jugador cuyo agente principal cambia
+es un jugador perdido por el agente de origen y ganado por el de destino. Las
+matrices agente x agente se arman como scipy.sparse, así que el costo no
+depende del cuadrado de la cantidad de agentes.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class PlayerAgentMap:
+    """Agente principal (código) de cada jugador (código) por mes, ordenado por (mes, jugador)."""
+
+    def __init__(self, players, agent_codes, month_ptr, agents, months):
+        self.players = players
+        self.agent_codes = agent_codes
+        self.month_ptr = month_ptr
+        self.agents = agents
+        self.months = months
+
+    @classmethod
+    def from_frame(cls, df, agent_col='id_agente', month_col='mes', player_col='jugador_id'):
+        """
+        Construye el mapa desde el DataFrame de load_data. Las filas sin mes
+        (fecha inválida) se ignoran. Los meses son el calendario completo entre
+        el primero y el último, así que un mes sin datos corta la continuidad.
+        """
+        valid = df[month_col].notna().to_numpy()
+        agent_codes, agents = pd.factorize(df[agent_col].to_numpy()[valid], sort=True)
+        player_codes, players = pd.factorize(df[player_col].to_numpy()[valid])
+        mes = df[month_col].to_numpy()[valid].astype(np.int64)
+        inicio = mes.min() if len(mes) else 0
+        n_months = int(mes.max() - inicio + 1) if len(mes) else 0
+        n_players, n_agents = max(len(players), 1), max(len(agents), 1)
+
+        # Registros por (mes, jugador, agente); np.unique deja las claves ordenadas
+        claves, registros = np.unique(((mes - inicio) * n_players + player_codes) * n_agents + agent_codes,
+                                      return_counts=True)
+        mes_jugador, agente = claves // n_agents, claves % n_agents
+        # Primero de cada (mes, jugador): más registros y, a igualdad, menor código de agente
+        orden = np.lexsort((agente, -registros, mes_jugador))
+        principal = orden[np.r_[True, mes_jugador[orden][1:] != mes_jugador[orden][:-1]]] if len(orden) else orden
+        mes_jugador, agente = mes_jugador[principal], agente[principal]
+
+        month_ptr = np.searchsorted(mes_jugador // n_players, np.arange(n_months + 1)).astype(np.int64)
+        months = pd.Index(np.arange(inicio, inicio + n_months, dtype=np.int64), name=month_col)
+        return cls((mes_jugador % n_players).astype(np.int32), agente.astype(np.int32), month_ptr, agents, months)
+
+    def month(self, i):
+        """(jugadores, agentes) del mes en la posición i, ordenados por jugador."""
+        inicio, fin = self.month_ptr[i], self.month_ptr[i + 1]
+        return self.players[inicio:fin], self.agent_codes[inicio:fin]
+
+
+def cambios_de_agente(mapa):
+    """
+    Jugadores cuyo agente principal cambia entre un mes y el siguiente: arreglos
+    (posición del mes de destino, agente de origen, agente de destino).
+    """
+    partes = []
+    for i in range(1, len(mapa.months)):
+        p0, a0 = mapa.month(i - 1)
+        p1, a1 = mapa.month(i)
+        if not len(p0) or not len(p1):
+            continue
+        idx = np.minimum(np.searchsorted(p0, p1), len(p0) - 1)
+        en_ambos = p0[idx] == p1
+        origen, destino = a0[idx[en_ambos]], a1[en_ambos]
+        cambia = origen != destino
+        partes.append((np.full(cambia.sum(), i, dtype=np.int64), origen[cambia], destino[cambia]))
+    if not partes:
+        vacio = np.zeros(0, dtype=np.int64)
+        return vacio, vacio, vacio
+    return tuple(np.concatenate(c).astype(np.int64) for c in zip(*partes))
+
+
+def calcular_migracion(mapa):
+    """
+    Flujos de jugadores entre agentes. Devuelve un dict con:
+
+    - 'agentes', 'meses': ids de agente y claves de mes (calendario)
+    - 'por_mes': sparse ((meses * agentes) x agentes), fila mes * agentes + origen
+    - 'total': sparse (agentes x agentes) origen -> destino
+    - 'agentes_mes': DataFrame (id_agente, mes, jugadores_ganados, jugadores_perdidos)
+      de los (agente, mes) con movimientos
+    - 'resumen': DataFrame por agente con ganados, perdidos, neto y el agente
+      principal de origen / destino
+    """
+    A, M = len(mapa.agents), len(mapa.months)
+    mi, origen, destino = cambios_de_agente(mapa)
+    unos = np.ones(len(mi), dtype=np.int64)
+    por_mes = sparse.csr_matrix((unos, (mi * A + origen, destino)), shape=(M * A, A))
+    total = sparse.csr_matrix((unos, (origen, destino)), shape=(A, A))
+
+    ganados_mes = np.bincount(mi * A + destino, minlength=M * A).reshape(M, A)
+    perdidos_mes = np.bincount(mi * A + origen, minlength=M * A).reshape(M, A)
+    celdas_m, celdas_a = np.nonzero(ganados_mes + perdidos_mes)
+    ids = np.asarray(mapa.agents, dtype=object)
+    agentes_mes = pd.DataFrame({
+        'id_agente': ids[celdas_a],
+        'mes': mapa.months.to_numpy()[celdas_m],
+        'jugadores_ganados': ganados_mes[celdas_m, celdas_a],
+        'jugadores_perdidos': perdidos_mes[celdas_m, celdas_a],
+    })
+
+    ganados = np.asarray(total.sum(axis=0)).ravel()
+    perdidos = np.asarray(total.sum(axis=1)).ravel()
+    principal_origen = np.asarray(total.argmax(axis=0)).ravel()
+    principal_destino = np.asarray(total.argmax(axis=1)).ravel()
+    resumen = pd.DataFrame({
+        'id_agente': ids,
+        'jugadores_ganados': ganados,
+        'jugadores_perdidos': perdidos,
+        'migracion_neta': ganados - perdidos,
+        'principal_origen': np.where(ganados > 0, ids[principal_origen], None),
+        'principal_destino': np.where(perdidos > 0, ids[principal_destino], None),
+    })
+    return {
+        'agentes': ids,
+        'meses': mapa.months.to_numpy(),
+        'por_mes': por_mes,
+        'total': total,
+        'agentes_mes': agentes_mes,
+        'resumen': resumen,
+    }
+
+
+def tabla_flujos(migracion, etiquetas_mes=None):
+    """
+    Formato largo (mes, agente_origen, agente_destino, jugadores) de los flujos
+    no vacíos. etiquetas_mes convierte las claves de mes a texto.
+    """
+    A = len(migracion['agentes'])
+    C = migracion['por_mes'].tocoo()
+    orden = np.lexsort((C.col, C.row))
+    fila, destino, jugadores = C.row[orden], C.col[orden], C.data[orden]
+    meses = migracion['meses'][fila // A]
+    if etiquetas_mes is not None:
+        meses = etiquetas_mes(meses)
+    return pd.DataFrame({
+        'mes': meses,
+        'agente_origen': migracion['agentes'][fila % A],
+        'agente_destino': migracion['agentes'][destino],
+        'jugadores': jugadores.astype(np.int64),
+    })
@@ -0,0 +1,227 @@
+"""
+Conteo de jugadores distintos con sketches combinables por (agente, mes).
+
+Fidelidad, active_players y los jugadores globales por mes dependen de
+jugador_id.nunique() a distintos niveles. En lugar de re-escanear los IDs para
+cada nivel, PlayerSketches construye una sola vez un sketch por (agente, mes) y
+responde los conteos globales, multi-mes y móviles combinando sketches:
+
+- Modo aproximado: HyperLogLog con error relativo configurable. Cada sketch se
+  guarda en forma dispersa (registro, rango) y la combinación es un máximo por
+  registro, así que unir agentes o meses no vuelve a tocar los datos crudos.
+- Modo exacto (auditorías): conjuntos de códigos de jugador; la combinación es
+  la unión de conjuntos.
+"""
+
+import numpy as np
+import pandas as pd
+
+_HASH_BITS = 64
+
+
+def _bit_length(x):
+    """Número de bits significativos de cada entero uint64 (0 -> 0)."""
+    x = x.astype(np.uint64, copy=True)
+    n = np.zeros(x.shape, dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        mask = x >= (np.uint64(1) << np.uint64(shift))
+        n[mask] += shift
+        x[mask] >>= np.uint64(shift)
+    n[x > 0] += 1
+    return n
+
+
+def precision_for_error(error_relativo):
+    """Bits de precisión HLL necesarios para un error estándar relativo dado (1.04 / sqrt(m))."""
+    if error_relativo <= 0:
+        raise ValueError("error_relativo debe ser > 0")
+    p = int(np.ceil(np.log2((1.04 / error_relativo) ** 2)))
+    return int(min(18, max(4, p)))
+
+
+def _hll_estimate(registers, p):
+    """Estimación HyperLogLog para una matriz (grupos x m) de registros."""
+    registers = np.atleast_2d(registers)
+    return _hll_from_sums(np.sum(np.exp2(-registers.astype(float)), axis=1), np.sum(registers == 0, axis=1), p)
+
+
+def _hll_sparse_estimate(groups, registers, ranks, n_groups, p):
+    """
+    Estimación HyperLogLog por grupo desde entradas dispersas (grupo, registro,
+    rango), sin armar la matriz densa (grupos x m): se ordenan los pares
+    (grupo, registro), np.maximum.reduceat deja el rango máximo de cada uno y los
+    registros ausentes (rango 0) entran como m - registros presentes.
+    """
+    m = 1 << p
+    keys = groups.astype(np.int64) * m + registers
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else keys
+    max_rank = np.maximum.reduceat(ranks[order], starts) if len(keys) else ranks[:0]
+    group_of = keys[starts] // m
+    present = np.bincount(group_of, minlength=n_groups)
+    sums = np.bincount(group_of, weights=np.exp2(-max_rank.astype(float)), minlength=n_groups) + (m - present)
+    return _hll_from_sums(sums, m - present, p)
+
+
+def _hll_from_sums(sums, zeros, p):
+    """Estimación HyperLogLog a partir de sum(2^-registro) y registros en cero por grupo."""
+    m = 1 << p
+    if m >= 128:
+        alpha = 0.7213 / (1 + 1.079 / m)
+    elif m == 64:
+        alpha = 0.709
+    elif m == 32:
+        alpha = 0.697
+    else:
+        alpha = 0.673
+
+    raw = alpha * m * m / sums
+    # Corrección de rango pequeño (linear counting)
+    small = (raw <= 2.5 * m) & (zeros > 0)
+    linear = m * np.log(m / np.where(zeros > 0, zeros, 1))
+    return np.where(small, linear, raw)
+
+
+class PlayerSketches:
+    """
+    Sketches de jugadores distintos por (agente, mes).
+
+    Construir con PlayerSketches.from_frame(df). Con exact=True los conteos son
+    exactos (conjuntos); en otro caso se usa HyperLogLog con el error relativo
+    indicado.
+    """
+
+    def __init__(self, agents, months, agent_codes, month_codes, values, exact, precision):
+        self.agents = pd.Index(agents)
+        self.months = pd.Index(months)
+        self.exact = exact
+        self.precision = precision
+        # Una entrada por (agente, mes, valor): registro HLL o código de jugador
+        self._agent = agent_codes
+        self._month = month_codes
+        self._value = values
+        self._rank = None
+
+    @classmethod
+    def from_frame(cls, df, error_relativo=0.01, exact=False,
+                   agent_col='id_agente', month_col='month', player_col='jugador_id'):
+        """
+        Construye los sketches a partir del DataFrame de load_data.
+        Las filas sin mes (fecha inválida) quedan con mes -1: cuentan en los
+        totales (count, count_by_agent sin meses) pero no en ningún mes.
+        """
+        if month_col not in df.columns:
+            month_col = 'mes'
+        valid = df[month_col].notna().to_numpy()
+        agent_codes, agents = pd.factorize(df[agent_col].to_numpy(), sort=True)
+        month_codes = np.full(len(df), -1, dtype=np.int64)
+        month_codes[valid], months = pd.factorize(df[month_col][valid].to_numpy(), sort=True)
+        players = df[player_col].to_numpy()
+
+        if exact:
+            values, _ = pd.factorize(players)
+            keys = pd.DataFrame({'a': agent_codes, 'm': month_codes, 'v': values}).drop_duplicates()
+            sk = cls(agents, months, keys['a'].to_numpy(), keys['m'].to_numpy(),
+                     keys['v'].to_numpy(), exact=True, precision=None)
+            return sk
+
+        p = precision_for_error(error_relativo)
+        hashes = pd.util.hash_array(np.asarray(players, dtype=object)).astype(np.uint64)
+        registers = (hashes >> np.uint64(_HASH_BITS - p)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (_HASH_BITS - p)) - 1)
+        ranks = (_HASH_BITS - p) - _bit_length(rest) + 1
+
+        # Forma dispersa: máximo rango por (agente, mes, registro)
+        keys = pd.DataFrame({'a': agent_codes, 'm': month_codes, 'v': registers, 'r': ranks})
+        keys = keys.groupby(['a', 'm', 'v'], sort=False)['r'].max().reset_index()
+        sk = cls(agents, months, keys['a'].to_numpy(), keys['m'].to_numpy(),
+                 keys['v'].to_numpy(), exact=False, precision=p)
+        sk._rank = keys['r'].to_numpy().astype(np.uint8)
+        return sk
+
+    # ------------------------------------------------------------------
+    # Selección y combinación
+    # ------------------------------------------------------------------
+
+    def _codes(self, labels, index):
+        if labels is None:
+            return None
+        if np.isscalar(labels):
+            labels = [labels]
+        codes = index.get_indexer(list(labels))
+        return codes[codes >= 0]
+
+    def _mask(self, agents=None, months=None):
+        mask = np.ones(len(self._value), dtype=bool)
+        agent_codes = self._codes(agents, self.agents)
+        if agent_codes is not None:
+            mask &= np.isin(self._agent, agent_codes)
+        month_codes = self._codes(months, self.months)
+        if month_codes is not None:
+            mask &= np.isin(self._month, month_codes)
+        return mask
+
+    def _grouped(self, groups, n_groups, mask):
+        """Conteo distinto por grupo combinando los sketches de cada grupo."""
+        g = groups[mask]
+        v = self._value[mask]
+        if self.exact:
+            base = np.int64(v.max() + 1) if len(v) else np.int64(1)
+            pairs = np.unique(g.astype(np.int64) * base + v)
+            return np.bincount(pairs // base, minlength=n_groups).astype(float)
+        m = 1 << self.precision
+        if n_groups * m > len(v):
+            # Muchos grupos (p. ej. por agente): la matriz densa sería mayor que las entradas
+            return _hll_sparse_estimate(g, v, self._rank[mask], n_groups, self.precision)
+        registers = np.zeros((n_groups, m), dtype=np.uint8)
+        np.maximum.at(registers, (g, v), self._rank[mask])
+        return _hll_estimate(registers, self.precision)
+
+    def count(self, agents=None, months=None):
+        """Jugadores distintos en la unión de los agentes y meses indicados (None = todos)."""
+        mask = self._mask(agents, months)
+        return float(self._grouped(np.zeros(len(self._value), dtype=np.int64), 1, mask)[0])
+
+    def count_by_month(self, agents=None):
+        """Jugadores distintos por mes (unión de los agentes indicados)."""
+        counts = self._grouped(self._month, len(self.months), self._mask(agents=agents) & (self._month >= 0))
+        return pd.Series(counts, index=self.months)
+
+    def count_by_agent(self, months=None):
+        """Jugadores distintos por agente (unión de los meses indicados)."""
+        counts = self._grouped(self._agent, len(self.agents), self._mask(months=months))
+        return pd.Series(counts, index=self.agents)
+
+    def _calendar(self):
+        """Posición de cada mes en el calendario: la clave entera, o el orden si no es entera."""
+        if pd.api.types.is_integer_dtype(self.months):
+            return self.months.to_numpy(dtype=np.int64)
+        return np.arange(len(self.months), dtype=np.int64)
+
+    def rolling_counts(self, window, agents=None):
+        """
+        Jugadores distintos en la ventana móvil de los últimos `window` meses
+        calendario (mes actual incluido), por mes. Los meses sin datos dentro de
+        la ventana cuentan como vacíos, no se saltean.
+        """
+        mask = self._mask(agents=agents) & (self._month >= 0)
+        calendario = self._calendar()
+        n_months = len(self.months)
+        counts = np.zeros(n_months)
+        if self.exact:
+            m = calendario[self._month[mask]]
+            v = self._value[mask]
+            for i in range(n_months):
+                in_window = (m > calendario[i] - window) & (m <= calendario[i])
+                counts[i] = len(np.unique(v[in_window]))
+            return pd.Series(counts, index=self.months)
+
+        inicio = calendario.min() if n_months else 0
+        n_calendario = int(calendario.max() - inicio + 1) if n_months else 0
+        registers = np.zeros((n_calendario, 1 << self.precision), dtype=np.uint8)
+        np.maximum.at(registers, (calendario[self._month[mask]] - inicio, self._value[mask]), self._rank[mask])
+        merged = registers.copy()
+        for lag in range(1, window):
+            np.maximum(merged[lag:], registers[:-lag], out=merged[lag:])
+        return pd.Series(_hll_estimate(merged[calendario - inicio], self.precision), index=self.months)
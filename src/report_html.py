@@ -6,7 +6,8 @@ from plotly.subplots import make_subplots
 import os
 import json
 from jinja2 import Template
-from src.logic_analytics import PESOS_METRICAS
+from src.logic_analytics import CATEGORIAS, PESOS_METRICAS
+from src.asset_bundler import bundle_html
 
 def calculate_similarity(row, centroids, class_order, metrics):
     current_class = row['Clase']
@@ -84,9 +85,178 @@ def calculate_similarity(row, centroids, class_order, metrics):
         return None
 
 
-def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard.html"):
+def calculate_similarities(rows, centroids, class_order, metrics):
+    """
+    calculate_similarity for every row of a DataFrame at once: the target centroid
+    of each row is looked up by class, and the cosine distances and gaps come from
+    one numpy pass over the (rows x metrics) matrix. Only the <= 3 gaps per row
+    are built in Python.
+    """
+    n = len(rows)
+    current = np.column_stack([pd.to_numeric(rows[m], errors='coerce').to_numpy(dtype=float)
+                               if m in rows.columns else np.zeros(n) for m in metrics]).reshape(n, len(metrics))
+
+    # Next better class (lower index) that actually has a centroid, per class
+    targets, best = {}, None
+    for cls in class_order:
+        targets[cls] = best
+        if cls in centroids:
+            best = cls
+    target_names = [c for c in class_order if c in centroids]
+    centroid_matrix = np.array([[float(centroids[c].get(m, 0)) for m in metrics] for c in target_names],
+                               dtype=float).reshape(len(target_names), len(metrics))
+
+    classes = rows['Clase'].tolist()
+    row_target = np.array([target_names.index(targets[c]) if targets.get(c) else -1 for c in classes], dtype=int)
+    target = centroid_matrix[np.maximum(row_target, 0)] if len(target_names) else np.zeros_like(current)
+
+    # Cosine distance; a zero vector is max distance and NaN compares like the scalar clip (-> 1)
+    dot = np.einsum('ij,ij->i', current, target)
+    norms = np.linalg.norm(current, axis=1) * np.linalg.norm(target, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sim = dot / norms
+    sim = np.where(np.isnan(sim), 1.0, np.clip(sim, -1.0, 1.0))
+    dist = np.where(norms == 0, 1.0, 1.0 - sim)
+
+    # Gaps: improvement needed (> 0.5) ranked by weighted impact, top 3
+    diff = target - current
+    weights = np.array([PESOS_METRICAS.get(m, 0.1) for m in metrics], dtype=float)
+    impact = diff * weights
+    needed = diff > 0.5
+    order = np.argsort(np.where(needed, -impact, np.inf), axis=1, kind='stable')[:, :3]
+
+    sims = []
+    for i, cls in enumerate(classes):
+        if cls not in class_order:
+            sims.append(None)
+        elif row_target[i] < 0:
+            sims.append({"target": "Top", "dist": 0, "gaps": []})
+        else:
+            gaps = [{
+                "metric": metrics[j],
+                "diff": float(diff[i, j]),
+                "target": float(target[i, j]),
+                "current": float(current[i, j]),
+                "impact": float(impact[i, j]),
+            } for j in order[i] if needed[i, j]]
+            sims.append({"target": target_names[row_target[i]], "dist": round(float(dist[i]), 4), "gaps": gaps})
+    return sims
+
+
+def agent_key(raw_id):
+    """Agent id as used for the JS lookups: ints as plain strings, 'GLOBAL' kept intact."""
+    # Handle float conversions safely but keep 'GLOBAL' string intact
+    if isinstance(raw_id, float) and not np.isnan(raw_id):
+        return str(int(raw_id))
+    return str(raw_id)
+
+
+def build_month_views(df, monthly_min, centroids, class_order, metrics):
+    """
+    Precomputes what the month filter needs that the browser cannot derive cheaply.
+
+    'all' (backend scores and classes, sums over every month):
+    - order:   ranked agent ids with data (GLOBAL excluded), best score first
+    - counts:  class counts
+    - sums:    {id: [depositos, retiros, ggr, ngr, comision]}
+    - players: {id: max active players}
+
+    Every month (counts and sums come from the dashboard's range worker):
+    - order:   agent ids with data that month (GLOBAL excluded) by the backend's
+               per-month rank (rank_mes), so single-month views need no sorting
+    - rows:    {id: position of the month row in monthlyData[id]}
+    - sim:     {id: similarity target and gaps} for the month's class and metrics
+    """
+    sum_cols = ['total_depositos', 'total_retiros', 'calculo_ggr', 'calculo_ngr', 'calculo_comision']
+    agent_keys = df['id_agente'].map(agent_key)
+    position = pd.Series(np.arange(len(df)), index=agent_keys.values)
+    position = position[~position.index.duplicated()]
+    global_keys = set(agent_keys[df['id_agente'] == 'GLOBAL'])
+
+    monthly = monthly_min.copy()
+    for c in sum_cols + ['score_global', 'active_players']:
+        if c not in monthly.columns:
+            monthly[c] = 0
+    monthly = monthly[monthly['_key'].isin(position.index)]
+    monthly['_row'] = monthly.groupby('_key').cumcount()
+    monthly['_pos'] = monthly['_key'].map(position)
+
+    def ranked(keys, scores, pos):
+        frame = pd.DataFrame({'key': keys, 'score': scores, 'pos': pos})
+        frame = frame[~frame['key'].isin(global_keys)].sort_values('pos', kind='stable')
+        return frame.sort_values('score', ascending=False, kind='stable')['key'].tolist()
+
+    # 'all': backend metrics and class, sums over every month
+    totals = monthly.groupby('_key')[sum_cols].sum()
+    has_data = df[agent_keys.isin(totals.index).values]
+    views = {'all': {
+        'order': ranked(agent_keys[has_data.index], has_data['score_global'].fillna(0).values,
+                        position[agent_keys[has_data.index]].values),
+        'counts': {str(k): int(v) for k, v in df['Clase'].value_counts().items()},
+        'sums': {k: [float(x) for x in v] for k, v in zip(totals.index, totals.values)},
+        'players': monthly.groupby('_key')['active_players'].max().astype(float).to_dict(),
+    }}
+
+    for month, sub in monthly.groupby('month', sort=True):
+        sub = sub.sort_values('_pos', kind='stable')
+        base = df.iloc[sub['_pos'].values]
+        month_rows = pd.DataFrame({m: (sub[m] if m in sub.columns else base[m]).to_numpy() for m in metrics})
+        month_rows['Clase'] = [c if c else b for c, b in zip(sub.get('Clase', base['Clase']), base['Clase'])]
+        sims = calculate_similarities(month_rows, centroids, class_order, metrics)
+        keys = sub['_key'].tolist()
+        if 'rank_mes' in sub.columns:
+            # sub is already in backend (position) order, which breaks rank ties
+            order = sub.loc[~sub['_key'].isin(global_keys)].sort_values('rank_mes', kind='stable')['_key'].tolist()
+        else:
+            order = ranked(sub['_key'].values, sub['score_global'].values, sub['_pos'].values)
+        views[month] = {
+            'order': order,
+            'rows': dict(zip(keys, sub['_row'].astype(int).tolist())),
+            'sim': dict(zip(keys, sims)),
+        }
+    return views
+
+
+PREFIX_FIELDS = {
+    'dep': 'total_depositos', 'ret': 'total_retiros', 'ggr': 'calculo_ggr',
+    'ngr': 'calculo_ngr', 'com': 'calculo_comision',
+}
+
+
+def build_prefix_sums(df, monthly_min):
+    """
+    Per-agent prefix sums of the additive monthly fields over the full month axis, so the
+    dashboard gets any month-range total as P[to + 1] - P[from] (O(1) per agent).
+
+    Arrays are flat and agent-major: agent a, month boundary k -> a * (n_months + 1) + k.
+    'n' counts the months with data, so a zero difference means no data in the range.
+    """
+    known = set(monthly_min['_key'])
+    ids = [k for k in dict.fromkeys(df['id_agente'].map(agent_key)) if k in known]
+    months = sorted(monthly_min['month'].unique())
+    monthly = monthly_min[monthly_min['_key'].isin(ids)]
+    ai = pd.Index(ids).get_indexer(monthly['_key'])
+    mi = pd.Index(months).get_indexer(monthly['month'])
+
+    prefix = {'months': months, 'ids': ids}
+    columns = {**PREFIX_FIELDS, 'n': None}
+    for name, col in columns.items():
+        if col is None:
+            values = np.ones(len(monthly))
+        elif col in monthly.columns:
+            values = monthly[col].to_numpy(dtype=float)
+        else:
+            values = np.zeros(len(monthly))
+        cube = np.zeros((len(ids), len(months) + 1))
+        np.add.at(cube, (ai, mi + 1), values)
+        prefix[name] = np.round(np.cumsum(cube, axis=1), 4).ravel().tolist()
+    return prefix
+
+
+def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard.html", assets="cdn"):
     """
     Genera un dashboard HTML autocontenido con los resultados de la clasificación.
+    assets: 'cdn', 'inline' o 'shared' (ver asset_bundler).
     """
     print("Generating HTML Report...")
     
@@ -120,6 +290,8 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
     class_order = unique_classes
     
     class_counts = {cls: len(df[df['Clase'] == cls]) for cls in class_order}
+    # KPI slots for every class, so month/range views can show classes absent from the latest snapshot
+    kpi_counts = {cls: class_counts.get(cls, 0) for cls in sorted(set(CATEGORIAS) | set(class_order), key=sort_key_clase)}
     
     pct_risky = (len(df[df['Risk_Safe'] == 0]) / total_agents * 100) if total_agents > 0 else 0
     
@@ -152,6 +324,8 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
     weights_json = json.dumps(PESOS_METRICAS)
     
     monthly_data_js = "null"
+    month_views_js = "null"
+    prefix_sums_js = "null"
     if df_monthly is not None and not df_monthly.empty:
         # Group by agent and convert to dict {agent_id: [{month, comision, depositos, ...}, ...]}
         monthly_cols = [
@@ -161,7 +335,7 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
             'rentabilidad', 'volumen', 'fidelidad', 'estabilidad', 
             'crecimiento', 'eficiencia_casino', 'eficiencia_deportes', 
             'eficiencia_conversion', 'tendencia', 'diversificacion', 'calidad_jugadores',
-            'Clase', 'Risk_Safe'
+            'Clase', 'Risk_Safe', 'rank_mes', 'n_agentes_mes', 'percentil_mes', 'rank_clase_mes'
         ]
         available_cols = [c for c in monthly_cols if c in df_monthly.columns]
         
@@ -170,19 +344,21 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
         monthly_min = monthly_min.fillna(0).replace([np.inf, -np.inf], 0)
         monthly_min['month'] = monthly_min['month'].astype(str)
         
+        # Chronological order per agent so row positions stay valid in the browser
+        monthly_min['_key'] = monthly_min['id_agente'].map(agent_key)
+        monthly_min['_first_seen'] = pd.factorize(monthly_min['_key'])[0]
+        monthly_min = monthly_min.sort_values(['_first_seen', 'month'], kind='stable').drop(columns=['_first_seen'])
+        
         # Build monthly dict using plain Python dicts (avoids pandas groupby issues)
-        records = monthly_min.to_dict(orient='records')
+        records = monthly_min.drop(columns=['_key']).to_dict(orient='records')
         monthly_dict = {}
         for row in records:
-            raw_id = row.pop('id_agente')
-            # Handle float conversions safely but keep 'GLOBAL' string intact
-            if isinstance(raw_id, float) and not np.isnan(raw_id):
-                key = str(int(raw_id))
-            else:
-                key = str(raw_id)
+            key = agent_key(row.pop('id_agente'))
             monthly_dict.setdefault(key, []).append(row)
         
         monthly_data_js = json.dumps(monthly_dict)
+        month_views_js = json.dumps(build_month_views(df, monthly_min, centroids, class_order, metrics_for_sim))
+        prefix_sums_js = json.dumps(build_prefix_sums(df, monthly_min))
 
 
 
@@ -198,7 +374,7 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
     <title>Dashboard de Clasificación de Agentes</title>
     <script src="https://cdn.plot.ly/plotly-2.27.0.min.js"></script>
     <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600&display=swap" rel="stylesheet">
-    <style>
+    <style data-asset="dashboard">
         :root {
             --bg-color: #fcfdfe; /* Ultra soft blue-white */
             --card-bg: #ffffff;
@@ -220,7 +396,7 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
             --shadow: 0 2px 4px rgba(0,0,0,0.02);
             --shadow-hover: 0 8px 16px rgba(0,0,0,0.04);
         }
-        body { font-family: 'Inter', sans-serif; background-color: var(--bg-color); color: var(--text-color); margin: 0; padding: 0; transition: background-color 0.3s; }
+        body { font-family: 'Inter', system-ui, -apple-system, 'Segoe UI', Roboto, sans-serif; background-color: var(--bg-color); color: var(--text-color); margin: 0; padding: 0; transition: background-color 0.3s; }
 
         /* Custom Plotly Rangeslider Handle Styling */
         .js-plotly-plot .rangeslider-handle-min,
@@ -332,14 +508,19 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
         .filter-btn.active-B { background: var(--warning); border-color: var(--warning); color: white; }
         .filter-btn.active-C { background: var(--danger); border-color: var(--danger); color: white; }
         
-        .agent-list { flex: 1; overflow-y: auto; padding: 0; }
+        .agent-list { flex: 1; overflow-y: auto; padding: 0; position: relative; }
+        /* Virtualized list: the spacer gives the full scroll height, only the visible window is rendered */
+        .agent-list-spacer { width: 1px; }
+        .agent-list-window { position: absolute; top: 0; left: 0; right: 0; will-change: transform; }
         .agent-item { 
             padding: 8px 14px; border-bottom: 1px solid var(--border); cursor: pointer; 
             display: flex; justify-content: space-between; align-items: center; 
             transition: background 0.15s;
+            height: 38px; box-sizing: border-box; /* must match LIST_ROW_HEIGHT */
         }
         .agent-item:hover { background-color: #f8f9fa; }
         .agent-item.active { background-color: var(--accent-soft); border-left: 4px solid var(--accent); padding-left: 10px; }
+        .agent-item.agent-global { background: linear-gradient(135deg, #eff6ff, #f0fdf4); border-left: 3px solid #60a5fa; font-weight: 600; }
         .agent-rank { font-size: 12px; font-weight: 600; color: var(--text-muted); width: 35px; }
         .agent-name { flex: 1; font-weight: 500; font-size: 13px; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; color: var(--text-color); }
         .agent-badge { 
@@ -603,13 +784,11 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
         <div class="header-meta">Total Agencias Únicas: {{ total_agents }}</div>
     </div>
     <div class="kpi-bar">
-        {% for cls, count in class_counts.items() %}
-        {% if count > 0 %}
-        <div class="kpi" style="min-width: 40px;">
+        {% for cls, count in kpi_counts.items() %}
+        <div class="kpi" data-cls="{{ cls }}" style="min-width: 40px;{% if count == 0 %} display: none;{% endif %}">
             <div class="kpi-val" style="font-size:18px;">{{ count }}</div>
             <div class="kpi-lbl">{{ cls }}</div>
         </div>
-        {% endif %}
         {% endfor %}
     </div>
 </header>
@@ -621,10 +800,14 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
             <input type="text" id="searchInput" class="search-box" placeholder="Buscar por ID o Nombre..." onkeyup="filterList()">
             
             <div class="date-filter-container">
-                <span class="date-filter-label">📅 Filtro Mensual</span>
-                <select id="monthFilter" class="month-filter" style="width:100%;" onchange="updateTopAgencies()">
-                    <option value="all">Todos los Meses</option>
-                </select>
+                <span class="date-filter-label">📅 Filtro Mensual (desde → hasta)</span>
+                <div class="date-inputs">
+                    <select id="monthFilter" class="month-filter" onchange="onMonthFromChange()">
+                        <option value="all">Todos los Meses</option>
+                    </select>
+                    <span style="color:var(--text-muted); font-size:11px;">→</span>
+                    <select id="monthFilterTo" class="month-filter" onchange="updateTopAgencies()" title="Hasta (inclusive)" disabled></select>
+                </div>
             </div>
             
             <div class="filter-btns">
@@ -647,6 +830,9 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
                     <div style="display: flex; align-items: center; gap: 10px;">
                         <span class="profile-id">ID: <span id="pId">-</span></span>
                         <span style="font-size: 12px; color: var(--text-muted);">| Rank Global: <strong id="pRank" style="color:var(--text-color)">-</strong></span>
+                        <span style="font-size: 12px; color: var(--text-muted);">| Racha: <strong id="pStreak" style="color:var(--text-color)">-</strong></span>
+                        <span style="font-size: 12px; color: var(--text-muted);">| Retención M1/M3/M6: <strong id="pRetention" style="color:var(--text-color)">-</strong></span>
+                        <span style="font-size: 12px; color: var(--text-muted);">| Migración: <strong id="pMigration" style="color:var(--text-color)">-</strong></span>
                     </div>
                     <div style="margin-top: 10px; display: flex; gap: 10px;">
                         <div id="pClassBadge" class="status-badge status-safe">-</div>
@@ -761,6 +947,8 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
                             <option value="calculo_ggr">GGR</option>
                             <option value="calculo_comision">Comisión</option>
                             <option value="score_global">Score Global</option>
+                            <option value="rank_mes">Ranking del Mes</option>
+                            <option value="percentil_mes">Percentil del Mes</option>
                             <option value="active_players">Jugadores Activos</option>
                         </select>
                         <button onclick="exportTrendData()" style="padding:5px 10px; background:#2ecc71; color:white; border:none; border-radius:4px; cursor:pointer; font-size:11px;">Excel</button>
@@ -792,6 +980,7 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
                             <th>Mes</th>
                             <th class="num-col">Jugadores</th>
                             <th class="num-col">Score</th>
+                            <th class="num-col">Rank Mes</th>
                             <th class="num-col">Depósitos</th>
                             <th class="num-col">Retiros</th>
                             <th class="num-col">GGR</th>
@@ -838,9 +1027,9 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
     </div>
 </div>
 
+<!-- Datos del reporte (cambian en cada generación) -->
 <script>
     const allAgents = {{ agents_json | safe }}; // Immutable source
-    let displayedAgents = [...allAgents]; // Mutable display list
     
     // Dynamic Analysis Data
     const centroids = {{ centroids_json | safe }};
@@ -852,9 +1041,33 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
     
     const monthlyData = {{ monthly_json | safe }}; 
     const globalWeights = {{ weights_json | safe }}; 
+    // Per-month rankings, class counts, sums and similarity precomputed in Python
+    const monthViews = {{ month_views_json | safe }};
+    // Per-agent prefix sums of the additive fields: any month range is an O(1) subtraction
+    const prefixSums = {{ prefix_sums_json | safe }};
+</script>
+<!-- Código estático del dashboard (sin datos; cacheable como asset) -->
+<script data-asset="dashboard">
+    let displayedAgents = [...allAgents]; // Mutable display list
+    const agentById = new Map(allAgents.map(a => [a.id_agente.toString(), a]));
 
     const listEl = document.getElementById('agentList');
     let currentFilter = 'all';
+
+    // Virtualized sidebar: only the rows inside the viewport exist in the DOM
+    const LIST_ROW_HEIGHT = 38;
+    const LIST_OVERSCAN = 8;
+    const listSpacer = document.createElement('div');
+    const listWindow = document.createElement('div');
+    listSpacer.className = 'agent-list-spacer';
+    listWindow.className = 'agent-list-window';
+    listEl.append(listSpacer, listWindow);
+    let listData = [];                      // displayedAgents as last rendered
+    let listIndex = new Map();              // id_agente -> index in listData
+    let searchNames = [], searchIds = [];   // lowercase search index aligned with listData
+    let listRows = [];                      // listData indices passing search + class filter
+    let listFrame = null;
+    let activeAgentId = null;               // selected agent, even if its row is not rendered
     let selectedCompareIds = [];
     const compareColors = ['#f59e0b','#10b981','#ef4444','#06b6d4','#ec4899','#e11d48','#84cc16','#f97316'];
 
@@ -892,27 +1105,45 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
         '09': 'Septiembre', '10': 'Octubre', '11': 'Noviembre', '12': 'Diciembre'
     };
     
-    // Populate month filter dropdown
+    // Populate month filter dropdowns (from / to)
     const monthFilterEl = document.getElementById('monthFilter');
+    const monthFilterToEl = document.getElementById('monthFilterTo');
     if (monthFilterEl && sortedMonths.length > 0) {
         sortedMonths.forEach(m => {
-            const opt = document.createElement('option');
-            opt.value = m;
             // Parse month string (e.g. "2025-01") to display name
             const parts = m.split('-');
             const monthNum = parts.length >= 2 ? parts[1] : '';
             const year = parts.length >= 1 ? parts[0] : '';
             const name = monthNames[monthNum] || m;
-            opt.textContent = name + ' ' + year;
-            monthFilterEl.appendChild(opt);
+            [monthFilterEl, monthFilterToEl].forEach(sel => {
+                if (!sel) return;
+                const opt = document.createElement('option');
+                opt.value = m;
+                opt.textContent = name + ' ' + year;
+                sel.appendChild(opt);
+            });
         });
         // Auto-select last available month (most recent completed month)
         const lastMonth = sortedMonths[sortedMonths.length - 1];
         if (lastMonth) {
             monthFilterEl.value = lastMonth;
+            if (monthFilterToEl) {
+                monthFilterToEl.value = lastMonth;
+                monthFilterToEl.disabled = false;
+            }
         }
     }
 
+    // Picking a start month shows that single month; 'to' then extends it to a range
+    function onMonthFromChange() {
+        const from = monthFilterEl.value;
+        if (monthFilterToEl) {
+            monthFilterToEl.disabled = from === 'all';
+            if (from !== 'all') monthFilterToEl.value = from;
+        }
+        updateTopAgencies();
+    }
+
 
     function calculateSimilarityJS(agent) {
         if (!classOrder || !centroids || !simMetrics) return agent.sim_data; // Fallback
@@ -946,7 +1177,7 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
         const gaps = [];
         
         // Use weights for gap impact
-        const weights = window.weightsData || {{ weights_json | safe }} || {};
+        const weights = window.weightsData || globalWeights || {};
         
         simMetrics.forEach(m => {
             const valA = agent[m] || 0;
@@ -1070,8 +1301,7 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
     function toggleCompareAgent(agentId, event) {
         if (event) event.stopPropagation();
         // Prevent selecting the agent that is currently active in the ranking
-        const activeItem = document.querySelector('.agent-item.active');
-        const activeId = activeItem ? activeItem.dataset.id : null;
+        const activeId = activeAgentId;
         if (agentId === activeId) return;
         
         const idx = selectedCompareIds.indexOf(agentId);
@@ -1109,9 +1339,8 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
         if (bar) bar.innerHTML = '';
         
         // Find the currently active (ranking-selected) agent
-        const activeItem = document.querySelector('.agent-item.active');
-        const activeId = activeItem ? activeItem.dataset.id : null;
-        const activeAgent = activeId ? (displayedAgents.find(a => a.id_agente == activeId) || allAgents.find(a => a.id_agente == activeId)) : null;
+        const activeId = activeAgentId;
+        const activeAgent = activeId ? (getDisplayedAgent(activeId) || agentById.get(activeId)) : null;
         
         if (bar) {
             bar.style.display = 'flex';
@@ -1129,7 +1358,7 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
             
             // 2. Render comparison agents in palette colors (removable)
             selectedCompareIds.forEach((id, i) => {
-                const agent = displayedAgents.find(a => a.id_agente == id) || allAgents.find(a => a.id_agente == id);
+                const agent = getDisplayedAgent(id) || agentById.get(String(id));
                 if (!agent) return;
                 const color = compareColors[i % compareColors.length];
                 const tag = document.createElement('span');
@@ -1174,8 +1403,7 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
         optionsContainer.innerHTML = '';
         
         // Find active ranking agent to exclude from dropdown
-        const activeItem = document.querySelector('.agent-item.active');
-        const activeId = activeItem ? activeItem.dataset.id : null;
+        const activeId = activeAgentId;
         
         const sorted = [...displayedAgents].sort((a,b) => a.rank_global - b.rank_global);
         sorted.forEach(a => {
@@ -1202,101 +1430,271 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
         renderCompareTags();
     }
 
+    const isGlobalAgent = a => a.id_agente === 'GLOBAL' ||
+        (typeof a.nombre_usuario_agente === 'string' && a.nombre_usuario_agente.includes('vista global'));
+
+    // Metric keys for per-month data
+    const metricKeys = [
+        'rentabilidad', 'volumen', 'fidelidad', 'estabilidad', 
+        'crecimiento', 'eficiencia_casino', 'eficiencia_deportes', 
+        'eficiencia_conversion', 'tendencia', 'diversificacion', 'calidad_jugadores'
+    ];
+
+    function agentFromView(agent, view, isMonthly) {
+        const id = agent.id_agente.toString();
+        const result = { ...agent, _noData: false };
+        
+        if (isMonthly) {
+            // --- Monthly mode: per-month metrics, score, Clase, Risk_Safe from the agent's last month in range ---
+            const month = view.asOf[id];
+            const monthRow = monthlyData[id][monthViews[month].rows[id]];
+            result.score_global = monthRow.score_global || 0;
+            result.Clase = monthRow.Clase || agent.Clase;
+            result.Risk_Safe = monthRow.Risk_Safe !== undefined ? monthRow.Risk_Safe : agent.Risk_Safe;
+            metricKeys.forEach(mk => {
+                if (monthRow[mk] !== undefined) result[mk] = monthRow[mk];
+            });
+            result.sim_data = monthViews[month].sim[id];
+            result.percentil_mes = monthRow.percentil_mes;
+            result.rank_clase_mes = monthRow.rank_clase_mes;
+        }
+        // Sums over the selected range (all months in aggregated mode, backend metrics kept)
+        [result.total_depositos, result.total_retiros, result.calculo_ggr,
+         result.calculo_ngr, result.calculo_comision] = view.sums[id];
+        result.median_players = view.players[id] || 0;
+        return result;
+    }
+
+    function updateClassCounts(counts) {
+        if (!counts) return;
+        document.querySelectorAll('.kpi[data-cls]').forEach(el => {
+            const n = counts[el.dataset.cls] || 0;
+            el.querySelector('.kpi-val').textContent = n;
+            el.style.display = n > 0 ? '' : 'none';
+        });
+    }
+
+    // --- Range aggregation (Web Worker) ---
+    // Pure function over the packed columns: sums, max players, ranking and class counts
+    // for months [from, to]. It runs inside the worker, or on the main thread when workers
+    // are not available. Sums come from the prefix arrays (P[to + 1] - P[from]); each
+    // agent is ranked by its last month with data inside the range. A single month takes
+    // the backend's per-month ranking as is (monthOrder), without sorting.
+    function aggregateRange(cols, from, to) {
+        const nAgents = cols.nAgents;
+        const M = cols.nMonths;
+        const stride = M + 1;
+        const fields = [cols.dep, cols.ret, cols.ggr, cols.ngr, cols.com];
+        const sums = new Float64Array(nAgents * fields.length);
+        const players = new Float64Array(nAgents);
+        const asOf = new Int32Array(nAgents).fill(-1);
+        const score = new Float64Array(nAgents);
+        const ranked = [];
+        const counts = {};
+        for (let a = 0; a < nAgents; a++) {
+            const lo = a * stride + from;
+            const hi = a * stride + to + 1;
+            if (cols.n[hi] - cols.n[lo] < 0.5) continue; // no months with data in range
+            for (let f = 0; f < fields.length; f++) sums[a * fields.length + f] = fields[f][hi] - fields[f][lo];
+            // Max players is not additive: short scan over the range
+            for (let mi = from; mi <= to; mi++) {
+                if (cols.players[a * M + mi] > players[a]) players[a] = cols.players[a * M + mi];
+            }
+            const m = cols.last[a * M + to];
+            asOf[a] = m;
+            score[a] = cols.score[a * M + m];
+            const cls = cols.classNames[cols.cls[a * M + m]];
+            counts[cls] = (counts[cls] || 0) + 1;
+            if (!cols.isGlobal[a]) ranked.push(a);
+        }
+        if (from === to && cols.monthRanked[to]) {
+            const order = cols.monthOrder.slice(cols.monthStart[to], cols.monthStart[to + 1]);
+            return { order, sums, players, asOf, counts };
+        }
+        // Best score first; ties keep the backend ranking order (agent index)
+        ranked.sort((x, y) => (score[y] - score[x]) || (x - y));
+        return { order: Int32Array.from(ranked), sums, players, asOf, counts };
+    }
+
+    // Typed arrays for the worker: prefix sums from the backend plus dense (agent, month)
+    // score, class, players and "last month with data up to month m", and the backend's
+    // per-month order flattened (month m -> monthOrder[monthStart[m] .. monthStart[m + 1]))
+    function packMonthlyColumns() {
+        const ids = prefixSums.ids;
+        const M = prefixSums.months.length;
+        const monthIndex = new Map(prefixSums.months.map((m, i) => [m, i]));
+        const classNames = [];
+        const classIndex = new Map();
+        const cols = {
+            nAgents: ids.length, nMonths: M, classNames,
+            isGlobal: Uint8Array.from(ids, id => isGlobalAgent(agentById.get(id)) ? 1 : 0),
+            dep: Float64Array.from(prefixSums.dep), ret: Float64Array.from(prefixSums.ret),
+            ggr: Float64Array.from(prefixSums.ggr), ngr: Float64Array.from(prefixSums.ngr),
+            com: Float64Array.from(prefixSums.com), n: Float64Array.from(prefixSums.n),
+            score: new Float64Array(ids.length * M), players: new Float64Array(ids.length * M),
+            cls: new Int16Array(ids.length * M), last: new Int32Array(ids.length * M).fill(-1),
+            monthOrder: null, monthStart: new Int32Array(M + 1), monthRanked: new Uint8Array(M)
+        };
+        const agentIndex = new Map(ids.map((id, a) => [id, a]));
+        const order = [];
+        prefixSums.months.forEach((month, mi) => {
+            const view = monthViews[month];
+            if (view && view.order) {
+                view.order.forEach(id => order.push(agentIndex.get(id)));
+                cols.monthRanked[mi] = 1;
+            }
+            cols.monthStart[mi + 1] = order.length;
+        });
+        cols.monthOrder = Int32Array.from(order);
+        ids.forEach((id, a) => {
+            const agent = agentById.get(id);
+            monthlyData[id].forEach(row => {
+                const mi = monthIndex.get(row.month);
+                const k = a * M + mi;
+                const cls = row.Clase || agent.Clase;
+                if (!classIndex.has(cls)) { classIndex.set(cls, classNames.length); classNames.push(cls); }
+                cols.cls[k] = classIndex.get(cls);
+                cols.score[k] = row.score_global || 0;
+                cols.players[k] = row.active_players || 0;
+                cols.last[k] = mi;
+            });
+            for (let mi = 1; mi < M; mi++) {
+                if (cols.last[a * M + mi] < 0) cols.last[a * M + mi] = cols.last[a * M + mi - 1];
+            }
+        });
+        return { ids, cols };
+    }
+
+    const WORKER_SOURCE = `
+        let cols = null;
+        self.onmessage = e => {
+            if (e.data.type === 'init') { cols = e.data.cols; return; }
+            const res = aggregateRange(cols, e.data.from, e.data.to);
+            res.id = e.data.id;
+            self.postMessage(res, [res.order.buffer, res.sums.buffer, res.players.buffer, res.asOf.buffer]);
+        };`;
+    let rangeEngine = null;
+    let nextRangeQuery = 0;
+    const pendingRanges = new Map();
+
+    function getRangeEngine() {
+        if (rangeEngine) return rangeEngine;
+        const packed = packMonthlyColumns();
+        rangeEngine = { ids: packed.ids, local: packed.cols, worker: null };
+        if (typeof Worker === 'undefined') return rangeEngine;
+        try {
+            const blob = new Blob([aggregateRange.toString(), WORKER_SOURCE], { type: 'text/javascript' });
+            const worker = new Worker(URL.createObjectURL(blob));
+            // The worker owns its copy: buffers are transferred, not cloned
+            const workerCols = packMonthlyColumns().cols;
+            const buffers = Object.values(workerCols).filter(v => ArrayBuffer.isView(v)).map(v => v.buffer);
+            worker.postMessage({ type: 'init', cols: workerCols }, buffers);
+            worker.onmessage = e => {
+                const pending = pendingRanges.get(e.data.id);
+                if (!pending) return;
+                pendingRanges.delete(e.data.id);
+                pending.resolve(e.data);
+            };
+            worker.onerror = () => {
+                // e.g. workers blocked for file:// pages: answer on the main thread from now on
+                rangeEngine.worker = null;
+                pendingRanges.forEach(p => p.resolve(aggregateRange(rangeEngine.local, p.from, p.to)));
+                pendingRanges.clear();
+            };
+            rangeEngine.worker = worker;
+        } catch (e) {
+            console.warn('Range worker unavailable, aggregating on the main thread:', e);
+        }
+        return rangeEngine;
+    }
+
+    // Resolves with the aggregation of months [from, to] (indices into prefixSums.months)
+    function queryRange(from, to) {
+        const engine = getRangeEngine();
+        if (!engine.worker) return Promise.resolve(aggregateRange(engine.local, from, to));
+        return new Promise(resolve => {
+            const id = ++nextRangeQuery;
+            pendingRanges.set(id, { resolve, from, to });
+            engine.worker.postMessage({ type: 'query', id, from, to });
+        });
+    }
+
+    // Worker answer -> the view shape used by agentFromView (keyed by agent id)
+    function rangeToView(res) {
+        const ids = rangeEngine.ids;
+        const view = { order: Array.from(res.order, a => ids[a]), counts: res.counts, sums: {}, players: {}, asOf: {} };
+        ids.forEach((id, a) => {
+            if (res.asOf[a] < 0) return;
+            view.sums[id] = Array.from(res.sums.subarray(a * 5, a * 5 + 5));
+            view.players[id] = res.players[a];
+            view.asOf[id] = prefixSums.months[res.asOf[a]];
+        });
+        return view;
+    }
+
+    let topAgenciesRequest = 0;
+
     function updateTopAgencies() {
+        const selectedMonth = document.getElementById('monthFilter') ? document.getElementById('monthFilter').value : 'all';
+        const toEl = document.getElementById('monthFilterTo');
+        const request = ++topAgenciesRequest;
+        if (selectedMonth === 'all' || !monthViews || !prefixSums) {
+            renderTopAgencies(monthViews ? monthViews.all : null, false);
+            return;
+        }
+        // Single month when 'to' is unset; reversed ranges are swapped
+        let from = prefixSums.months.indexOf(selectedMonth);
+        let to = toEl && toEl.value ? prefixSums.months.indexOf(toEl.value) : -1;
+        if (to < 0) to = from;
+        if (from > to) [from, to] = [to, from];
+        if (from < 0) {
+            renderTopAgencies({ order: [], counts: {}, sums: {}, players: {}, asOf: {} }, true);
+            return;
+        }
+        queryRange(from, to).then(res => {
+            // Drop answers for selections that were already replaced
+            if (request === topAgenciesRequest) renderTopAgencies(rangeToView(res), true);
+        });
+    }
+
+    function renderTopAgencies(view, isMonthly) {
         try {
-            const selectedMonth = document.getElementById('monthFilter') ? document.getElementById('monthFilter').value : 'all';
-            const isMonthly = selectedMonth !== 'all';
+            const hasData = view ? (id => view.sums[id] !== undefined) : (id => false);
             
-            // Metric keys for per-month data
-            const metricKeys = [
-                'rentabilidad', 'volumen', 'fidelidad', 'estabilidad', 
-                'crecimiento', 'eficiencia_casino', 'eficiencia_deportes', 
-                'eficiencia_conversion', 'tendencia', 'diversificacion', 'calidad_jugadores'
-            ];
-            
-            // Recalculate Metrics for range
-        displayedAgents = allAgents.map(agent => {
-            const mData = monthlyData ? monthlyData[agent.id_agente.toString()] : null;
-            if (!mData) return { ...agent, _noData: true, total_depositos: 0, score_global: 0 };
-            
-            // Filter months based on selection
-            const rangeData = isMonthly ? mData.filter(d => d.month === selectedMonth) : mData;
-            
-            if (rangeData.length === 0) {
-                 return { ...agent, _noData: true, total_depositos: 0, score_global: 0, rank_global: 9999 };
-            }
-            
-            // Aggregate financial sums
-            const sums = {
-                total_depositos: 0, total_retiros: 0, 
-                calculo_ggr: 0, calculo_ngr: 0, calculo_comision: 0
-            };
+            // Ranked agents come straight from the view order (lookup, no re-sorting)
+            displayedAgents = view ? view.order.map((id, i) => {
+                const result = agentFromView(agentById.get(id), view, isMonthly);
+                result.rank_global = i + 1;
+                return result;
+            }) : [];
             
-            rangeData.forEach(d => {
-                sums.total_depositos += (d.total_depositos || 0);
-                sums.total_retiros += (d.total_retiros || 0);
-                sums.calculo_ggr += (d.calculo_ggr || 0);
-                sums.calculo_ngr += (d.calculo_ngr || 0);
-                sums.calculo_comision += (d.calculo_comision || 0);
+            // Agents without data in the range stay available but hidden
+            let nextRank = displayedAgents.length;
+            allAgents.forEach(agent => {
+                const id = agent.id_agente.toString();
+                if (isGlobalAgent(agent) || hasData(id)) return;
+                displayedAgents.push({ ...agent, _noData: true, total_depositos: 0, score_global: 0, rank_global: ++nextRank });
             });
             
-            const result = { ...agent, ...sums, _noData: false };
-            
-            // --- Monthly mode: use per-month metrics, score, Clase, Risk_Safe from backend ---
-            if (isMonthly && rangeData.length === 1) {
-                const monthRow = rangeData[0];
-                // Override score and metrics with the specific month's values
-                result.score_global = monthRow.score_global || 0;
-                result.Clase = monthRow.Clase || agent.Clase;
-                result.Risk_Safe = monthRow.Risk_Safe !== undefined ? monthRow.Risk_Safe : agent.Risk_Safe;
-                metricKeys.forEach(mk => {
-                    if (monthRow[mk] !== undefined) result[mk] = monthRow[mk];
-                });
+            // Re-insert GLOBAL agent at top (unpinned from ranking)
+            const globalAgent = allAgents.find(isGlobalAgent);
+            if (globalAgent) {
+                const gid = globalAgent.id_agente.toString();
+                const globalEntry = hasData(gid) ? agentFromView(globalAgent, view, isMonthly)
+                    : { ...globalAgent, _noData: true, total_depositos: 0, score_global: 0 };
+                globalEntry.rank_global = null;
+                displayedAgents.unshift(globalEntry);
             }
-            // --- Aggregated mode: keep original backend metrics ---
-            
-            // Recalculate Dynamic Similarity
-            result.sim_data = calculateSimilarityJS(result);
             
-            // Use median players from range or sum? 
-            const players = rangeData.map(d => d.active_players || 0);
-            result.median_players = players.length ? Math.max(...players) : 0; 
-            
-            return result;
-        });
-        
-        // Re-Rank based on Score (Descending) - exclude GLOBAL agent
-        const globalIdx = displayedAgents.findIndex(a => 
-            a.id_agente === 'GLOBAL' || 
-            (typeof a.nombre_usuario_agente === 'string' && a.nombre_usuario_agente.includes('vista global'))
-        );
-        const globalEntry = globalIdx > -1 ? displayedAgents.splice(globalIdx, 1)[0] : null;
-        
-        displayedAgents.sort((a, b) => {
-            if (a._noData && !b._noData) return 1;
-            if (!a._noData && b._noData) return -1;
-            return b.score_global - a.score_global;
-        });
-        
-        // Assign new Ranks
-        displayedAgents.forEach((a, i) => {
-            a.rank_global = i + 1;
-        });
-        
-        // Re-insert GLOBAL agent at top (unpinned from ranking)
-        if (globalEntry) {
-            globalEntry.rank_global = null;
-            displayedAgents.unshift(globalEntry);
-        }
+            updateClassCounts(view ? view.counts : null);
         
         // Update UI
         renderList(displayedAgents);
         updateCompareSelect();
         
         // Refresh current profile if selected
-        const activeItem = document.querySelector('.agent-item.active');
-        if(activeItem) {
-            selectAgent(activeItem.dataset.id); 
+        if(activeAgentId !== null && hasListRow(getDisplayedAgent(activeAgentId))) {
+            selectAgent(activeAgentId); 
         } else if (displayedAgents.length > 0) {
             selectAgent(displayedAgents[0].id_agente);
         }
@@ -1307,68 +1705,79 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
     }
 
     function renderList(data) {
-        listEl.innerHTML = '';
-        
-        // Separate GLOBAL agent and regular agents
-        const globalAgent = data.find(a => 
-            a.id_agente === 'GLOBAL' || 
-            (typeof a.nombre_usuario_agente === 'string' && a.nombre_usuario_agente.includes('vista global'))
-        );
-        const regularAgents = data.filter(a => a !== globalAgent);
-        
-        // Render GLOBAL agent first (pinned, no rank)
-        if (globalAgent) {
-            const el = document.createElement('div');
-            el.className = 'agent-item';
-            el.dataset.id = globalAgent.id_agente;
-            el.dataset.clase = globalAgent.Clase || '';
-            el.dataset.name = (globalAgent.nombre_usuario_agente || globalAgent.id_agente).toString().toLowerCase();
-            el.style.background = 'linear-gradient(135deg, #eff6ff, #f0fdf4)';
-            el.style.borderLeft = '3px solid #60a5fa';
-            el.style.fontWeight = '600';
-            el.innerHTML = `
+        // Index once per ranking change; search, filters and scrolling reuse it
+        listData = data;
+        listIndex = new Map(data.map((a, i) => [a.id_agente.toString(), i]));
+        searchNames = data.map(a => (a.nombre_usuario_agente || a.id_agente).toString().toLowerCase());
+        searchIds = data.map(a => a.id_agente.toString());
+        filterList();
+    }
+
+    function getDisplayedAgent(id) {
+        const idx = listIndex.get(String(id));
+        return idx === undefined ? undefined : listData[idx];
+    }
+
+    function hasListRow(a) {
+        return !!a && (!a._noData || isGlobalAgent(a));
+    }
+
+    function filterList() {
+        const text = document.getElementById('searchInput').value.toLowerCase();
+        let globalRow = -1;
+        listRows = [];
+        listData.forEach((a, i) => {
+            if (!hasListRow(a)) return;
+            const matchText = searchNames[i].includes(text) || searchIds[i].includes(text);
+            const matchClass = currentFilter === 'all' || (a.Clase || '') === currentFilter;
+            if (!matchText || !matchClass) return;
+            if (isGlobalAgent(a)) globalRow = i; else listRows.push(i);
+        });
+        // GLOBAL pinned first (no rank)
+        if (globalRow > -1) listRows.unshift(globalRow);
+        listSpacer.style.height = (listRows.length * LIST_ROW_HEIGHT) + 'px';
+        renderVisibleRows();
+    }
+
+    function agentRowHtml(a) {
+        const active = a.id_agente.toString() === activeAgentId ? ' active' : '';
+        const name = a.nombre_usuario_agente || a.id_agente;
+        if (isGlobalAgent(a)) {
+            return `<div class="agent-item agent-global${active}" data-id="${a.id_agente}">
                 <div style="display:flex; align-items:center; gap:12px; width:100%;">
                     <div class="agent-rank" style="font-size:14px;">🌟</div>
-                    <div class="agent-name">${globalAgent.nombre_usuario_agente || globalAgent.id_agente}</div>
+                    <div class="agent-name">${name}</div>
                 </div>
-            `;
-            el.onclick = () => selectAgent(globalAgent.id_agente);
-            listEl.appendChild(el);
+            </div>`;
         }
-        
-        regularAgents.forEach(a => {
-            if (a._noData) return;
-            
-            const el = document.createElement('div');
-            el.className = 'agent-item';
-            el.dataset.id = a.id_agente;
-            el.dataset.clase = a.Clase;
-            el.dataset.name = (a.nombre_usuario_agente || a.id_agente).toString().toLowerCase();
-            
-            el.innerHTML = `
+        return `<div class="agent-item${active}" data-id="${a.id_agente}">
                 <div style="display:flex; align-items:center; gap:12px; width:100%;">
-                    <div class="agent-rank">${a.id_agente === 'GLOBAL' ? '' : '#'}${a.rank_global}</div>
-                    <div class="agent-name">${a.nombre_usuario_agente || a.id_agente}</div>
+                    <div class="agent-rank">#${a.rank_global}</div>
+                    <div class="agent-name">${name}</div>
                     <div class="agent-badge badge-${a.Clase}">${a.Clase}</div>
                 </div>
-            `;
-            el.onclick = () => selectAgent(a.id_agente);
-            listEl.appendChild(el);
-        });
-        filterList();
+            </div>`;
     }
 
-    function filterList() {
-        const text = document.getElementById('searchInput').value.toLowerCase();
-        const items = listEl.getElementsByClassName('agent-item');
-        
-        Array.from(items).forEach(item => {
-            const id = item.dataset.id;
-            const matchText = item.dataset.name.includes(text) || id.toString().includes(text);
-            const matchClass = currentFilter === 'all' || item.dataset.clase === currentFilter;
-            item.style.display = (matchText && matchClass) ? 'flex' : 'none';
-        });
+    function renderVisibleRows() {
+        listFrame = null;
+        const top = listEl.scrollTop;
+        const first = Math.max(0, Math.floor(top / LIST_ROW_HEIGHT) - LIST_OVERSCAN);
+        const last = Math.min(listRows.length, Math.ceil((top + listEl.clientHeight) / LIST_ROW_HEIGHT) + LIST_OVERSCAN);
+        listWindow.style.transform = `translateY(${first * LIST_ROW_HEIGHT}px)`;
+        listWindow.innerHTML = listRows.slice(first, last).map(i => agentRowHtml(listData[i])).join('');
+    }
+
+    function scheduleListRender() {
+        if (listFrame === null) listFrame = requestAnimationFrame(renderVisibleRows);
     }
+
+    listEl.addEventListener('scroll', scheduleListRender, { passive: true });
+    // One delegated handler instead of a closure per row
+    listEl.addEventListener('click', e => {
+        const item = e.target.closest('.agent-item');
+        if (item) selectAgent(item.dataset.id);
+    });
     
     function filterClass(cls) {
         currentFilter = cls;
@@ -1387,14 +1796,11 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
     }
 
     function selectAgent(id) {
-        const items = listEl.getElementsByClassName('agent-item');
-        Array.from(items).forEach(i => i.classList.remove('active'));
-        const activeItem = Array.from(items).find(i => i.dataset.id == id);
-        if(activeItem) {
-            activeItem.classList.add('active');
-        }
-        
-        const a = displayedAgents.find(x => x.id_agente == id);
+        const a = getDisplayedAgent(id);
+        activeAgentId = hasListRow(a) ? a.id_agente.toString() : null;
+        listWindow.querySelectorAll('.agent-item').forEach(i => {
+            i.classList.toggle('active', i.dataset.id === activeAgentId);
+        });
         if(!a) return;
         
         // Auto-remove this agent from compare list if it was there
@@ -1405,7 +1811,21 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
         // Profile
         document.getElementById('pName').textContent = a.nombre_usuario_agente || 'Sin Nombre';
         document.getElementById('pId').textContent = a.id_agente;
-        document.getElementById('pRank').innerHTML = '#' + a.rank_global;
+        document.getElementById('pRank').innerHTML = '#' + a.rank_global
+            + (a.percentil_mes ? ` <span style="font-weight:400; color:var(--text-muted);">(P${Math.round(a.percentil_mes)} · #${a.rank_clase_mes} en ${a.Clase})</span>` : '');
+        // Streaks come from the transitions stage (absent for GLOBAL or older runs)
+        document.getElementById('pStreak').textContent = a.racha_actual
+            ? `${a.racha_actual} ${a.racha_actual === 1 ? 'mes' : 'meses'} en ${a.clase_actual} (máx. ${a.racha_max} en ${a.clase_racha_max} · ↑${a.subidas} ↓${a.bajadas})`
+            : '-';
+        // Cohort retention (% of players still active 1, 3 and 6 months after their first month)
+        const retention = [a.retencion_m1, a.retencion_m3, a.retencion_m6];
+        document.getElementById('pRetention').textContent = retention.some(v => v)
+            ? retention.map(v => Math.round(v || 0) + '%').join(' / ')
+            : '-';
+        // Players gained from / lost to other agents (main agent changed between consecutive months)
+        document.getElementById('pMigration').textContent = (a.jugadores_ganados || a.jugadores_perdidos)
+            ? `+${a.jugadores_ganados} / −${a.jugadores_perdidos} (neto ${a.migracion_neta > 0 ? '+' : ''}${a.migracion_neta})`
+            : '-';
         document.getElementById('pScore').textContent = a.score_global ? a.score_global.toFixed(2) : '0.00';
         
         // Badges
@@ -1759,26 +2179,21 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
 
     function updateRadarChart() {
 
-        const activeItem = document.querySelector('.agent-item.active');
-        if(!activeItem) return;
-        const id = activeItem.dataset.id;
-        const agent = displayedAgents.find(a => a.id_agente == id);
+        if(activeAgentId === null) return;
+        const agent = getDisplayedAgent(activeAgentId);
         if(agent) renderRadar(agent);
     }
 
     function updateTrendChart() {
-        const activeItem = document.querySelector('.agent-item.active');
-        if(!activeItem) return;
-        const id = activeItem.dataset.id;
-        const agent = displayedAgents.find(a => a.id_agente == id);
+        if(activeAgentId === null) return;
+        const agent = getDisplayedAgent(activeAgentId);
         // Force re-render even if data seems same, to handle display toggles
         if(agent) renderTrend(agent);
     }
 
     function exportTrendData() {
-        const activeItem = document.querySelector('.agent-item.active');
-        if(!activeItem) return;
-        const id = activeItem.dataset.id;
+        if(activeAgentId === null) return;
+        const id = activeAgentId;
         
         if(!monthlyData || !monthlyData[id]) { alert('No hay datos para exportar'); return; }
         
@@ -1810,6 +2225,8 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
         const select = document.getElementById('metricSelect');
         const metricKey = select.value;
         const metricName = select.options[select.selectedIndex].text;
+        // Rank: lower is better, so the axis is reversed and a falling trend is good news
+        const lowerIsBetter = metricKey === 'rank_mes';
         
         let data = [];
         let layout = {};
@@ -1825,8 +2242,7 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
              const y_vals = series.map(d => d[metricKey] || 0);
              
              // Determine if in multi-agent mode
-             const activeItem2 = document.querySelector('.agent-item.active');
-             const activeId2 = activeItem2 ? activeItem2.dataset.id : null;
+             const activeId2 = activeAgentId;
              const compareIds = selectedCompareIds.filter(cid => cid != activeId2);
              const isMulti = compareIds.length > 0;
              const agentName = a.nombre_usuario_agente || 'Seleccionado';
@@ -1862,7 +2278,7 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
                  const total_change = trend_y[trend_y.length - 1] - trend_y[0];
                  const rel_change = mean_y !== 0 ? total_change / Math.abs(mean_y) : 0;
                  if (Math.abs(rel_change) < 0.05) trendColor = '#94a3b8';
-                 else if (m2 > 0) trendColor = '#4ade80';
+                 else if ((m2 > 0) !== lowerIsBetter) trendColor = '#4ade80';
                  else trendColor = '#f87171';
                  data.push({
                      x: x_vals, y: trend_y, type: 'scatter', mode: 'lines',
@@ -1875,7 +2291,7 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
              compareIds.forEach((compId, idx) => {
                  const compIdStr = compId.toString();
                  if (!monthlyData || !monthlyData[compIdStr]) return;
-                 const compAgent = displayedAgents.find(x => x.id_agente == compId) || allAgents.find(x => x.id_agente == compId);
+                 const compAgent = getDisplayedAgent(compId) || agentById.get(compIdStr);
                  if (!compAgent) return;
                  const color = compareColors[selectedCompareIds.indexOf(compId) % compareColors.length];
                  let compSeries = [...monthlyData[compIdStr]];
@@ -1905,6 +2321,7 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
                     automargin: true, fixedrange: false
                 },
                 yaxis: { showgrid: true, gridcolor: '#f1f5f9', zeroline: false, fixedrange: false,
+                    autorange: lowerIsBetter ? 'reversed' : true,
                     tickfont: { size: 10, color: '#94a3b8', family: 'Inter' } },
                 paper_bgcolor: 'rgba(0,0,0,0)', plot_bgcolor: 'rgba(0,0,0,0)',
                 hovermode: 'x unified',
@@ -1955,7 +2372,7 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
             const sorted = [...series].sort((a, b) => b.month.localeCompare(a.month));
             
             if (sorted.length === 0) {
-                 tbody.innerHTML = '<tr><td colspan="8" style="text-align:center; padding:20px; color:#94a3b8;">No hay historial mensual disponible</td></tr>';
+                 tbody.innerHTML = '<tr><td colspan="9" style="text-align:center; padding:20px; color:#94a3b8;">No hay historial mensual disponible</td></tr>';
                  return;
             }
 
@@ -1970,11 +2387,13 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
                 const ggr = d.calculo_ggr !== undefined ? d.calculo_ggr : 0;
                 const ngr = d.calculo_ngr !== undefined ? d.calculo_ngr : 0;
                 const comis = d.calculo_comision !== undefined ? d.calculo_comision : 0;
+                const rankMes = d.rank_mes ? `#${d.rank_mes} / ${d.n_agentes_mes}` : '-';
                 
                 tr.innerHTML = `
                     <td>${d.month}</td>
                     <td class="num-col">${new Intl.NumberFormat('en-US').format(players)}</td>
                     <td class="num-col"><strong>${score.toFixed(2)}</strong></td>
+                    <td class="num-col">${rankMes}</td>
                     <td class="num-col">${new Intl.NumberFormat('en-US').format(deps)}</td>
                     <td class="num-col">${new Intl.NumberFormat('en-US').format(rets)}</td>
                     <td class="num-col">${new Intl.NumberFormat('en-US').format(ggr)}</td>
@@ -1984,7 +2403,7 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
                 tbody.appendChild(tr);
             });
         } else {
-            tbody.innerHTML = '<tr><td colspan="8" style="text-align:center; padding:20px; color:#94a3b8;">No hay datos disponibles para este agente</td></tr>';
+            tbody.innerHTML = '<tr><td colspan="9" style="text-align:center; padding:20px; color:#94a3b8;">No hay datos disponibles para este agente</td></tr>';
         }
     }
 
@@ -2013,6 +2432,7 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
             if (radarDiv) Plotly.Plots.resize(radarDiv);
             if (barDiv) Plotly.Plots.resize(barDiv);
             if (trendDiv) Plotly.Plots.resize(trendDiv);
+            scheduleListRender();
         }, 100);
     });
 </script>
@@ -2025,6 +2445,7 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
     html_content = template.render(
         total_agents=total_agents,
         class_counts=class_counts,
+        kpi_counts=kpi_counts,
         pct_risky=pct_risky,
         agents_json=json.dumps(df_json),
         top_agent_json=json.dumps(top_agent.fillna(0).to_dict()),
@@ -2033,10 +2454,13 @@ def generate_html_report(df_agents, df_monthly=None, out_path="reports/dashboard
         metrics_json=metrics_json,
         class_order_json=class_order_json,
         weights_json=weights_json,
+        month_views_json=month_views_js,
+        prefix_sums_json=prefix_sums_js,
 
     )
     
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    html_content = bundle_html(html_content, assets, out_dir=os.path.dirname(out_path))
     with open(out_path, "w", encoding="utf-8") as f:
         f.write(html_content)
     
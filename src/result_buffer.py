@@ -0,0 +1,130 @@
+"""
+Buffer columnar de resultados del pipeline.
+
+En lugar de acumular un dict grande por agente y miles de DataFrames mensuales
+pequeños para luego hacer pd.concat, AgentResultBuffer reserva de antemano
+arreglos NumPy dimensionados al número de agentes (perfil) y de agentes x meses
+(serie mensual). Cada agente procesado escribe sus valores en su fila, y
+to_frames() arma df_agents y df_monthly en un solo paso.
+"""
+
+import numpy as np
+import pandas as pd
+
+from logic_analytics import PESOS_METRICAS
+
+AGENT_COLUMNS = [
+    'id_agente', 'nombre_usuario_agente', 'score_global', 'Clase', 'Risk_Safe',
+    'credito_sugerido', 'descripcion_categoria', 'ggr_prediccion', 'active_players',
+    'total_depositos', 'total_retiros', 'calculo_ngr', 'calculo_ggr', 'calculo_comision',
+    *PESOS_METRICAS.keys(),
+]
+_AGENT_OBJECT_COLUMNS = {'id_agente', 'nombre_usuario_agente', 'Clase', 'descripcion_categoria'}
+_AGENT_INT_COLUMNS = {'Risk_Safe', 'active_players'}
+
+MONTHLY_COLUMNS = [
+    'calculo_ngr', 'num_depositos', 'num_retiros', 'total_depositos', 'total_retiros',
+    'apuestas_deportivas_ggr', 'casino_ggr', 'jugador_id_unique',
+    'tickets_deportes', 'tickets_casino', 'total_apuesta_deportiva', 'total_apuesta_casino',
+    *PESOS_METRICAS.keys(), 'score_global', 'calculo_comision',
+]
+
+# Columnas aditivas de la tabla mensual agregada (agregar_mensual): la suma sobre
+# agentes es la tabla del grupo
+SUM_COLUMNS = [
+    'calculo_ngr', 'num_depositos', 'num_retiros', 'total_depositos', 'total_retiros',
+    'apuestas_deportivas_ggr', 'casino_ggr',
+    'tickets_deportes', 'tickets_casino', 'total_apuesta_deportiva', 'total_apuesta_casino',
+]
+
+
+class AgentResultBuffer:
+    """
+    Resultados por agente (n_agentes filas) y por (agente, mes) (n_agentes x n_meses celdas).
+    Las filas se llenan en sitio con set_agent / set_monthly.
+    """
+
+    def __init__(self, n_agents, months):
+        self.months = pd.Index(sorted(months))
+        n_months = len(self.months)
+
+        self.agent = {
+            c: (np.full(n_agents, None, dtype=object) if c in _AGENT_OBJECT_COLUMNS else np.full(n_agents, np.nan))
+            for c in AGENT_COLUMNS
+        }
+        self.monthly = {c: np.full((n_agents, n_months), np.nan) for c in MONTHLY_COLUMNS}
+        self.filled = np.zeros(n_agents, dtype=bool)
+        self.present = np.zeros((n_agents, n_months), dtype=bool)
+        self._monthly_dtypes = {}
+
+    def set_agent(self, i, record):
+        """Escribe el perfil del agente i (claves de AGENT_COLUMNS)."""
+        for c, v in record.items():
+            if c in self.agent:
+                self.agent[c][i] = v
+        self.filled[i] = True
+
+    def set_monthly(self, i, df_mensual):
+        """Escribe la serie mensual del agente i (DataFrame con columna 'mes')."""
+        if df_mensual is None or df_mensual.empty:
+            return
+        pos = self.months.get_indexer(df_mensual['mes'])
+        ok = pos >= 0
+        pos = pos[ok]
+        for c in MONTHLY_COLUMNS:
+            if c in df_mensual.columns:
+                values = df_mensual[c].to_numpy()
+                self.monthly[c][i, pos] = values[ok]
+                self._monthly_dtypes.setdefault(c, values.dtype)
+        self.present[i, pos] = True
+
+    def monthly_series(self, i, columns):
+        """Serie mensual (meses presentes, en orden) de algunas columnas de la fila i."""
+        pos = np.flatnonzero(self.present[i])
+        data = {'mes': self.months[pos]}
+        for c in columns:
+            if c in self._monthly_dtypes:
+                data[c] = self.monthly[c][i, pos]
+        return pd.DataFrame(data)
+
+    def monthly_totals(self, rows):
+        """
+        Suma de las columnas aditivas de la serie mensual sobre las filas dadas
+        (índices; las no llenadas se ignoran), solo en los meses con datos de alguna de ellas. Sirve para armar la
+        vista global desde los agentes ya procesados sin volver a los datos crudos.
+        """
+        rows = np.asarray(rows)
+        rows = rows[self.filled[rows]]
+        present = self.present[rows].any(axis=0)
+        data = {'mes': self.months[present]}
+        for c in SUM_COLUMNS:
+            if c not in self._monthly_dtypes:
+                continue
+            values = np.nansum(self.monthly[c][np.ix_(rows, np.flatnonzero(present))], axis=0)
+            if np.issubdtype(self._monthly_dtypes[c], np.integer):
+                values = values.astype(self._monthly_dtypes[c])
+            data[c] = values
+        return pd.DataFrame(data)
+
+    def to_frames(self):
+        """Construye (df_agents, df_monthly) directamente desde los arreglos."""
+        rows = np.flatnonzero(self.filled)
+        df_agents = pd.DataFrame({c: self.agent[c][rows] for c in AGENT_COLUMNS})
+        for c in _AGENT_INT_COLUMNS:
+            if df_agents[c].notna().all():
+                df_agents[c] = df_agents[c].astype(int)
+
+        present = self.present & self.filled[:, None]
+        ai, mi = np.nonzero(present)
+        data = {'mes': self.months[mi]}
+        for c in MONTHLY_COLUMNS:
+            if c not in self._monthly_dtypes:
+                continue
+            values = self.monthly[c][ai, mi]
+            dtype = self._monthly_dtypes[c]
+            if np.issubdtype(dtype, np.integer) and not np.isnan(values).any():
+                values = values.astype(dtype)
+            data[c] = values
+        df_monthly = pd.DataFrame(data)
+        df_monthly['id_agente'] = self.agent['id_agente'][ai]
+        return df_agents, df_monthly
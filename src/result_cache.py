@@ -0,0 +1,150 @@
+"""
+Caché en disco de resultados por agente.
+
+Entre corridas diarias la mayoría de los agentes no cambia, pero sus métricas,
+crédito y predicción se recalculan completos. Todo lo que el motor lee de los
+datos crudos de un agente está en su tabla mensual agregada (agregar_mensual),
+así que la huella del agente es un hash de esa tabla más:
+
+- los PESOS_METRICAS y el código de logic_analytics (versión del modelo): cambiar
+  un peso o una regla invalida toda la caché sin tener que borrarla a mano;
+- los parámetros de la llamada (total_jugadores_global, modo mensual, ...), entre
+  ellos code_version() de las funciones fuera de logic_analytics que arman el
+  resultado guardado (p. ej. run_pipeline.finish_scoring).
+
+Cada resultado se guarda como un pickle en <directorio>/<hash[:2]>/<hash>.pkl.
+Una lectura actualiza el mtime del archivo, y al superar max_bytes se borran los
+archivos con mtime más antiguo (LRU acotado por tamaño).
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import tempfile
+from functools import lru_cache
+
+import pandas as pd
+
+import logic_analytics
+from logic_analytics import PESOS_METRICAS
+
+
+@lru_cache(maxsize=1)
+def model_version():
+    """Hash de los pesos y del código del motor de métricas."""
+    h = hashlib.sha256(json.dumps(PESOS_METRICAS, sort_keys=True).encode('utf-8'))
+    with open(logic_analytics.__file__, 'rb') as f:
+        h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+@lru_cache(maxsize=None)
+def code_version(*funcs):
+    """Hash del código fuente de funciones que arman un resultado cacheado, para usar como parámetro de la clave."""
+    h = hashlib.sha256()
+    for func in funcs:
+        h.update(inspect.getsource(func).encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+def table_fingerprint(df_mensual, *params):
+    """
+    Clave de caché a partir de la tabla mensual agregada: hash de la tabla, de la
+    versión del modelo y de los parámetros extra (deben tener un repr estable).
+    """
+    h = hashlib.sha256(model_version().encode('ascii'))
+    h.update(repr(params).encode('utf-8'))
+    if df_mensual is not None and len(df_mensual):
+        h.update(','.join(df_mensual.columns).encode('utf-8'))
+        h.update(pd.util.hash_pandas_object(df_mensual, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    Resultados pickleados por clave en un directorio, con desalojo LRU cuando el
+    total supera max_bytes. hits / misses cuentan los aciertos de la corrida.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(os.path.getsize(p) for p, _ in self._entries())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.pkl")
+
+    def _entries(self):
+        """[(ruta, mtime)] de todos los resultados guardados."""
+        entries = []
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith('.pkl'):
+                    entries.append((entry.path, entry.stat().st_mtime))
+        return entries
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return default
+        except Exception:
+            # Archivo truncado o de una versión incompatible: se descarta
+            self._remove(path)
+            self.misses += 1
+            return default
+        os.utime(path)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        # Escritura atómica: otro proceso nunca ve un pickle a medias
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp, path)
+        self._size += len(data) - previous
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def get_or_compute(self, key, compute):
+        """Devuelve el resultado guardado para key o lo calcula con compute() y lo guarda."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            self._size -= size
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        """Borra los resultados usados hace más tiempo hasta quedar bajo max_bytes."""
+        for path, _ in sorted(self._entries(), key=lambda e: e[1]):
+            if self._size <= self.max_bytes:
+                break
+            self._remove(path)
+
+    def stats(self):
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"{self.hits}/{total} agentes desde caché ({rate:.0f}%), {self._size / 1e6:.1f} MB en disco"
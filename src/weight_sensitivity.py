@@ -0,0 +1,191 @@
+"""
+Sensibilidad del ranking a los pesos de las métricas.
+
+Evalúa miles de vectores de pesos (una grilla sobre algunas métricas o una
+muestra aleatoria alrededor de PESOS_METRICAS) sobre la matriz agentes x 11
+métricas guardada por el pipeline. Los scores de cada bloque de escenarios
+salen de un solo producto (agentes x métricas) @ (métricas x escenarios); el
+trabajo se hace por bloques de `bloque` escenarios y solo se acumulan
+estadísticas por agente, así que la memoria queda acotada a agentes x bloque
+sin importar cuántos escenarios se evalúen.
+
+Por agente se reporta:
+- rango del score (mín, máx, media, desvío) entre escenarios;
+- estabilidad de clase: fracción de escenarios con la misma clase que con los
+  pesos actuales, clase más frecuente y cantidad de clases distintas;
+- volatilidad del ranking: mín, máx y desvío del puesto.
+
+    python src/weight_sensitivity.py --muestras 5000 --concentracion 50 --salida sensibilidad.csv
+    python src/weight_sensitivity.py --grilla volumen=0.05:0.30:6 --grilla fidelidad=0.05:0.30:6
+"""
+
+import argparse
+import itertools
+import sys
+
+import numpy as np
+
+from logic_analytics import PESOS_METRICAS, CATEGORIAS, indices_categoria
+from what_if import METRICAS, DEFAULT_RESULTS, cargar_resultados
+
+BLOQUE_ESCENARIOS = 512
+
+
+def pesos_base():
+    return np.array([PESOS_METRICAS[m] for m in METRICAS], dtype=float)
+
+
+def muestrear_pesos(n, concentracion=50.0, semilla=0):
+    """
+    Matriz (11 x n) de pesos Dirichlet centrados en PESOS_METRICAS (suman 1).
+    Más concentración = escenarios más cercanos a los pesos actuales.
+    """
+    rng = np.random.default_rng(semilla)
+    return rng.dirichlet(pesos_base() * concentracion, size=n).T
+
+
+def grilla_pesos(valores, normalizar=True):
+    """
+    Matriz (11 x n) con el producto cartesiano de los valores indicados por
+    métrica ({métrica: [pesos]}); las demás métricas conservan su peso actual.
+    Con normalizar=True cada vector se reescala para sumar 1.
+    """
+    desconocidas = set(valores) - set(METRICAS)
+    if desconocidas:
+        raise ValueError(f"Métricas desconocidas: {sorted(desconocidas)}")
+    nombres = list(valores)
+    combinaciones = np.array(list(itertools.product(*(valores[m] for m in nombres))), dtype=float)
+    W = np.repeat(pesos_base()[:, None], len(combinaciones), axis=1)
+    for j, m in enumerate(nombres):
+        W[METRICAS.index(m)] = combinaciones[:, j]
+    if normalizar:
+        W = W / W.sum(axis=0, keepdims=True)
+    return W
+
+
+def _ranks(scores):
+    """Puesto descendente por columna con empates al mínimo (como rank(method='min'))."""
+    n = scores.shape[0]
+    orden = np.argsort(-scores, axis=0, kind='stable')
+    ordenados = np.take_along_axis(scores, orden, axis=0)
+    nuevo = np.ones_like(ordenados, dtype=bool)
+    nuevo[1:] = ordenados[1:] != ordenados[:-1]
+    posicion = np.where(nuevo, np.arange(n)[:, None], 0)
+    primero = np.maximum.accumulate(posicion, axis=0)
+    ranks = np.empty_like(orden)
+    np.put_along_axis(ranks, orden, primero + 1, axis=0)
+    return ranks
+
+
+def analizar_sensibilidad(df, W, bloque=BLOQUE_ESCENARIOS):
+    """
+    Estadísticas por agente del score, la clase y el ranking sobre los
+    escenarios de W (11 x escenarios). df tiene una fila por agente con las
+    11 métricas; la vista global se excluye.
+    """
+    if 'id_agente' in df.columns:
+        df = df[df['id_agente'].astype(str) != 'GLOBAL']
+    df = df.reset_index(drop=True)
+    M = df[METRICAS].to_numpy(dtype=float)
+    n, n_escenarios = len(df), W.shape[1]
+
+    score_base = M @ pesos_base()
+    clase_base = indices_categoria(score_base)
+    rank_base = _ranks(score_base[:, None])[:, 0]
+
+    s_min = np.full(n, np.inf)
+    s_max = np.full(n, -np.inf)
+    s_sum = np.zeros(n)
+    s_sq = np.zeros(n)
+    r_min = np.full(n, np.iinfo(np.int64).max)
+    r_max = np.zeros(n, dtype=np.int64)
+    r_sum = np.zeros(n)
+    r_sq = np.zeros(n)
+    conteo_clases = np.zeros((n, len(CATEGORIAS)), dtype=np.int64)
+    filas = np.arange(n)[:, None]
+
+    for inicio in range(0, n_escenarios, bloque):
+        scores = M @ W[:, inicio:inicio + bloque]
+        s_min = np.minimum(s_min, scores.min(axis=1))
+        s_max = np.maximum(s_max, scores.max(axis=1))
+        s_sum += scores.sum(axis=1)
+        s_sq += (scores ** 2).sum(axis=1)
+
+        clases = indices_categoria(scores)
+        conteo_clases += np.bincount((filas * len(CATEGORIAS) + clases).ravel(),
+                                     minlength=n * len(CATEGORIAS)).reshape(n, len(CATEGORIAS))
+
+        ranks = _ranks(scores)
+        r_min = np.minimum(r_min, ranks.min(axis=1))
+        r_max = np.maximum(r_max, ranks.max(axis=1))
+        r_sum += ranks.sum(axis=1)
+        r_sq += (ranks.astype(float) ** 2).sum(axis=1)
+
+    media = s_sum / n_escenarios
+    rank_media = r_sum / n_escenarios
+    categorias = np.asarray(CATEGORIAS, dtype=object)
+
+    claves = [c for c in ('id_agente', 'nombre_usuario_agente') if c in df.columns]
+    resultado = df[claves].copy()
+    resultado['score_base'] = score_base
+    resultado['score_min'] = s_min
+    resultado['score_max'] = s_max
+    resultado['score_media'] = media
+    resultado['score_std'] = np.sqrt(np.maximum(s_sq / n_escenarios - media ** 2, 0.0))
+    resultado['Clase_base'] = categorias[clase_base]
+    resultado['Clase_modal'] = categorias[conteo_clases.argmax(axis=1)]
+    resultado['estabilidad_clase'] = conteo_clases[np.arange(n), clase_base] / n_escenarios
+    resultado['clases_distintas'] = (conteo_clases > 0).sum(axis=1)
+    resultado['rank_base'] = rank_base
+    resultado['rank_min'] = r_min
+    resultado['rank_max'] = r_max
+    resultado['rank_std'] = np.sqrt(np.maximum(r_sq / n_escenarios - rank_media ** 2, 0.0))
+    return resultado.sort_values('rank_base', kind='stable').reset_index(drop=True)
+
+
+def _parse_grilla(texto):
+    """'metrica=inicio:fin:pasos' o 'metrica=v1,v2,...' -> (metrica, valores)."""
+    metrica, _, rango = texto.partition('=')
+    if ':' in rango:
+        inicio, fin, pasos = rango.split(':')
+        valores = np.linspace(float(inicio), float(fin), int(pasos))
+    else:
+        valores = [float(v) for v in rango.split(',')]
+    return metrica.strip(), valores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sensibilidad de scores, clases y ranking a los pesos de las métricas.")
+    parser.add_argument('--resultados', default=DEFAULT_RESULTS,
+                        help='forecast.pkl de run_pipeline (default: .cache/pipeline/forecast.pkl) o agent_analysis.csv')
+    parser.add_argument('--grilla', action='append', type=_parse_grilla, default=[],
+                        help='metrica=inicio:fin:pasos o metrica=v1,v2,... (repetible; producto cartesiano)')
+    parser.add_argument('--muestras', type=int, default=2000, help='vectores aleatorios si no se indica --grilla')
+    parser.add_argument('--concentracion', type=float, default=50.0, help='concentración Dirichlet alrededor de los pesos actuales')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--bloque', type=int, default=BLOQUE_ESCENARIOS, help='escenarios por bloque (memoria)')
+    parser.add_argument('--salida', help='CSV con las estadísticas por agente')
+    args = parser.parse_args(argv)
+
+    if args.grilla:
+        W = grilla_pesos(dict(args.grilla))
+    else:
+        W = muestrear_pesos(args.muestras, args.concentracion, args.semilla)
+
+    df_agents, _ = cargar_resultados(args.resultados)
+    resultado = analizar_sensibilidad(df_agents, W, args.bloque)
+
+    print(f"--- SENSIBILIDAD: {len(resultado)} agentes x {W.shape[1]} escenarios ---")
+    print(f"Agentes con clase estable en todos los escenarios: {(resultado['estabilidad_clase'] == 1).sum()}")
+    print(f"Estabilidad de clase media: {resultado['estabilidad_clase'].mean():.1%}")
+    print("\nAgentes más volátiles en el ranking:")
+    print(resultado.sort_values('rank_std', ascending=False).head(10).to_string(index=False))
+
+    if args.salida:
+        resultado.to_csv(args.salida, index=False)
+        print(f"\nEstadísticas guardadas en {args.salida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
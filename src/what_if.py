@@ -0,0 +1,190 @@
+"""
+Escenarios "what-if" de pesos sin recalcular métricas.
+
+calcular_score_total es una suma ponderada de las 11 métricas, así que cambiar
+PESOS_METRICAS no requiere volver a correr el pipeline: basta con la matriz
+(agente[, mes]) x 11 métricas que guarda la etapa forecast. Con una sola
+multiplicación metricas @ pesos (11 x escenarios) se obtienen los scores de
+todos los escenarios; luego se reclasifica con categorizar_scores y se
+re-rankea por columna.
+
+Un escenario es un dict {métrica: peso} que reemplaza solo las métricas
+indicadas; el resto conserva el peso de PESOS_METRICAS. El escenario 'base'
+(los pesos actuales) se agrega siempre y es la referencia de los cambios.
+
+    python src/what_if.py --escenario deportes:volumen=0.2,fidelidad=0.1 --normalizar
+    python src/what_if.py --escenarios escenarios.json --mensual --salida cambios.csv
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from logic_analytics import PESOS_METRICAS, CATEGORIAS, categorizar_scores
+from pipeline_stages import read_stage
+
+METRICAS = list(PESOS_METRICAS.keys())
+ESCENARIO_BASE = 'base'
+DEFAULT_RESULTS = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.cache', 'pipeline', 'forecast.pkl'))
+
+
+def cargar_resultados(path=DEFAULT_RESULTS):
+    """
+    (df_agents, df_monthly) guardados por la etapa forecast de run_pipeline, o
+    solo df_agents si path es un agent_analysis.csv (df_monthly = None).
+    """
+    if path.endswith('.csv'):
+        return pd.read_csv(path), None
+    data, _ = read_stage(path)
+    return data['df_agents'], data['df_monthly']
+
+
+def matriz_pesos(escenarios, normalizar=False):
+    """
+    Matriz (11 x S) de pesos, con el escenario base en la columna 0, y los nombres.
+    Con normalizar=True los pesos de cada escenario se reescalan para sumar 1.
+    """
+    nombres = [ESCENARIO_BASE]
+    columnas = [[PESOS_METRICAS[m] for m in METRICAS]]
+    for nombre, pesos in escenarios.items():
+        desconocidas = set(pesos) - set(METRICAS)
+        if desconocidas:
+            raise ValueError(f"Métricas desconocidas en el escenario {nombre!r}: {sorted(desconocidas)}")
+        if nombre == ESCENARIO_BASE:
+            raise ValueError(f"El nombre {ESCENARIO_BASE!r} está reservado para los pesos actuales")
+        nombres.append(nombre)
+        columnas.append([float(pesos.get(m, PESOS_METRICAS[m])) for m in METRICAS])
+
+    W = np.array(columnas, dtype=float).T
+    if normalizar:
+        W = W / W.sum(axis=0, keepdims=True)
+    return W, nombres
+
+
+def recalcular_escenarios(df, escenarios, normalizar=False, grupo=None):
+    """
+    Re-score, re-clasificación y re-ranking de todas las filas de df (agentes o
+    agente-mes, con las 11 métricas) bajo cada escenario.
+
+    El ranking es descendente por score (method='min') dentro de cada valor de
+    la columna grupo (p. ej. 'mes'), o sobre todas las filas si grupo es None.
+    La vista global (id_agente == 'GLOBAL') no compite en el ranking y se excluye.
+
+    Devuelve un DataFrame largo: una fila por (fila de df, escenario) con score,
+    Clase y rank, más las columnas del escenario base para comparar.
+    """
+    if 'id_agente' in df.columns:
+        df = df[df['id_agente'].astype(str) != 'GLOBAL']
+    df = df.reset_index(drop=True)
+    W, nombres = matriz_pesos(escenarios, normalizar)
+
+    scores = df[METRICAS].to_numpy(dtype=float) @ W
+    clases = categorizar_scores(scores.ravel()).reshape(scores.shape)
+    scores_df = pd.DataFrame(scores)
+    if grupo is None:
+        ranks = scores_df.rank(ascending=False, method='min')
+    else:
+        ranks = scores_df.groupby(df[grupo].to_numpy()).rank(ascending=False, method='min')
+    ranks = ranks.to_numpy(dtype=np.int64)
+
+    claves = [c for c in ('id_agente', 'nombre_usuario_agente', grupo) if c is not None and c in df.columns]
+    n, s = scores.shape
+    resultado = df[claves].iloc[np.tile(np.arange(n), s)].reset_index(drop=True)
+    resultado['escenario'] = np.repeat(nombres, n)
+    resultado['score'] = scores.T.ravel()
+    resultado['Clase'] = clases.T.ravel()
+    resultado['rank'] = ranks.T.ravel()
+    resultado['score_base'] = np.tile(scores[:, 0], s)
+    resultado['Clase_base'] = np.tile(clases[:, 0], s)
+    resultado['rank_base'] = np.tile(ranks[:, 0], s)
+
+    orden = {c: i for i, c in enumerate(CATEGORIAS)}
+    nivel = resultado['Clase'].map(orden) - resultado['Clase_base'].map(orden)
+    resultado['cambio_clase'] = np.sign(nivel).astype(int)
+    resultado['delta_rank'] = resultado['rank_base'] - resultado['rank']
+    return resultado
+
+
+def resumen_cambios(resultado):
+    """Por escenario: filas que cambian de clase, suben o bajan, y movimiento medio de ranking."""
+    alternativos = resultado[resultado['escenario'] != ESCENARIO_BASE]
+    resumen = alternativos.groupby('escenario', sort=False).agg(
+        filas=('score', 'size'),
+        cambian_clase=('cambio_clase', lambda x: int((x != 0).sum())),
+        suben=('cambio_clase', lambda x: int((x > 0).sum())),
+        bajan=('cambio_clase', lambda x: int((x < 0).sum())),
+        delta_rank_medio=('delta_rank', lambda x: float(x.abs().mean())),
+        delta_rank_max=('delta_rank', lambda x: int(x.abs().max())),
+    )
+    return resumen
+
+
+def matriz_transicion(resultado, escenario):
+    """Conteo Clase_base (filas) -> Clase del escenario (columnas)."""
+    sub = resultado[resultado['escenario'] == escenario]
+    tabla = pd.crosstab(sub['Clase_base'], sub['Clase'])
+    return tabla.reindex(index=CATEGORIAS, columns=CATEGORIAS, fill_value=0)
+
+
+def _parse_escenario(texto):
+    """'nombre:metrica=peso,metrica=peso' -> (nombre, {metrica: peso})."""
+    nombre, _, asignaciones = texto.partition(':')
+    if not asignaciones:
+        raise argparse.ArgumentTypeError(f"formato esperado nombre:metrica=peso,...; recibido {texto!r}")
+    pesos = {}
+    for par in asignaciones.split(','):
+        metrica, _, valor = par.partition('=')
+        pesos[metrica.strip()] = float(valor)
+    return nombre.strip(), pesos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-score de agentes bajo pesos alternativos (what-if).")
+    parser.add_argument('--resultados', default=DEFAULT_RESULTS,
+                        help='forecast.pkl de run_pipeline (default: .cache/pipeline/forecast.pkl) o agent_analysis.csv')
+    parser.add_argument('--escenario', action='append', type=_parse_escenario, default=[],
+                        help='nombre:metrica=peso,... (repetible)')
+    parser.add_argument('--escenarios', help='JSON {nombre: {metrica: peso}}')
+    parser.add_argument('--normalizar', action='store_true', help='reescalar los pesos de cada escenario para sumar 1')
+    parser.add_argument('--mensual', action='store_true', help='re-score de cada (agente, mes) y ranking por mes')
+    parser.add_argument('--salida', help='CSV con las filas que cambian de clase o de ranking')
+    args = parser.parse_args(argv)
+
+    escenarios = {}
+    if args.escenarios:
+        with open(args.escenarios, encoding='utf-8') as f:
+            escenarios.update(json.load(f))
+    escenarios.update(dict(args.escenario))
+    if not escenarios:
+        parser.error("indicar al menos un escenario (--escenario o --escenarios)")
+
+    df_agents, df_monthly = cargar_resultados(args.resultados)
+    if args.mensual:
+        if df_monthly is None:
+            parser.error("--mensual necesita el forecast.pkl (agent_analysis.csv no tiene la serie mensual)")
+        resultado = recalcular_escenarios(df_monthly, escenarios, args.normalizar, grupo='mes')
+    else:
+        resultado = recalcular_escenarios(df_agents, escenarios, args.normalizar)
+
+    print("--- CAMBIOS POR ESCENARIO ---")
+    print(resumen_cambios(resultado).to_string())
+    for nombre in escenarios:
+        tabla = matriz_transicion(resultado, nombre)
+        tabla = tabla.loc[tabla.sum(axis=1) > 0, tabla.sum(axis=0) > 0]
+        print(f"\n--- {nombre}: Clase base (filas) -> Clase escenario (columnas) ---")
+        print(tabla.to_string())
+
+    if args.salida:
+        cambios = resultado[(resultado['escenario'] != ESCENARIO_BASE) &
+                            ((resultado['cambio_clase'] != 0) | (resultado['delta_rank'] != 0))]
+        cambios.to_csv(args.salida, index=False)
+        print(f"\n{len(cambios)} filas con cambios guardadas en {args.salida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
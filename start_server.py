@@ -6,10 +6,27 @@ import webbrowser
 PORT = 8080
 DIRECTORY = "reports"
 
+ASSETS_PREFIX = "/assets/"
+
 class Handler(http.server.SimpleHTTPRequestHandler):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=DIRECTORY, **kwargs)
 
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def end_headers(self):
+        # Los assets compartidos llevan hash de contenido en el nombre: se cachean una vez para ambos reportes.
+        # Solo las respuestas 200: un 404 cacheado como immutable ocultaría el asset aunque se regenere
+        if self.path.startswith(ASSETS_PREFIX):
+            if getattr(self, "_status", None) == 200:
+                self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        elif self.path.split("?", 1)[0].endswith(".html"):
+            # El HTML (datos) se revalida siempre para ver la última regeneración
+            self.send_header("Cache-Control", "no-cache")
+        super().end_headers()
+
 def run_server():
     # Asegurarse de estar en la raíz del proyecto
     base_dir = os.path.dirname(os.path.abspath(__file__))